@@ -0,0 +1,25 @@
+# gunicorn_asgi.conf.py
+# ASGI deployment profile: gunicorn supervises uvicorn workers, each running one event loop
+# that keeps many requests in flight (AI classifications, live dashboard streams) at once.
+#
+#   gunicorn smart_ticket.asgi:application -c gunicorn_asgi.conf.py
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = 'uvicorn_worker.UvicornWorker'
+
+# One event loop per core is enough; concurrency comes from the loop, not from processes
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+
+# Live dashboard streams stay open for as long as the page does, so only count inactivity
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Recycle workers now and then to bound any slow memory growth
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = 1000
+
+# Serve ticket creation and detail from the async views in these workers
+raw_env = ['USE_ASYNC_VIEWS=True']
@@ -47,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack
+    'tickets.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -166,12 +168,84 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Kolkata'
 
 CELERY_BEAT_SCHEDULE = {
+    # Reads only the due end of the escalation queue, so polling every minute is cheap
     'check-overdue-tickets-every-minute': { 
         'task': 'tickets.tasks.check_overdue_tickets',
-        'schedule': timedelta(minutes=30),
+        'schedule': timedelta(minutes=1),
     },
-    'assign-unassigned-tickets-every-minute': { 
+    'assign-unassigned-tickets-every-30-minutes': { 
         'task': 'tickets.tasks.assign_unassigned_tickets',
         'schedule': timedelta(minutes=30), 
     },
+    'rebuild-ticket-rollups-daily': {
+        'task': 'tickets.tasks.rebuild_ticket_rollups',
+        'schedule': timedelta(days=1),
+    },
+}
+
+# AI priority classification (Gemini). Point GEMINI_API_URL at the local stub
+# (python manage.py run_gemini_stub) to develop and test without network access.
+GEMINI_API_URL = os.environ.get(
+    'GEMINI_API_URL',
+    'https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent',
+)
+
+# Pooled classifier HTTP client: connection pool size, keep-alive and timeouts (seconds)
+GEMINI_POOL_SIZE = int(os.environ.get('GEMINI_POOL_SIZE', 20))
+GEMINI_KEEPALIVE_TIMEOUT = float(os.environ.get('GEMINI_KEEPALIVE_TIMEOUT', 60))
+GEMINI_CONNECT_TIMEOUT = float(os.environ.get('GEMINI_CONNECT_TIMEOUT', 2))
+GEMINI_READ_TIMEOUT = float(os.environ.get('GEMINI_READ_TIMEOUT', 5))
+GEMINI_TOTAL_TIMEOUT = float(os.environ.get('GEMINI_TOTAL_TIMEOUT', 8))
+
+# AI prediction cache: Redis shared across workers, with an in-process LRU fallback
+PRIORITY_CACHE_REDIS_URL = os.environ.get('PRIORITY_CACHE_REDIS_URL', os.environ.get('REDIS_URL'))
+PRIORITY_CACHE_TTL = int(os.environ.get('PRIORITY_CACHE_TTL', 60 * 60 * 24))
+PRIORITY_CACHE_MAX_ENTRIES = int(os.environ.get('PRIORITY_CACHE_MAX_ENTRIES', 10000))
+
+# Where classifying processes publish their classifier counters for /analytics/classifier/;
+# unset, the endpoint only reports on the process that serves it
+CLASSIFIER_STATUS_REDIS_URL = os.environ.get('CLASSIFIER_STATUS_REDIS_URL', os.environ.get('REDIS_URL'))
+
+# Circuit breaker and per-call latency budget (seconds) around the classifier
+GEMINI_LATENCY_BUDGET = float(os.environ.get('GEMINI_LATENCY_BUDGET', 3))
+GEMINI_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('GEMINI_BREAKER_FAILURE_THRESHOLD', 5))
+GEMINI_BREAKER_SLOW_CALL = float(os.environ.get('GEMINI_BREAKER_SLOW_CALL', 2))
+GEMINI_BREAKER_COOLDOWN = float(os.environ.get('GEMINI_BREAKER_COOLDOWN', 30))
+
+# Locally trained priority model (python manage.py train_priority_model). Predictions at least
+# this confident skip the remote classifier; set above 1 to only use the model as a fallback.
+LOCAL_PRIORITY_MODEL_DIR = os.environ.get('LOCAL_PRIORITY_MODEL_DIR', os.path.join(BASE_DIR, 'ml', 'priority_model'))
+LOCAL_PRIORITY_MIN_CONFIDENCE = float(os.environ.get('LOCAL_PRIORITY_MIN_CONFIDENCE', 0.85))
+
+# Database alias ticket exports read from; point it at a read replica to keep exports off the primary
+EXPORT_DB_ALIAS = os.environ.get('EXPORT_DB_ALIAS', 'default')
+
+# Redis pub/sub behind the live dashboard updates (served over ASGI); unset disables them
+LIVE_UPDATES_REDIS_URL = os.environ.get('LIVE_UPDATES_REDIS_URL', os.environ.get('REDIS_URL'))
+
+# Route ticket creation and detail to the async views (tickets/async_views.py). Only turn this
+# on when serving the ASGI application; gunicorn_asgi.conf.py sets it for its workers.
+USE_ASYNC_VIEWS = os.environ.get('USE_ASYNC_VIEWS', 'False').lower() in ('true', '1')
+
+# Per-request metrics (tickets.middleware.RequestMetricsMiddleware): how many of the slowest
+# queries each log line lists, and cProfile sampling of slow requests to disk
+REQUEST_METRICS_SLOW_QUERIES = int(os.environ.get('REQUEST_METRICS_SLOW_QUERIES', 3))
+REQUEST_PROFILE_SAMPLE_RATE = float(os.environ.get('REQUEST_PROFILE_SAMPLE_RATE', 0.01))
+REQUEST_PROFILE_THRESHOLD_MS = float(os.environ.get('REQUEST_PROFILE_THRESHOLD_MS', 1000))
+REQUEST_PROFILE_DIR = os.environ.get('REQUEST_PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # One JSON line per request; set REQUEST_LOG_LEVEL=WARNING to silence them
+        'tickets.requests': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
 }
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Ticket, Comment
+from .models import CustomUser, Ticket, Comment, AgentLoad
+from .services import save_new_ticket
 
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
@@ -19,9 +20,23 @@ class TicketAdmin(admin.ModelAdmin):
     raw_id_fields = ('create_by', 'assigned_to')
     date_hierarchy = 'created_at'
 
+    def save_model(self, request, obj, form, change):
+        # New tickets go through the same assignment and SLA path as the views
+        if change:
+            obj._actor = request.user
+            super().save_model(request, obj, form, change)
+        else:
+            save_new_ticket(obj, actor=request.user)
+
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('user', 'ticket', 'text', 'created_at')
     list_filter = ('user', 'ticket__title', 'created_at')
     search_fields = ('text', 'user__username', 'ticket__title')
-    raw_id_fields = ('user', 'ticket')
\ No newline at end of file
+    raw_id_fields = ('user', 'ticket')
+
+@admin.register(AgentLoad)
+class AgentLoadAdmin(admin.ModelAdmin):
+    list_display = ('agent', 'weighted_load')
+    ordering = ('weighted_load',)
+    raw_id_fields = ('agent',)
@@ -0,0 +1,144 @@
+# tickets/ai_client.py
+"""
+Process-wide pooled HTTP client for the AI classifier.
+
+aiohttp sessions belong to the event loop they were created on, so the client keeps one
+pooled session per loop. Sync callers (views, Celery tasks) share a single background
+loop thread instead of spinning up a new loop - and a new TCP/TLS handshake - per call.
+"""
+import asyncio
+import atexit
+import threading
+import time
+
+import aiohttp
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+
+from .instrumentation import external_call
+
+
+class ClientStats:
+    """Thread-safe latency and error counters for upstream calls."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.errors = 0
+            self.timeouts = 0
+            self.total_latency = 0.0
+            self.max_latency = 0.0
+
+    def record(self, latency, error=False, timeout=False):
+        with self._lock:
+            self.requests += 1
+            self.errors += error or timeout
+            self.timeouts += timeout
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'timeouts': self.timeouts,
+                'avg_latency_ms': round(self.total_latency / self.requests * 1000, 2) if self.requests else None,
+                'max_latency_ms': round(self.max_latency * 1000, 2),
+            }
+
+
+class ClassifierClient:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._loop = None
+        self._thread = None
+        self.stats = ClientStats()
+
+    def _new_session(self):
+        connector = aiohttp.TCPConnector(
+            limit=settings.GEMINI_POOL_SIZE,
+            keepalive_timeout=settings.GEMINI_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=settings.GEMINI_TOTAL_TIMEOUT,
+            sock_connect=settings.GEMINI_CONNECT_TIMEOUT,
+            sock_read=settings.GEMINI_READ_TIMEOUT,
+        )
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    def session(self):
+        """Returns the pooled session for the running event loop, creating it on first use."""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = self._new_session()
+            self._sessions[loop] = session
+        return session
+
+    async def post_json(self, url, payload):
+        """
+        POSTs `payload` as JSON and returns the decoded response body.
+        Raises aiohttp.ClientError or asyncio.TimeoutError; both are counted.
+        """
+        with external_call():
+            started = time.monotonic()
+            try:
+                async with self.session().post(url, json=payload) as response:
+                    response.raise_for_status()
+                    result = await response.json()
+            except asyncio.TimeoutError:
+                self.stats.record(time.monotonic() - started, timeout=True)
+                raise
+            except Exception:
+                self.stats.record(time.monotonic() - started, error=True)
+                raise
+            self.stats.record(time.monotonic() - started)
+        return result
+
+    def run(self, coro):
+        """
+        Runs `coro` to completion from synchronous code on the shared background loop,
+        so its session and keep-alive connections survive between calls.
+        """
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name='classifier-client', daemon=True)
+                self._thread.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def close(self):
+        """Closes every pooled session and stops the background loop."""
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+            loop, self._loop = self._loop, None
+
+        for session_loop, session in sessions.items():
+            if session.closed or session_loop.is_closed():
+                continue
+            if session_loop is loop:
+                asyncio.run_coroutine_threadsafe(session.close(), loop).result(timeout=5)
+            elif session_loop.is_running():
+                session_loop.call_soon_threadsafe(session_loop.create_task, session.close())
+
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join(timeout=5)
+            loop.close()
+
+
+classifier_client = ClassifierClient()
+
+atexit.register(classifier_client.close)
+
+
+@worker_process_shutdown.connect
+def close_classifier_client(**kwargs):
+    classifier_client.close()
@@ -0,0 +1,243 @@
+# tickets/assignment.py
+import heapq
+import time
+from collections import Counter
+from django.db import transaction
+from django.db.models import F, Q, Case, When, IntegerField, Sum
+from django.utils import timezone
+from .models import AgentLoad, CustomUser, Ticket, Comment, TicketEvent
+from .rollups import apply_rollup_deltas, rollup_delta
+from .events import state_events
+from . import live
+
+# Weights for each priority level when measuring how busy an agent is
+PRIORITY_WEIGHTS = {
+    'high': 3,
+    'medium': 2,
+    'low': 1,
+}
+
+# The maximum weighted load an agent should take before new tickets skip them
+MAX_AGENT_WEIGHT_CAP = 10
+
+# Only tickets in these statuses count towards an agent's load
+ACTIVE_STATUSES = Ticket.ACTIVE_STATUSES
+
+# How many backlog tickets the batch engine assigns and writes per transaction
+ASSIGNMENT_BATCH_SIZE = 500
+
+# Agents with capacity to wait on, least loaded first, when concurrent assignments hold every one
+LOCKED_PICK_ATTEMPTS = 5
+
+
+def ticket_weight(status, priority):
+    """
+    Returns how much a ticket in the given status/priority adds to its assignee's load.
+    """
+    if status not in ACTIVE_STATUSES:
+        return 0
+    return PRIORITY_WEIGHTS.get(priority, 0)
+
+
+def adjust_agent_load(agent_id, delta):
+    """
+    Atomically adds `delta` to an agent's weighted load. The F() expression makes the
+    database do the increment, so concurrent ticket updates never lose a change.
+    """
+    if not agent_id or not delta:
+        return
+    updated = AgentLoad.objects.filter(agent_id=agent_id).update(weighted_load=F('weighted_load') + delta)
+    if not updated:
+        # No counter row yet (e.g. a non-agent was assigned) - seed it from the ticket table,
+        # which already reflects the change that triggered this call.
+        rebuild_agent_loads(agent_ids=[agent_id])
+
+
+def pick_available_agent(lock=False):
+    """
+    Returns the active agent with the lowest weighted load below MAX_AGENT_WEIGHT_CAP,
+    or None if everyone is at capacity. The agent carries its load as `weighted_ticket_load`.
+
+    With `lock=True` (inside a transaction) the agent's counter row stays locked until commit,
+    and rows locked by concurrent assignments are skipped rather than waited on, so two
+    requests never both see the same agent as least loaded. When every agent with capacity
+    is locked, it waits on them in turn (up to LOCKED_PICK_ATTEMPTS) instead of giving up:
+    the holders are short ticket creations, and the row is re-checked against the cap once
+    they commit.
+    """
+    loads = AgentLoad.objects.filter(
+        agent__role='agent',
+        agent__is_active=True,
+        weighted_load__lt=MAX_AGENT_WEIGHT_CAP,
+    ).select_related('agent').order_by('weighted_load', 'agent_id')
+    if not lock:
+        load = loads.first()
+    else:
+        load = loads.select_for_update(skip_locked=True, of=('self',)).first()
+        if load is None:
+            for agent_id in loads.values_list('agent_id', flat=True)[:LOCKED_PICK_ATTEMPTS]:
+                load = loads.select_for_update(of=('self',)).filter(agent_id=agent_id).first()
+                if load is not None:
+                    break
+
+    if load is None:
+        return None
+    agent = load.agent
+    agent.weighted_ticket_load = load.weighted_load
+    return agent
+
+
+def rebuild_agent_loads(agent_ids=None):
+    """
+    Recomputes weighted loads from the ticket table and overwrites the counters.
+    Covers every agent plus anyone else holding assigned tickets; pass `agent_ids`
+    to limit the rebuild. Returns the number of counter rows written.
+    """
+    users = CustomUser.objects.filter(Q(role='agent') | Q(assigned_tickets__isnull=False)).distinct()
+    if agent_ids is not None:
+        users = CustomUser.objects.filter(id__in=agent_ids)
+
+    weighted_load = Sum(
+        Case(
+            *[When(assigned_tickets__status__in=ACTIVE_STATUSES, assigned_tickets__priority=priority, then=weight)
+              for priority, weight in PRIORITY_WEIGHTS.items()],
+            default=0,
+            output_field=IntegerField(),
+        )
+    )
+    loads = CustomUser.objects.filter(id__in=users.values('id')).annotate(
+        weighted_load=weighted_load
+    ).values_list('id', 'weighted_load')
+
+    rows = [AgentLoad(agent_id=agent_id, weighted_load=load or 0) for agent_id, load in loads]
+    AgentLoad.objects.bulk_create(
+        rows,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['agent'],
+        update_fields=['weighted_load'],
+    )
+    return len(rows)
+
+
+def reserve_agent_capacity(agent_id, total, last_weight):
+    """
+    Atomically adds `total` to an agent's load, but only if the agent would have been below
+    MAX_AGENT_WEIGHT_CAP before each ticket making up `total` - i.e. if the load is still
+    below cap - (total - last_weight). Returns False, changing nothing, when a concurrent
+    assignment got there first.
+    """
+    return bool(AgentLoad.objects.filter(
+        agent_id=agent_id,
+        weighted_load__lt=MAX_AGENT_WEIGHT_CAP - (total - last_weight),
+    ).update(weighted_load=F('weighted_load') + total))
+
+
+def _available_agents():
+    # Min-heap of (load, agent_id, username) for agents with capacity left
+    heap = [
+        (load.weighted_load, load.agent_id, load.agent.username)
+        for load in AgentLoad.objects.filter(
+            agent__role='agent',
+            agent__is_active=True,
+            weighted_load__lt=MAX_AGENT_WEIGHT_CAP,
+        ).select_related('agent')
+    ]
+    heapq.heapify(heap)
+    return heap
+
+
+def assign_backlog(system_user, batch_size=ASSIGNMENT_BATCH_SIZE):
+    """
+    Assigns the unassigned backlog (status 'open', oldest first) in batches. Safe to run
+    in several workers at once.
+
+    Each batch claims a slice of the backlog with SELECT ... FOR UPDATE SKIP LOCKED, so
+    concurrent workers take disjoint slices. Agent loads are read into a min-heap; each ticket
+    goes to the least-loaded agent, whose load grows by the ticket's weight and who drops out
+    once they reach the cap. Each agent's share is then reserved with one conditional UPDATE;
+    if another worker used that capacity in the meantime, those tickets are released for a
+    later batch instead of overloading the agent, and a batch that wins no capacity at all
+    ends this run.
+
+    Every batch is written with one bulk_update of tickets, one bulk_create of the
+    AUTOMATED ASSIGNMENT comments and lifecycle events, one counter update per agent
+    touched and one rollup update per dashboard bucket and agent statistic touched.
+    Returns a summary dict with the number assigned and the assignment rate.
+    """
+    started = time.monotonic()
+
+    backlog = Ticket.objects.filter(status='open', assigned_to__isnull=True).order_by('created_at', 'id')
+
+    assigned = 0
+    while True:
+        # Re-read loads every batch so capacity used by other workers is seen
+        heap = _available_agents()
+        if not heap:
+            break
+
+        with transaction.atomic():
+            # Assigned tickets leave the filter and locked ones are skipped, so the head
+            # of the backlog is always this worker's next slice
+            batch = list(
+                backlog.select_for_update(skip_locked=True)
+                .only('id', 'title', 'priority', 'status', 'create_by', 'assigned_to', 'created_at', 'updated_at')[:batch_size]
+            )
+            if not batch:
+                break
+
+            plan = {}
+            for ticket in batch:
+                if not heap:
+                    break
+                load, agent_id, username = heapq.heappop(heap)
+                weight = ticket_weight('assigned', ticket.priority)
+                plan.setdefault(agent_id, (username, []))[1].append((ticket, weight))
+                if load + weight < MAX_AGENT_WEIGHT_CAP:
+                    heapq.heappush(heap, (load + weight, agent_id, username))
+
+            now = timezone.now()
+            tickets, comments, events, rollup_deltas = [], [], [], Counter()
+            # Reserve in agent order so concurrent workers lock counter rows in the same order
+            for agent_id in sorted(plan):
+                username, share = plan[agent_id]
+                if not reserve_agent_capacity(agent_id, sum(w for _, w in share), share[-1][1]):
+                    continue
+                for ticket, _ in share:
+                    ticket.assigned_to_id = agent_id
+                    ticket.status = 'assigned'
+                    ticket.updated_at = now
+                    tickets.append(ticket)
+                    comments.append(Comment(
+                        ticket=ticket,
+                        user=system_user,
+                        text=f"AUTOMATED ASSIGNMENT: This ticket was unassigned and has now been assigned to {username}.",
+                    ))
+                    old_state = {'status': 'open', 'priority': ticket.priority, 'created_at': ticket.created_at, 'assigned_to_id': None}
+                    new_state = dict(old_state, status='assigned', assigned_to_id=agent_id)
+                    rollup_deltas.update(rollup_delta(old_state, new_state))
+                    events.extend(state_events(ticket.id, old_state, new_state, at=now))
+
+            Ticket.objects.bulk_update(tickets, ['assigned_to', 'status', 'updated_at'], batch_size=batch_size)
+            Comment.objects.bulk_create(comments, batch_size=batch_size)
+            TicketEvent.objects.bulk_create(events, batch_size=batch_size)
+            apply_rollup_deltas(rollup_deltas)
+
+            if live.enabled():
+                names = live.usernames([t.create_by_id for t in tickets] + list(plan))
+                live.publish([
+                    live.ticket_event('assigned', t.id, t.create_by_id, (t.assigned_to_id,), **live.ticket_row(t, names))
+                    for t in tickets
+                ])
+        assigned += len(tickets)
+
+        if not tickets:
+            # Every reservation lost to other workers: they are draining the backlog, leave it to them
+            break
+
+    elapsed = time.monotonic() - started
+    return {
+        'assigned': assigned,
+        'seconds': round(elapsed, 3),
+        'tickets_per_second': round(assigned / elapsed, 1) if elapsed else 0.0,
+    }
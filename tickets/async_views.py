@@ -0,0 +1,129 @@
+# tickets/async_views.py
+"""
+Async versions of the ticket creation and detail views, routed instead of the sync ones
+when USE_ASYNC_VIEWS is on (see urls.py). They are meant for the ASGI deployment profile
+(gunicorn_asgi.conf.py), where a worker awaits the classifier and the database without
+holding a thread per request; under WSGI every request would get its own event loop.
+
+Reads go through the async ORM. Ticket creation stays in the transactional
+services.create_ticket, run with sync_to_async, because the async ORM can't hold a
+transaction and the agent pick needs its row lock.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import aget_object_or_404, redirect, render
+
+from . import classifier_metrics, services
+from .classifier import ClassifierError, classify_priority
+from .decorators import role_required
+from .models import Comment, Ticket
+from .pagination import akeyset_paginate
+from .tasks import PROVISIONAL_PRIORITY, enqueue_priority_classification
+from .views import COMMENT_KEYS, COMMENT_PAGE_SIZE
+
+
+def _create_ticket(title, description, priority, user):
+    ticket = services.create_ticket(
+        title=title,
+        description=description,
+        priority=priority or PROVISIONAL_PRIORITY,
+        create_by=user,
+    )
+    if priority is None:
+        enqueue_priority_classification(ticket.pk)
+    return ticket
+
+
+@login_required(login_url='login_view')
+@role_required(allowed_roles=['customer'])
+async def create_ticket(request):
+    if request.method == "POST":
+        title = request.POST.get('title')
+        description = request.POST.get('description')
+
+        if not title or not description:
+            messages.error(request, "Title and description are required.")
+            return render(request, 'create_ticket.html', {'title': title, 'description': description})
+
+        # Classify inline: cache, local model, then the upstream call within its latency
+        # budget. Only if that fails does the ticket take the provisional priority and the
+        # Celery classification path.
+        try:
+            priority = await classify_priority(title, description, request.user.role)
+        except ClassifierError as e:
+            print(f"Inline classification failed, queueing it instead: {e}")
+            priority = None
+        await classifier_metrics.apublish()
+
+        try:
+            ticket = await sync_to_async(_create_ticket)(title, description, priority, request.user)
+        except Exception as e:
+            messages.error(request, f"An error occurred while creating the ticket: {e}")
+            return render(request, 'create_ticket.html', {'title': title, 'description': description})
+
+        if priority is None:
+            messages.success(request, "Ticket created successfully! Its priority is being determined by AI and it will be assigned to an agent shortly.")
+        else:
+            messages.success(request, f"Ticket created successfully with {priority} priority.")
+        return redirect('ticket_detail', pk=ticket.pk)
+
+    return render(request, 'create_ticket.html')
+
+
+async def _comment_page(ticket, cursor=None):
+    # Same page as views._comment_page, fetched with the async ORM
+    comments, older_cursor, _ = await akeyset_paginate(
+        Comment.objects.filter(ticket=ticket).select_related('user'),
+        COMMENT_KEYS,
+        COMMENT_PAGE_SIZE,
+        after=cursor,
+    )
+    comments.reverse()
+    return comments, older_cursor
+
+
+@login_required(login_url='login_view')
+@role_required(allowed_roles=['customer', 'agent', 'admin'])
+async def ticket_detail(request, pk):
+    ticket = await aget_object_or_404(Ticket.objects.select_related('create_by', 'assigned_to'), id=pk)
+
+    reopenable_statuses = ['resolved', 'closed']
+
+    if request.user.role == 'customer' and ticket.create_by_id != request.user.pk:
+        messages.error(request, "You do not have permission to view this ticket.")
+        return redirect('dashboard')
+
+    # Attributes any status change below to this user in the ticket's event log
+    ticket._actor = request.user
+
+    if request.method == "POST":
+        if 'comment_text' in request.POST:
+            comment_text = request.POST.get('comment_text')
+            if not comment_text:
+                messages.error(request, "Comment cannot be empty.")
+            else:
+                try:
+                    await Comment.objects.acreate(text=comment_text, ticket=ticket, user=request.user)
+                    messages.success(request, "Comment added successfully!")
+                    if request.user.role == 'customer' and ticket.status in reopenable_statuses:
+                        ticket.status = 'reopened'
+                        await ticket.asave()
+                        messages.info(request, "Ticket has been automatically reopened due to your new comment.")
+                    return redirect('ticket_detail', pk=ticket.pk)
+                except Exception as e:
+                    messages.error(request, f"Error adding comment: {e}")
+
+        elif 'reopen_ticket' in request.POST and request.user.role == 'customer' and ticket.status in reopenable_statuses:
+            ticket.status = 'reopened'
+            await ticket.asave()
+            messages.success(request, "Ticket has been reopened!")
+            return redirect('ticket_detail', pk=ticket.pk)
+
+    comments, older_comments_cursor = await _comment_page(ticket)
+    return render(request, 'ticket_detail.html', {
+        'ticket': ticket,
+        'comments': comments,
+        'older_comments_cursor': older_comments_cursor,
+        'reopenable_statuses': reopenable_statuses,
+    })
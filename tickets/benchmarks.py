@@ -0,0 +1,180 @@
+# tickets/benchmarks.py
+"""
+Micro-benchmarks of the hot paths, run by the benchmark_hot_paths command.
+
+Every run happens inside a transaction that is rolled back afterwards, so benchmarks that
+write (ticket creation, escalation, assignment) leave the dataset exactly as they found it
+and runs stay comparable. Only the operation itself is timed; each benchmark's setup (fresh
+agents, due tickets, a backlog) runs in the same transaction but outside the timer.
+"""
+import io
+import statistics
+import time
+from contextlib import redirect_stdout
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from . import services
+from .assignment import MAX_AGENT_WEIGHT_CAP
+from .models import AgentLoad, Comment, CustomUser, Ticket
+from .sla import ESCALATION_STEPS
+from .synthetic import create_users
+from .tasks import assign_unassigned_tickets, check_overdue_tickets
+
+# Overdue tickets made due for the escalation benchmark
+ESCALATION_SAMPLE = 1000
+
+# Fresh, idle agents added for the assignment benchmarks, and new tickets put in the backlog
+BENCH_AGENTS = 100
+BACKLOG_SAMPLE = 1000
+
+
+def _percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(share * (len(ordered) - 1))))]
+
+
+class _QueryCounter:
+    """execute_wrapper counting queries; unlike CaptureQueriesContext it keeps no log and has no limit."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(operation, setup=None, repeat=5, warmup=1):
+    """
+    Times `operation(state)` where `state = setup()`, `warmup + repeat` times, each in its
+    own rolled-back transaction. Returns timing stats in ms, the query count of the last run
+    and its result.
+    """
+    timings = []
+    for n in range(warmup + repeat):
+        with transaction.atomic():
+            state = setup() if setup else None
+            # Tasks report progress with print(); keep it out of the benchmark output
+            queries = _QueryCounter()
+            with connection.execute_wrapper(queries), redirect_stdout(io.StringIO()):
+                started = time.perf_counter()
+                result = operation(state)
+                elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        if n >= warmup:
+            timings.append(elapsed * 1000)
+    return {
+        'runs': repeat,
+        'min_ms': round(min(timings), 2),
+        'median_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(_percentile(timings, 0.95), 2),
+        'max_ms': round(max(timings), 2),
+        'queries': queries.count,
+        'result': result,
+    }
+
+
+def _get(client, url):
+    response = client.get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f"GET {url} returned {response.status_code}.")
+    return len(response.content)
+
+
+def _client(user):
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+def _fresh_agents():
+    # Idle agents, so the pick and the batch engine always have capacity to work with
+    return create_users('benchmark-agent-', 'agent', BENCH_AGENTS)
+
+
+def _clear_escalation_queue():
+    Ticket.objects.filter(escalate_at__lte=timezone.now()).update(escalate_at=None)
+
+
+def _due_tickets():
+    _clear_escalation_queue()
+    ids = list(
+        Ticket.objects.filter(status__in=Ticket.ACTIVE_STATUSES, priority__in=list(ESCALATION_STEPS))
+        .values_list('id', flat=True)[:ESCALATION_SAMPLE]
+    )
+    Ticket.objects.filter(id__in=ids).update(escalate_at=timezone.now() - timedelta(minutes=1))
+
+
+def _backlog():
+    _fresh_agents()
+    customer = CustomUser.objects.filter(role='customer').first()
+    Ticket.objects.bulk_create([
+        Ticket(title=f'Benchmark backlog {n}', description='...', create_by=customer, status='open')
+        for n in range(BACKLOG_SAMPLE)
+    ])
+
+
+def hot_paths():
+    """
+    [(name, operation, setup)] for the dataset in the database. Views are requested as the
+    busiest user of each role, the detail page for the ticket with the longest thread.
+    """
+    admin = CustomUser.objects.filter(role='admin').order_by('id').first()
+    agent = (
+        CustomUser.objects.filter(role='agent', load__weighted_load__lte=MAX_AGENT_WEIGHT_CAP)
+        .order_by('-load__weighted_load', 'id').first()
+    )
+    customer = (
+        Ticket.objects.values('create_by').annotate(n=Count('id')).order_by('-n').values_list('create_by', flat=True).first()
+    )
+    thread = (
+        Comment.objects.values('ticket').annotate(n=Count('id')).order_by('-n').values_list('ticket', flat=True).first()
+    )
+    if admin is None or agent is None or customer is None:
+        raise RuntimeError("Benchmarks need an admin, an agent and a customer with tickets; run generate_synthetic_data first.")
+
+    admin_client = _client(admin)
+    agent_client = _client(agent)
+    customer_client = _client(CustomUser.objects.get(pk=customer))
+    creator = CustomUser.objects.get(pk=customer)
+
+    benchmarks = [
+        ('dashboard (admin)', lambda _: _get(admin_client, reverse('dashboard')), None),
+        ('dashboard (agent)', lambda _: _get(agent_client, reverse('dashboard')), None),
+        ('dashboard (customer)', lambda _: _get(customer_client, reverse('dashboard')), None),
+        ('agent_performance_dashboard', lambda _: _get(admin_client, reverse('agent_performance_dashboard')), None),
+        ('ticket_trend_dashboard', lambda _: _get(admin_client, reverse('ticket_trend_dashboard')), None),
+        # Load-weighted pick of an agent plus the single INSERT, as on every new ticket
+        ('create_ticket with assignment', lambda _: services.create_ticket('Benchmark ticket', '...', creator).assigned_to_id is not None, _fresh_agents),
+        ('check_overdue_tickets (idle)', lambda _: check_overdue_tickets(), _clear_escalation_queue),
+        (f'check_overdue_tickets ({ESCALATION_SAMPLE} due)', lambda _: check_overdue_tickets(), _due_tickets),
+        ('assign_unassigned_tickets', lambda _: (assign_unassigned_tickets() or {}).get('assigned', 0), _backlog),
+    ]
+    if thread is not None:
+        benchmarks.insert(3, ('ticket_detail', lambda _: _get(admin_client, reverse('ticket_detail', args=[thread])), None))
+    return benchmarks
+
+
+def run_all(repeat=5, warmup=1, only=None):
+    """Runs every hot-path benchmark (or those whose name contains `only`). Returns {name: stats}."""
+    results = {}
+    for name, operation, setup in hot_paths():
+        if only and only not in name:
+            continue
+        results[name] = measure(operation, setup, repeat, warmup)
+    return results
+
+
+def dataset_size():
+    return {
+        'tickets': Ticket.objects.count(),
+        'comments': Comment.objects.count(),
+        'agents': AgentLoad.objects.count(),
+        'users': CustomUser.objects.count(),
+    }
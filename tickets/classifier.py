@@ -0,0 +1,200 @@
+# tickets/classifier.py
+import os
+import json
+import time
+import asyncio
+import aiohttp
+from django.conf import settings
+from .ai_client import classifier_client
+from .circuit_breaker import CircuitBreaker
+from .local_classifier import get_local_model
+from .prediction_cache import prediction_cache
+
+VALID_PRIORITIES = ['low', 'medium', 'high']
+
+classifier_breaker = CircuitBreaker(
+    'gemini',
+    failure_threshold=settings.GEMINI_BREAKER_FAILURE_THRESHOLD,
+    slow_call_threshold=settings.GEMINI_BREAKER_SLOW_CALL,
+    cooldown=settings.GEMINI_BREAKER_COOLDOWN,
+)
+
+
+class ClassifierError(Exception):
+    """Raised when the upstream classifier can't give us a usable priority."""
+
+
+class ClassifierUnavailable(ClassifierError):
+    """Raised without calling upstream while the classifier's circuit breaker is open."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Gemini circuit breaker is open; retry in {retry_after:.0f}s.")
+        self.retry_after = retry_after
+
+
+def build_prompt(title, description, user_role):
+    return f"""
+    Analyze the following support ticket details and determine its priority (high, medium, or low).
+    Consider the title, description, and the role of the user creating the ticket.
+
+    Use these guidelines for priority:
+    - High: Critical system down, security breach, major disruption affecting many users, production issue.
+    - Medium: Service degradation, minor bugs, issues affecting some users, non-critical errors.
+    - Low: General questions, feature requests, cosmetic issues, minor non-critical problems.
+
+    User Role: {user_role}
+    Ticket Title: {title}
+    Ticket Description: {description}
+
+    Provide the output as a JSON object with a single key "priority" and its value.
+    Example: {{"priority": "high"}}
+    """
+
+
+def build_payload(title, description, user_role):
+    return {
+        "contents": [
+            {
+                "role": "user",
+                "parts": [{"text": build_prompt(title, description, user_role)}]
+            }
+        ],
+        "generationConfig": {
+            "responseMimeType": "application/json",
+            "responseSchema": {
+                "type": "OBJECT",
+                "properties": {
+                    "priority": {
+                        "type": "STRING",
+                        "enum": VALID_PRIORITIES
+                    }
+                },
+                "required": ["priority"]
+            }
+        }
+    }
+
+
+def parse_response(result):
+    """
+    Pulls the priority out of a generateContent response body.
+    Raises ClassifierError when the structure or the value is unusable.
+    """
+    try:
+        json_string = result["candidates"][0]["content"]["parts"][0]["text"]
+    except (KeyError, IndexError, TypeError):
+        raise ClassifierError("Gemini response structure unexpected or missing content.")
+
+    try:
+        predicted_priority = json.loads(json_string).get("priority")
+    except (json.JSONDecodeError, AttributeError) as e:
+        raise ClassifierError(f"JSON decode error from Gemini response: {e}")
+
+    if predicted_priority not in VALID_PRIORITIES:
+        raise ClassifierError(f"Gemini returned an invalid priority: {predicted_priority}.")
+    return predicted_priority
+
+
+# Words that push a ticket up a priority level, used by the local fallback and the offline stub
+HIGH_PRIORITY_KEYWORDS = ('down', 'outage', 'breach', 'security', 'production', 'critical', 'urgent', 'data loss')
+MEDIUM_PRIORITY_KEYWORDS = ('error', 'bug', 'slow', 'fail', 'broken', 'degraded', 'crash')
+
+def keyword_priority(title, description):
+    """
+    Cheap keyword heuristic mirroring the prompt's guidelines. No network involved.
+    """
+    text = f"{title} {description}".lower()
+    if any(word in text for word in HIGH_PRIORITY_KEYWORDS):
+        return 'high'
+    if any(word in text for word in MEDIUM_PRIORITY_KEYWORDS):
+        return 'medium'
+    return 'low'
+
+
+async def request_priority(title, description, user_role):
+    """
+    Asks the Gemini API for a priority.
+    Raises ClassifierError on any upstream failure so callers can decide whether to retry or fall back.
+    """
+    api_key = os.environ.get('GEMINI_API_KEY')
+    api_url = f"{settings.GEMINI_API_URL}?key={api_key}"
+
+    try:
+        result = await classifier_client.post_json(api_url, build_payload(title, description, user_role))
+    except asyncio.TimeoutError:
+        raise ClassifierError("Gemini API call timed out.")
+    except aiohttp.ClientError as e:
+        raise ClassifierError(f"HTTP error during Gemini API call: {e}")
+    except json.JSONDecodeError as e:
+        raise ClassifierError(f"JSON decode error from Gemini response: {e}")
+
+    return parse_response(result)
+
+
+async def classify_priority(title, description, user_role):
+    """
+    The guarded path to the classifier: prediction cache first, then the local model when
+    it is at least LOCAL_PRIORITY_MIN_CONFIDENCE sure, then the circuit breaker and the
+    upstream call within GEMINI_LATENCY_BUDGET seconds. Failures and slow calls count
+    towards opening the breaker. Raises ClassifierUnavailable while it is open and
+    ClassifierError for any other failure.
+    """
+    cached = await prediction_cache.get(title, description, user_role)
+    if cached is not None:
+        return cached
+
+    local_model = get_local_model()
+    if local_model is not None:
+        local_priority, confidence = local_model.predict(title, description)
+        if confidence >= settings.LOCAL_PRIORITY_MIN_CONFIDENCE:
+            return local_priority
+
+    if not classifier_breaker.allow():
+        raise ClassifierUnavailable(classifier_breaker.retry_after())
+
+    started = time.monotonic()
+    try:
+        predicted_priority = await asyncio.wait_for(
+            request_priority(title, description, user_role),
+            timeout=settings.GEMINI_LATENCY_BUDGET,
+        )
+    except asyncio.TimeoutError:
+        classifier_breaker.record_failure()
+        raise ClassifierError(f"Gemini API call exceeded its {settings.GEMINI_LATENCY_BUDGET}s latency budget.")
+    except asyncio.CancelledError:
+        # The client went away. Not an upstream failure, but a half-open trial left in
+        # flight would keep the breaker short-circuiting in this process for good
+        classifier_breaker.record_cancelled()
+        raise
+    except Exception:
+        classifier_breaker.record_failure()
+        raise
+    classifier_breaker.record_success(time.monotonic() - started)
+
+    await prediction_cache.set(title, description, user_role, predicted_priority)
+    return predicted_priority
+
+
+def fallback_priority(title, description):
+    """
+    Local priority used whenever the remote classifier can't answer. Costs microseconds:
+    the trained local model if there is one, otherwise the keyword heuristic.
+    """
+    local_model = get_local_model()
+    if local_model is not None:
+        return local_model.predict(title, description)[0]
+    return keyword_priority(title, description)
+
+
+# Function to predict priority using Gemini API
+async def predict_priority_ai(title, description, user_role):
+    try:
+        return await classify_priority(title, description, user_role)
+    except ClassifierUnavailable:
+        return fallback_priority(title, description)
+    except ClassifierError as e:
+        print(f"{e} Using local fallback priority.")
+        return fallback_priority(title, description)
+    except Exception as e:
+        print(f"An unexpected error occurred during Gemini API call: {e}")
+        return fallback_priority(title, description)
@@ -0,0 +1,158 @@
+# tickets/classifier_metrics.py
+"""
+Classifier counters gathered across processes, for the classifier_status endpoint.
+
+The upstream client stats, prediction cache counters and circuit breaker all live in the
+process that classifies, and that is mostly a Celery worker (or an ASGI worker creating
+tickets inline), not the web process answering classifier_status. So every process that
+classifies publishes a snapshot of its counters to a Redis key of its own, at most every
+PUBLISH_INTERVAL seconds; keys expire after SNAPSHOT_TTL, so stopped processes drop out.
+The endpoint reads them all and adds them up. Without CLASSIFIER_STATUS_REDIS_URL it can
+only report on the process serving the request, and says so.
+"""
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+
+import redis
+from django.conf import settings
+
+from .ai_client import classifier_client
+from .classifier import classifier_breaker
+from .prediction_cache import prediction_cache
+
+KEY_PREFIX = 'classifier-status:'
+
+# Seconds between two snapshots of the same process
+PUBLISH_INTERVAL = 10
+
+# Seconds a snapshot stays visible without being refreshed
+SNAPSHOT_TTL = 300
+
+# Seconds to stop publishing after Redis fails
+REDIS_RETRY_AFTER = 30
+
+_client = None
+_lock = threading.Lock()
+_next_publish = 0.0
+
+
+def enabled():
+    return bool(settings.CLASSIFIER_STATUS_REDIS_URL)
+
+
+def _process_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.CLASSIFIER_STATUS_REDIS_URL, socket_timeout=0.2, socket_connect_timeout=0.2)
+    return _client
+
+
+def process_snapshot():
+    """This process's client, cache and breaker counters."""
+    client = classifier_client.stats.snapshot()
+    return {
+        'process': _process_id(),
+        'published_at': round(time.time(), 1),
+        'client': client,
+        'cache': prediction_cache.stats(client['avg_latency_ms']),
+        'breaker': classifier_breaker.snapshot(),
+    }
+
+
+def _due():
+    # Claims the next publication slot for this process, if one is due
+    global _next_publish
+    with _lock:
+        if not enabled() or time.monotonic() < _next_publish:
+            return False
+        _next_publish = time.monotonic() + PUBLISH_INTERVAL
+        return True
+
+
+def _publish():
+    global _next_publish
+    try:
+        _redis().set(KEY_PREFIX + _process_id(), json.dumps(process_snapshot()), ex=SNAPSHOT_TTL)
+    except redis.RedisError as e:
+        with _lock:
+            _next_publish = time.monotonic() + REDIS_RETRY_AFTER
+        print(f"Could not publish classifier counters: {e}")
+
+
+def publish():
+    """Publishes this process's snapshot if PUBLISH_INTERVAL has passed. Call after classifying."""
+    if _due():
+        _publish()
+
+
+async def apublish():
+    """publish() for coroutines; the Redis write runs in a worker thread."""
+    if _due():
+        await asyncio.to_thread(_publish)
+
+
+def _totals(snapshots):
+    client = [s['client'] for s in snapshots]
+    cache = [s['cache'] for s in snapshots]
+    requests = sum(c['requests'] for c in client)
+    hits = sum(c['hits'] for c in cache)
+    lookups = hits + sum(c['misses'] for c in cache)
+    states = {}
+    for snapshot in snapshots:
+        states[snapshot['breaker']['state']] = states.get(snapshot['breaker']['state'], 0) + 1
+    return {
+        'client': {
+            'requests': requests,
+            'errors': sum(c['errors'] for c in client),
+            'timeouts': sum(c['timeouts'] for c in client),
+            'avg_latency_ms': round(sum(c['avg_latency_ms'] * c['requests'] for c in client if c['requests']) / requests, 2) if requests else None,
+            'max_latency_ms': max((c['max_latency_ms'] for c in client), default=0),
+        },
+        'cache': {
+            'hits': hits,
+            'misses': lookups - hits,
+            'hit_rate': round(hits / lookups, 4) if lookups else None,
+            'upstream_calls_saved': hits,
+            'latency_saved_ms': round(sum(c['latency_saved_ms'] or 0 for c in cache), 2),
+            'redis_errors': sum(c['redis_errors'] for c in cache),
+        },
+        # The breaker is per process: how many processes are in each state
+        'breaker': {
+            'processes_by_state': states,
+            'times_opened': sum(s['breaker']['times_opened'] for s in snapshots),
+            'short_circuited': sum(s['breaker']['short_circuited'] for s in snapshots),
+        },
+    }
+
+
+def collect():
+    """
+    Every process's latest snapshot plus totals. `scope` is 'all_processes' when read from
+    Redis, and 'this_process' when Redis isn't configured or can't be read.
+    """
+    own = process_snapshot()
+    snapshots, scope = {}, 'this_process'
+    if enabled():
+        try:
+            client = _redis()
+            keys = list(client.scan_iter(match=KEY_PREFIX + '*', count=500))
+            for value in client.mget(keys) if keys else []:
+                if value is not None:
+                    snapshot = json.loads(value)
+                    snapshots[snapshot['process']] = snapshot
+            scope = 'all_processes'
+        except redis.RedisError as e:
+            print(f"Could not read classifier counters: {e}")
+    # The serving process's own counters are fresher than what it last published
+    if scope == 'this_process' or own['client']['requests'] or own['cache']['hits'] or own['cache']['misses']:
+        snapshots[own['process']] = own
+    snapshots = sorted(snapshots.values(), key=lambda s: s['process'])
+    return {'scope': scope, 'processes': snapshots, 'totals': _totals(snapshots)}
@@ -1,12 +1,24 @@
 from django.shortcuts import redirect
 from functools import wraps
+from asgiref.sync import iscoroutinefunction
 
 def role_required(allowed_roles=['customer']):
     def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                # Resolve the user without blocking, and keep it on the request so templates
+                # and context processors reuse it instead of querying from async code
+                request.user = await request.auser()
+                if request.user.is_authenticated and request.user.role in allowed_roles:
+                    return await view_func(request, *args, **kwargs)
+                return redirect('login_view')
+            return async_wrapper
+
         @wraps(view_func)
         def wrapper(request, *args, **kwargs):
             if request.user.is_authenticated and request.user.role in allowed_roles:
                 return view_func(request, *args, **kwargs)
-            return redirect('login')
+            return redirect('login_view')
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
@@ -0,0 +1,81 @@
+# tickets/events.py
+"""
+Ticket lifecycle events and the timestamps denormalized from them.
+
+Events are derived from the same before/after state snapshots that drive the counters,
+so a save writes all of its events in one bulk INSERT, and bulk paths build them in memory
+alongside their other rows.
+"""
+from django.utils import timezone
+
+from .models import TicketEvent
+from .search import SYSTEM_USERNAME
+
+# Roles whose comment counts as a response to the customer
+RESPONDER_ROLES = ('agent', 'admin')
+
+# Statuses that stop the resolution clock
+RESOLVED_STATUSES = ('resolved', 'closed')
+
+# Which state field each change event reports
+EVENT_FIELDS = [
+    ('status', 'status'),
+    ('priority', 'priority'),
+    ('assigned', 'assigned_to_id'),
+]
+
+
+def _value(value):
+    return '' if value is None else str(value)
+
+
+def state_events(ticket_id, old_state, new_state, actor_id=None, at=None):
+    """
+    Unsaved TicketEvents for a ticket moving from `old_state` to `new_state` (the dict
+    snapshots kept by the ticket signals). An empty `old_state` means the ticket was just created.
+    """
+    at = at or timezone.now()
+    if not old_state:
+        events = [TicketEvent(ticket_id=ticket_id, kind='created', actor_id=actor_id, new_value=_value(new_state.get('status')), created_at=at)]
+        if new_state.get('assigned_to_id'):
+            events.append(TicketEvent(ticket_id=ticket_id, kind='assigned', actor_id=actor_id, new_value=_value(new_state['assigned_to_id']), created_at=at))
+        return events
+
+    return [
+        TicketEvent(
+            ticket_id=ticket_id, kind=kind, actor_id=actor_id,
+            old_value=_value(old_state.get(field)), new_value=_value(new_state.get(field)), created_at=at,
+        )
+        for kind, field in EVENT_FIELDS
+        if old_state.get(field) != new_state.get(field)
+    ]
+
+
+def resolved_at_for(old_status, new_status, resolved_at, now):
+    """
+    The resolved_at a ticket should carry after a status change: stamped when it first
+    reaches resolved/closed, kept while it moves between the two, cleared when it is reopened.
+    """
+    if new_status in RESOLVED_STATUSES:
+        return resolved_at if old_status in RESOLVED_STATUSES and resolved_at else now
+    return None
+
+
+def is_responder(role, username, user_id, ticket_creator_id):
+    """
+    The first-response rule: a comment is a response when staff other than the ticket's
+    creator wrote it, and not the system user that posts the automated comments.
+    """
+    return role in RESPONDER_ROLES and username != SYSTEM_USERNAME and user_id != ticket_creator_id
+
+
+def is_response(comment, ticket_creator_id):
+    return is_responder(comment.user.role, comment.user.username, comment.user_id, ticket_creator_id)
+
+
+def response_comments(comments, ticket_creator):
+    """
+    Narrows a Comment queryset to responses by the is_responder rule. `ticket_creator` is
+    the creator's id, or OuterRef('create_by') in a subquery over tickets.
+    """
+    return comments.filter(user__role__in=RESPONDER_ROLES).exclude(user=ticket_creator).exclude(user__username=SYSTEM_USERNAME)
@@ -0,0 +1,162 @@
+# tickets/export.py
+"""
+Streaming ticket exports (CSV or NDJSON), shared by the admin endpoint and the
+export_tickets command.
+
+Tickets are read in keyset batches of EXPORT_BATCH_SIZE ids, each its own short query, so
+an export never holds a long transaction or a server-side cursor open, and memory stays at
+one batch however many rows are exported. Point EXPORT_DB_ALIAS at a read replica to keep
+exports off the primary entirely.
+
+Under ASGI, Django consumes a sync streaming iterator by materializing it in a thread, which
+would buffer the whole export; astream_export is the async iterator to serve there instead.
+"""
+import csv
+import json
+from datetime import datetime, time
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Comment, Ticket
+
+EXPORT_BATCH_SIZE = 2000
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+TICKET_COLUMNS = [
+    ('id', 'id'),
+    ('title', 'title'),
+    ('description', 'description'),
+    ('status', 'status'),
+    ('priority', 'priority'),
+    ('created_by', 'create_by__username'),
+    ('assigned_to', 'assigned_to__username'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+    ('response_due_at', 'response_due_at'),
+    ('resolution_due_at', 'resolution_due_at'),
+    ('first_response_at', 'first_response_at'),
+    ('resolved_at', 'resolved_at'),
+]
+
+
+def _day_bound(value, name, end_of_day=False):
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(f"Invalid {name} date {value!r}; use YYYY-MM-DD.")
+    return timezone.make_aware(datetime.combine(day, time.max if end_of_day else time.min))
+
+
+def export_queryset(status=None, priority=None, agent=None, created_from=None, created_to=None):
+    """
+    Tickets matching the export filters. `agent` is a username, or 'unassigned'; the dates
+    are inclusive YYYY-MM-DD days. Raises ValueError for an unknown status, priority or date.
+    """
+    tickets = Ticket.objects.using(settings.EXPORT_DB_ALIAS).all()
+    if status:
+        if status not in dict(Ticket.STATUS_CHOICES):
+            raise ValueError(f"Unknown status {status!r}.")
+        tickets = tickets.filter(status=status)
+    if priority:
+        if priority not in dict(Ticket.PRIORITY_CHOICES):
+            raise ValueError(f"Unknown priority {priority!r}.")
+        tickets = tickets.filter(priority=priority)
+    if agent == 'unassigned':
+        tickets = tickets.filter(assigned_to__isnull=True)
+    elif agent:
+        tickets = tickets.filter(assigned_to__username=agent)
+    if created_from:
+        tickets = tickets.filter(created_at__gte=_day_bound(created_from, 'created_from'))
+    if created_to:
+        tickets = tickets.filter(created_at__lte=_day_bound(created_to, 'created_to', end_of_day=True))
+    return tickets
+
+
+def _serialize(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def iter_ticket_rows(tickets, include_comments=False, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yields one dict per ticket, in id order, optionally with a 'comments' list.
+    Each batch costs one ticket query and, with comments, one comment query.
+    """
+    fields = [field for _, field in TICKET_COLUMNS]
+    last_id = 0
+    while True:
+        batch = list(
+            tickets.filter(id__gt=last_id).order_by('id').values_list(*fields)[:batch_size].iterator(chunk_size=batch_size)
+        )
+        if not batch:
+            return
+        last_id = batch[-1][0]
+
+        comments = {}
+        if include_comments:
+            thread = Comment.objects.using(tickets.db).filter(
+                ticket_id__in=[row[0] for row in batch]
+            ).order_by('ticket_id', 'created_at', 'id').values_list('ticket_id', 'user__username', 'created_at', 'text')
+            for ticket_id, username, created_at, text in thread.iterator(chunk_size=batch_size):
+                comments.setdefault(ticket_id, []).append(
+                    {'user': username, 'created_at': created_at.isoformat(), 'text': text}
+                )
+
+        for row in batch:
+            record = {name: _serialize(value) for (name, _), value in zip(TICKET_COLUMNS, row)}
+            if include_comments:
+                record['comments'] = comments.get(row[0], [])
+            yield record
+
+
+class _Echo:
+    # csv.writer target that hands each formatted line straight back
+    def write(self, value):
+        return value
+
+
+def stream_export(tickets, export_format='csv', include_comments=False, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yields the export as text chunks: a header line then one line per ticket. In CSV the
+    comments, when included, are a JSON array in a final 'comments' column.
+    """
+    rows = iter_ticket_rows(tickets, include_comments, batch_size)
+    if export_format == 'ndjson':
+        for record in rows:
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+        return
+
+    columns = [name for name, _ in TICKET_COLUMNS] + (['comments'] if include_comments else [])
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for record in rows:
+        if include_comments:
+            record['comments'] = json.dumps(record['comments'], ensure_ascii=False)
+        yield writer.writerow([record[name] for name in columns])
+
+
+def _next_chunk(chunks, size):
+    return ''.join(islice(chunks, size))
+
+
+async def astream_export(tickets, export_format='csv', include_comments=False, batch_size=EXPORT_BATCH_SIZE):
+    """
+    stream_export as an async iterator, for responses served over ASGI. Each step produces
+    about one batch of lines in the sync thread (where the ORM runs) and hands it over
+    before the next batch is read.
+    """
+    chunks = stream_export(tickets, export_format, include_comments, batch_size)
+    try:
+        while True:
+            chunk = await sync_to_async(_next_chunk)(chunks, batch_size)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
@@ -0,0 +1,44 @@
+# tickets/gemini_stub.py
+"""
+A local stand-in for the Gemini generateContent endpoint, so priority classification
+can be exercised offline. It answers with the keyword heuristic in a Gemini-shaped body.
+
+For load tests it can add latency (a base plus uniform jitter) and fail a share of calls
+with the 503 Gemini returns when it is overloaded.
+"""
+import asyncio
+import json
+import random
+
+from aiohttp import web
+from .classifier import keyword_priority
+
+
+def _answer(body):
+    prompt = body["contents"][0]["parts"][0]["text"]
+    priority = keyword_priority(prompt.split("User Role:", 1)[-1], "")
+    return {
+        "candidates": [
+            {"content": {"role": "model", "parts": [{"text": json.dumps({"priority": priority})}]}}
+        ]
+    }
+
+
+def build_app(latency_ms=0, jitter_ms=0, error_rate=0, seed=None):
+    rng = random.Random(seed)
+
+    async def generate_content(request):
+        body = await request.json()
+        delay = latency_ms + rng.uniform(0, jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if rng.random() < error_rate:
+            return web.json_response(
+                {"error": {"code": 503, "message": "The model is overloaded. Please try again later.", "status": "UNAVAILABLE"}},
+                status=503,
+            )
+        return web.json_response(_answer(body))
+
+    app = web.Application()
+    app.router.add_post('/v1beta/models/{model}', generate_content)
+    return app
@@ -0,0 +1,277 @@
+# tickets/importer.py
+"""
+Bulk ticket import from CSV or NDJSON, in the column layout tickets/export.py writes.
+
+Records are validated and written in batches: one bulk_create each for tickets, comments,
+lifecycle events and search documents per batch. bulk_create sends no save signals, so
+everything the ticket signals would derive row by row (SLA deadlines, resolved_at,
+first_response_at, escalate_at, events, search text) is computed here in memory; the
+counters they would maintain are rebuilt once, with rebuild_counters(), after the last batch.
+write_tickets() is also the write path of the synthetic data generator.
+"""
+import csv
+import json
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .assignment import rebuild_agent_loads
+from .events import RESOLVED_STATUSES, RESPONDER_ROLES, is_responder, state_events
+from .models import Comment, CustomUser, Ticket, TicketEvent, TicketSearchDocument
+from .rollups import rebuild_agent_stats, rebuild_rollups
+from .search import SYSTEM_USERNAME
+from .sla import escalate_at_for, sla_deadlines
+
+IMPORT_BATCH_SIZE = 1000
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+# Fields stamped by auto_now/auto_now_add that imports must keep as given
+HISTORICAL_TIMESTAMPS = [
+    (Ticket, 'created_at'),
+    (Ticket, 'updated_at'),
+    (Comment, 'created_at'),
+]
+
+
+def read_records(source, import_format):
+    """
+    Yields one dict per ticket from an open text file. CSV comments stay a JSON array string,
+    parsed by TicketImporter.build(), so a malformed cell only rejects its own record.
+    """
+    if import_format == 'ndjson':
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+        return
+    yield from csv.DictReader(source)
+
+
+@contextmanager
+def historical_timestamps():
+    """Lets bulk_create write the given created_at/updated_at instead of stamping the current time."""
+    saved = []
+    for model, name in HISTORICAL_TIMESTAMPS:
+        field = model._meta.get_field(name)
+        saved.append((field, field.auto_now, field.auto_now_add))
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _comments(record):
+    """The record's comment list, parsed (once) from the JSON array string of a CSV row."""
+    comments = record.get('comments') or []
+    if isinstance(comments, str):
+        try:
+            comments = json.loads(comments)
+        except ValueError:
+            raise ValueError("Comments are not valid JSON.")
+        record['comments'] = comments
+    if not isinstance(comments, list):
+        raise ValueError("Comments must be a list.")
+    return comments
+
+
+def _usernames(record):
+    """
+    The usernames a record refers to. Raises ValueError for a record that isn't an object
+    or a username that isn't a string, before anything looks them up.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Record is not an object.")
+    names = [record.get('created_by'), record.get('assigned_to')]
+    names.extend(c.get('user') for c in _comments(record) if isinstance(c, dict))
+    for name in names:
+        if name is not None and not isinstance(name, str):
+            raise ValueError(f"Invalid username {name!r}.")
+    return {name for name in names if name}
+
+
+def _datetime(record, name, required=False):
+    value = record.get(name)
+    if not value:
+        if required:
+            raise ValueError(f"Missing {name}.")
+        return None
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise ValueError(f"Invalid {name} {value!r}.")
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+
+class TicketImporter:
+    """
+    Turns records into rows and writes them batch by batch. Usernames are resolved with one
+    query per batch and cached; with `create_users`, unknown ones become customer accounts
+    with unusable passwords instead of rejecting the record.
+    """
+
+    def __init__(self, create_users=False):
+        self.create_users = create_users
+        self.users = {}  # username -> (id, role)
+        self.statuses = dict(Ticket.STATUS_CHOICES)
+        self.priorities = dict(Ticket.PRIORITY_CHOICES)
+
+    def _resolve_users(self, usernames):
+        missing = usernames - set(self.users)
+        if not missing:
+            return
+        for user_id, username, role in CustomUser.objects.filter(username__in=missing).values_list('id', 'username', 'role'):
+            self.users[username] = (user_id, role)
+        missing -= set(self.users)
+        if missing and self.create_users:
+            password = make_password(None)
+            CustomUser.objects.bulk_create(
+                [CustomUser(username=username, role='customer', password=password) for username in sorted(missing)],
+                ignore_conflicts=True,
+            )
+            for user_id, username, role in CustomUser.objects.filter(username__in=missing).values_list('id', 'username', 'role'):
+                self.users[username] = (user_id, role)
+
+    def _user(self, username, what):
+        if username not in self.users:
+            raise ValueError(f"Unknown {what} {username!r}.")
+        return self.users[username]
+
+    def build(self, record):
+        """Validates one record. Returns (ticket, [(comment, username)]) or raises ValueError."""
+        title = (record.get('title') or '').strip()
+        if not title:
+            raise ValueError("Missing title.")
+        if len(title) > Ticket._meta.get_field('title').max_length:
+            raise ValueError("Title is too long.")
+        status = record.get('status') or 'open'
+        if status not in self.statuses:
+            raise ValueError(f"Unknown status {status!r}.")
+        priority = record.get('priority') or 'low'
+        if priority not in self.priorities:
+            raise ValueError(f"Unknown priority {priority!r}.")
+        if not record.get('created_by'):
+            raise ValueError("Missing created_by.")
+        creator_id, _ = self._user(record['created_by'], 'created_by')
+        assignee_id = None
+        if record.get('assigned_to'):
+            assignee_id, role = self._user(record['assigned_to'], 'assigned_to')
+            if role not in RESPONDER_ROLES:
+                raise ValueError(f"assigned_to {record['assigned_to']!r} is not an agent.")
+
+        created_at = _datetime(record, 'created_at', required=True)
+        updated_at = _datetime(record, 'updated_at') or created_at
+        response_due_at, resolution_due_at = sla_deadlines(priority, created_at)
+
+        comments = []
+        first_response = None
+        for item in _comments(record):
+            if not isinstance(item, dict) or not item.get('user'):
+                raise ValueError("Comments need a user.")
+            user_id, role = self._user(item['user'], 'comment user')
+            comment = Comment(user_id=user_id, text=item.get('text') or '', created_at=_datetime(item, 'created_at', required=True))
+            comments.append((comment, item['user']))
+            if is_responder(role, item['user'], user_id, creator_id) and (first_response is None or comment.created_at < first_response.created_at):
+                first_response = comment
+
+        resolved_at = None
+        if status in RESOLVED_STATUSES:
+            resolved_at = _datetime(record, 'resolved_at') or updated_at
+
+        ticket = Ticket(
+            title=title,
+            description=record.get('description') or '',
+            status=status,
+            priority=priority,
+            create_by_id=creator_id,
+            assigned_to_id=assignee_id,
+            created_at=created_at,
+            updated_at=updated_at,
+            response_due_at=_datetime(record, 'response_due_at') or response_due_at,
+            resolution_due_at=_datetime(record, 'resolution_due_at') or resolution_due_at,
+            first_response_at=_datetime(record, 'first_response_at') or (first_response.created_at if first_response else None),
+            resolved_at=resolved_at,
+        )
+        ticket.escalate_at = escalate_at_for(status, priority, ticket.resolution_due_at)
+        ticket._first_responder_id = first_response.user_id if first_response else None
+        return ticket, comments
+
+    def import_batch(self, records):
+        """
+        Validates and writes one batch in a single transaction.
+        Returns (imported, [(index in batch, error message)]).
+        """
+        candidates, rejected, usernames = [], [], set()
+        for index, record in enumerate(records):
+            try:
+                usernames |= _usernames(record)
+            except ValueError as e:
+                rejected.append((index, str(e)))
+            else:
+                candidates.append((index, record))
+        self._resolve_users(usernames)
+
+        built = []
+        for index, record in candidates:
+            try:
+                built.append(self.build(record))
+            except (ValueError, TypeError, AttributeError) as e:
+                rejected.append((index, str(e)))
+        rejected.sort()
+        if not built:
+            return 0, rejected
+
+        return write_tickets(built), rejected
+
+
+def write_tickets(built):
+    """
+    Writes [(unsaved ticket, [(unsaved comment, author username)])] in one transaction: the
+    tickets, their comments, lifecycle events and search documents, one bulk_create each.
+    Tickets may carry `_first_responder_id`, the actor of their first_response event.
+    Returns the number of tickets written.
+    """
+    with transaction.atomic(), historical_timestamps():
+        # Primary keys come back from the INSERT on PostgreSQL and SQLite 3.35+
+        tickets = Ticket.objects.bulk_create([ticket for ticket, _ in built])
+
+        comments, events, documents = [], [], []
+        for ticket, (_, thread) in zip(tickets, built):
+            state = {'status': ticket.status, 'assigned_to_id': ticket.assigned_to_id}
+            events.extend(state_events(ticket.id, {}, state, ticket.create_by_id, ticket.created_at))
+            if ticket.first_response_at:
+                events.append(TicketEvent(
+                    ticket_id=ticket.id, kind='first_response',
+                    actor_id=getattr(ticket, '_first_responder_id', None), created_at=ticket.first_response_at,
+                ))
+            for comment, _ in thread:
+                comment.ticket_id = ticket.id
+                comments.append(comment)
+            documents.append(TicketSearchDocument(
+                ticket_id=ticket.id, title=ticket.title, description=ticket.description,
+                comments=''.join(
+                    f'\n{comment.text}'
+                    for comment, username in sorted(thread, key=lambda c: c[0].created_at)
+                    if username != SYSTEM_USERNAME
+                ),
+            ))
+
+        Comment.objects.bulk_create(comments)
+        TicketEvent.objects.bulk_create(events)
+        TicketSearchDocument.objects.bulk_create(documents)
+    return len(tickets)
+
+
+def rebuild_counters():
+    """
+    Rebuilds what bulk writes skip: agent loads, dashboard rollups and agent statistics.
+    Returns (agents, days) rebuilt.
+    """
+    with transaction.atomic():
+        agents = rebuild_agent_loads()
+    days = rebuild_rollups()
+    rebuild_agent_stats()
+    return agents, days
@@ -0,0 +1,134 @@
+# tickets/instrumentation.py
+"""
+Per-request measurements collected by tickets.middleware.RequestMetricsMiddleware.
+
+The middleware opens a RequestMetrics for each request in a context variable. Context
+variables follow a request across sync_to_async/async_to_sync hops, so queries, template
+renders and external calls are attributed to the right request under WSGI and ASGI alike:
+
+- every database connection gets an execute_wrapper when it is opened (record_query),
+- the Django template backend's render is timed once per top-level render,
+- external services report through external_call() / record_external_call().
+
+Outside a request (Celery, management commands) nothing is recorded.
+"""
+import contextvars
+import heapq
+import time
+from contextlib import contextmanager
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template
+
+# Longest SQL kept per slow query in the log line
+MAX_SQL_LENGTH = 500
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self, slow_query_count):
+        self.started = time.perf_counter()
+        self.slow_query_count = slow_query_count
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.external_seconds = 0.0
+        self.external_calls = 0
+        self._slowest = []  # min-heap of (seconds, n, sql)
+        self._template_depth = 0
+
+    def add_query(self, sql, seconds):
+        self.query_count += 1
+        self.db_seconds += seconds
+        entry = (seconds, self.query_count, sql)
+        if len(self._slowest) < self.slow_query_count:
+            heapq.heappush(self._slowest, entry)
+        elif self._slowest and seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def slowest_queries(self):
+        return [
+            {'ms': round(seconds * 1000, 2), 'sql': sql[:MAX_SQL_LENGTH]}
+            for seconds, _, sql in sorted(self._slowest, reverse=True)
+        ]
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def start(slow_query_count=3):
+    """Starts collecting for the current request. Returns the token for stop()."""
+    return _current.set(RequestMetrics(slow_query_count))
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def current():
+    """The RequestMetrics of the request being served, or None."""
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - started)
+
+
+def record_external_call(seconds):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.external_calls += 1
+        metrics.external_seconds += seconds
+
+
+@contextmanager
+def external_call():
+    """Times the enclosed call to an outside service (HTTP API, Redis) as external time."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_external_call(time.perf_counter() - started)
+
+
+def _install_query_wrapper(sender, connection, **kwargs):
+    # Connections outlive requests, so the wrapper stays installed and checks for a request itself.
+    # It goes first so execute_wrapper() blocks, which pop the last wrapper, never remove it.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+_original_render = Template.render
+
+
+def _timed_render(self, context=None, request=None):
+    metrics = _current.get()
+    if metrics is None:
+        return _original_render(self, context, request)
+    # Only the outermost render counts, so nested renders aren't added twice
+    metrics._template_depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context, request)
+    finally:
+        metrics._template_depth -= 1
+        if not metrics._template_depth:
+            metrics.template_seconds += time.perf_counter() - started
+
+
+def install():
+    """Hooks the database connections and template rendering. Safe to call more than once."""
+    connection_created.connect(_install_query_wrapper, dispatch_uid='tickets.instrumentation')
+    for connection in connections.all(initialized_only=True):
+        if connection.connection is not None:
+            _install_query_wrapper(None, connection)
+    Template.render = _timed_render
@@ -0,0 +1,147 @@
+# tickets/live.py
+"""
+Live ticket updates for the dashboards, fanned out through Redis pub/sub.
+
+Write paths call publish() with small ticket events (created, assigned, updated, escalated,
+commented). They are sent after the transaction commits, to one channel per user involved
+(the creator and the assignees before and after) plus a staff channel that every admin
+follows, so each browser only receives tickets it is allowed to see. The SSE view
+subscribes one Redis connection per open dashboard and relays the events; the dashboard
+patches its rows in place instead of reloading.
+
+Live updates are best effort: without LIVE_UPDATES_REDIS_URL, or while Redis is failing,
+publishing is a no-op and the dashboards still work by reloading.
+"""
+import json
+import time
+
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.db import transaction
+
+from .instrumentation import external_call
+from .models import CustomUser, Ticket
+
+CHANNEL_PREFIX = 'ticket-live:'
+STAFF_CHANNEL = CHANNEL_PREFIX + 'staff'
+
+# Seconds between SSE keep-alive comments, so proxies don't close an idle stream
+KEEPALIVE_SECONDS = 20
+
+# Seconds to stop publishing after Redis fails
+REDIS_RETRY_AFTER = 30
+
+_client = None
+_redis_down_until = 0.0
+
+
+def user_channel(user_id):
+    return f'{CHANNEL_PREFIX}user:{user_id}'
+
+
+def channels_for_user(user):
+    """The channels a user's dashboard follows: their own, and the staff channel for admins."""
+    channels = [user_channel(user.pk)]
+    if user.role == 'admin':
+        channels.append(STAFF_CHANNEL)
+    return channels
+
+
+def ticket_event(kind, ticket_id, creator_id, assignee_ids=(), **data):
+    """
+    One event for publish(). `assignee_ids` should hold the assignee before and after the
+    change, so an agent who loses a ticket hears about it too; `data` is the payload.
+    """
+    channels = {STAFF_CHANNEL, user_channel(creator_id)}
+    channels.update(user_channel(user_id) for user_id in assignee_ids if user_id)
+    return channels, {'kind': kind, 'ticket': ticket_id, **data}
+
+
+def enabled():
+    return bool(settings.LIVE_UPDATES_REDIS_URL)
+
+
+def usernames(user_ids):
+    """{id: username} for the given user ids, in one query."""
+    user_ids = {user_id for user_id in user_ids if user_id}
+    return dict(CustomUser.objects.filter(id__in=user_ids).values_list('id', 'username')) if user_ids else {}
+
+
+def ticket_row(ticket, names=None):
+    """
+    The dashboard columns of `ticket`, for events that may add or move its row. Usernames
+    come from `names`, then from already loaded relations, and only then from a query.
+    """
+    names = dict(names or {})
+    missing = []
+    for field in ('create_by', 'assigned_to'):
+        user_id = getattr(ticket, f'{field}_id')
+        if user_id and user_id not in names:
+            if getattr(Ticket, field).is_cached(ticket):
+                names[user_id] = getattr(ticket, field).username
+            else:
+                missing.append(user_id)
+    names.update(usernames(missing))
+    return {
+        'title': ticket.title,
+        'status': ticket.status,
+        'priority': ticket.priority,
+        'created_by_id': ticket.create_by_id,
+        'created_by': names.get(ticket.create_by_id),
+        'assigned_to_id': ticket.assigned_to_id,
+        'assigned_to': names.get(ticket.assigned_to_id),
+    }
+
+
+def _redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.LIVE_UPDATES_REDIS_URL, socket_timeout=0.2, socket_connect_timeout=0.2)
+    return _client
+
+
+def _send(events):
+    global _redis_down_until
+    if _redis_down_until > time.monotonic():
+        return
+    try:
+        # One round-trip per batch of events, however many channels they go to
+        pipe = _redis().pipeline(transaction=False)
+        for channels, payload in events:
+            message = json.dumps(payload, default=str)
+            for channel in channels:
+                pipe.publish(channel, message)
+        with external_call():
+            pipe.execute()
+    except redis.RedisError as e:
+        _redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+        print(f"Live updates unavailable, dropping {len(events)} events: {e}")
+
+
+def publish(events):
+    """Sends ticket_event()s once the current transaction commits; events of a rolled-back change are never seen."""
+    if events and enabled():
+        transaction.on_commit(lambda: _send(events))
+
+
+async def stream(user):
+    """
+    Async generator of SSE frames for `user`'s channels: one `data:` frame per event, and a
+    comment line every KEEPALIVE_SECONDS while nothing happens.
+    """
+    client = redis.asyncio.Redis.from_url(settings.LIVE_UPDATES_REDIS_URL)
+    pubsub = client.pubsub()
+    try:
+        await pubsub.subscribe(*channels_for_user(user))
+        yield 'retry: 5000\n\n'
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=KEEPALIVE_SECONDS)
+            if message is None:
+                yield ': keep-alive\n\n'
+            else:
+                yield f"data: {message['data'].decode()}\n\n"
+    finally:
+        # Runs when the client disconnects and the server cancels the stream
+        await pubsub.aclose()
+        await client.aclose()
@@ -0,0 +1,173 @@
+# tickets/loadtest.py
+"""
+An HTTP load test of the ticket flow, run by the load_test command against a running
+server (e.g. gunicorn with a given worker count).
+
+Each virtual user is one customer with its own cookie session. It logs in, then loops:
+open the create form, POST a ticket, follow the redirect to its detail page, and post
+comments on it, following each redirect back like a browser would. Paths come from
+reverse() on tickets/urls.py, and every request is reported under its method and route
+name, so the report lines up with the views. Redirects are followed by hand so each hop is
+timed on its own route.
+"""
+import asyncio
+import random
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlparse
+
+import aiohttp
+from django.urls import Resolver404, resolve, reverse
+
+from .synthetic import CUSTOMER_LINES, PROBLEMS, SUBJECTS
+
+# Requests that take longer than this count as errors
+REQUEST_TIMEOUT = 60
+
+
+def _percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(share * (len(ordered) - 1))))]
+
+
+def route_name(path):
+    try:
+        return resolve(urlparse(path).path).url_name
+    except Resolver404:
+        return urlparse(path).path
+
+
+class LoadTestResults:
+    def __init__(self):
+        self.latencies = defaultdict(list)  # 'METHOD route' -> [ms]
+        self.errors = Counter()  # 'METHOD route' -> count
+        self.error_reasons = Counter()  # 'METHOD route: reason' -> count
+        self.tickets_created = 0
+        self.comments_posted = 0
+        self.started = time.monotonic()
+        self.finished = None
+
+    def elapsed(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    def summary(self):
+        """Per route: requests, errors, requests/s and latency percentiles in ms; plus the totals."""
+        elapsed = self.elapsed()
+        routes = {}
+        for label in sorted(set(self.latencies) | set(self.errors)):
+            timings = self.latencies[label]
+            routes[label] = {
+                'requests': len(timings) + self.errors[label],
+                'errors': self.errors[label],
+                'requests_per_second': round(len(timings) / elapsed, 2),
+                'p50_ms': round(_percentile(timings, 0.50), 1) if timings else None,
+                'p95_ms': round(_percentile(timings, 0.95), 1) if timings else None,
+                'p99_ms': round(_percentile(timings, 0.99), 1) if timings else None,
+                'max_ms': round(max(timings), 1) if timings else None,
+            }
+        return {
+            'seconds': round(elapsed, 2),
+            'tickets_created': self.tickets_created,
+            'tickets_per_second': round(self.tickets_created / elapsed, 2),
+            'comments_posted': self.comments_posted,
+            'routes': routes,
+            'errors': dict(self.error_reasons.most_common()),
+        }
+
+
+class VirtualUser:
+    def __init__(self, base_url, username, password, results, rng):
+        self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.results = results
+        self.rng = rng
+        # unsafe: keep cookies from IP-address hosts such as 127.0.0.1
+        self.session = aiohttp.ClientSession(
+            cookie_jar=aiohttp.CookieJar(unsafe=True), timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+        )
+
+    async def request(self, method, path, expected, data=None):
+        """
+        Sends one request without following redirects. Returns the redirect path (or the
+        requested one), or None when it failed or answered with an unexpected status.
+        """
+        label = f"{method} {route_name(path)}"
+        headers = {}
+        if method == 'POST':
+            csrf = self.session.cookie_jar.filter_cookies(self.base_url).get('csrftoken')
+            if csrf is not None:
+                headers['X-CSRFToken'] = csrf.value
+        started = time.perf_counter()
+        try:
+            async with self.session.request(method, self.base_url + path, data=data, headers=headers, allow_redirects=False) as response:
+                await response.read()
+                status, location = response.status, response.headers.get('Location')
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.results.errors[label] += 1
+            self.results.error_reasons[f"{label}: {type(e).__name__}"] += 1
+            return None
+        elapsed = (time.perf_counter() - started) * 1000
+        if status != expected:
+            self.results.errors[label] += 1
+            self.results.error_reasons[f"{label}: {status}"] += 1
+            return None
+        self.results.latencies[label].append(elapsed)
+        return urlparse(location).path if location else path
+
+    async def login(self):
+        login = reverse('login_view')
+        if not await self.request('GET', login, 200):
+            return False
+        dashboard = await self.request('POST', login, 302, {'username': self.username, 'password': self.password})
+        return bool(dashboard) and bool(await self.request('GET', dashboard, 200))
+
+    async def create_ticket(self, comments):
+        create = reverse('create_ticket')
+        if not await self.request('GET', create, 200):
+            return
+        title = f"{self.rng.choice(SUBJECTS)} {self.rng.choice(PROBLEMS)}"
+        detail = await self.request('POST', create, 302, {'title': title, 'description': f"Load test: the {title}."})
+        if not detail or route_name(detail) != 'ticket_detail':
+            return
+        self.results.tickets_created += 1
+        if not await self.request('GET', detail, 200):
+            return
+        for _ in range(comments):
+            if not await self.request('POST', detail, 302, {'comment_text': self.rng.choice(CUSTOMER_LINES)}):
+                return
+            self.results.comments_posted += 1
+            if not await self.request('GET', detail, 200):
+                return
+
+    async def run(self, start_delay, deadline, iterations, comments, think_time):
+        try:
+            await asyncio.sleep(start_delay)
+            if not await self.login():
+                return
+            done = 0
+            while (iterations is None or done < iterations) and (deadline is None or time.monotonic() < deadline):
+                await self.create_ticket(comments)
+                done += 1
+                if think_time:
+                    await asyncio.sleep(self.rng.uniform(0, 2 * think_time))
+        finally:
+            await self.session.close()
+
+
+async def run_load_test(base_url, usernames, password, duration=None, iterations=None, comments=2, think_time=0, ramp_up=0, seed=None):
+    """
+    Runs one virtual user per username until `duration` seconds have passed (after the
+    ramp-up) or each has created `iterations` tickets. Starts are spread over `ramp_up`
+    seconds. Returns the LoadTestResults.
+    """
+    rng = random.Random(seed)
+    results = LoadTestResults()
+    deadline = time.monotonic() + ramp_up + duration if duration else None
+    users = [VirtualUser(base_url, username, password, results, random.Random(rng.random())) for username in usernames]
+    await asyncio.gather(*(
+        user.run(ramp_up * n / len(users), deadline, iterations, comments, think_time)
+        for n, user in enumerate(users)
+    ))
+    results.finished = time.monotonic()
+    return results
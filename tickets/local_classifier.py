@@ -0,0 +1,173 @@
+# tickets/local_classifier.py
+"""
+Locally trained priority classifier: TF-IDF features over word unigrams and bigrams
+feeding a multinomial logistic regression, trained and scored with NumPy only.
+
+The artifact is a directory of plain .npy arrays plus a JSON vocabulary, so the weight
+matrix is memory-mapped by every worker instead of being copied into each process.
+"""
+import json
+import math
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+CLASSES = ['low', 'medium', 'high']
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def tokenize(text):
+    words = TOKEN_RE.findall((text or '').lower())
+    return words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+
+
+def ticket_text(title, description):
+    return f'{title or ""} {description or ""}'
+
+
+def _vectorize(token_lists, vocabulary, idf):
+    """
+    Builds a CSR matrix (indptr, indices, data) of L2-normalised TF-IDF rows.
+    Tokens outside the vocabulary are ignored.
+    """
+    indptr = [0]
+    indices = []
+    data = []
+    for tokens in token_lists:
+        counts = Counter(vocabulary[t] for t in tokens if t in vocabulary)
+        row_indices = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+        row_data = np.fromiter(counts.values(), dtype=np.float32, count=len(counts)) * idf[row_indices]
+        norm = np.linalg.norm(row_data)
+        if norm:
+            row_data /= norm
+        indices.append(row_indices)
+        data.append(row_data)
+        indptr.append(indptr[-1] + len(row_indices))
+    indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32)
+    data = np.concatenate(data) if data else np.zeros(0, dtype=np.float32)
+    return np.asarray(indptr, dtype=np.int64), indices, data
+
+
+def _scores(indptr, indices, data, weights, bias):
+    """Sparse rows times the weight matrix: one gather plus a segmented sum."""
+    n_rows = len(indptr) - 1
+    scores = np.tile(bias, (n_rows, 1)).astype(np.float32)
+    if len(indices):
+        contributions = data[:, None] * weights[indices]
+        non_empty = indptr[:-1] < indptr[1:]
+        scores[non_empty] += np.add.reduceat(contributions, indptr[:-1][non_empty], axis=0)
+    return scores
+
+
+def _softmax(scores):
+    scores = scores - scores.max(axis=1, keepdims=True)
+    exp = np.exp(scores)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def build_vocabulary(token_lists, max_features, min_df):
+    """Keeps the `max_features` tokens with the highest document frequency (at least `min_df`)."""
+    df = Counter()
+    n_docs = 0
+    for tokens in token_lists:
+        df.update(set(tokens))
+        n_docs += 1
+    kept = [token for token, count in df.most_common(max_features) if count >= min_df]
+    vocabulary = {token: i for i, token in enumerate(sorted(kept))}
+    idf = np.array(
+        [math.log((1 + n_docs) / (1 + df[token])) + 1 for token in sorted(kept)],
+        dtype=np.float32,
+    )
+    return vocabulary, idf
+
+
+def train(token_lists, labels, vocabulary, idf, epochs=200, learning_rate=2.0, l2=1e-4):
+    """
+    Full-batch gradient descent on class-balanced softmax cross-entropy.
+    Returns (weights, bias) as float32 arrays of shape (V, 3) and (3,).
+    `labels` is only read once `token_lists` is consumed, so the generator streaming the
+    rows can fill it as it goes.
+    """
+    indptr, indices, data = _vectorize(token_lists, vocabulary, idf)
+    y = np.array([CLASSES.index(label) for label in labels], dtype=np.int64)
+    n_rows, n_classes = len(y), len(CLASSES)
+
+    counts = np.bincount(y, minlength=n_classes).astype(np.float32)
+    class_weights = np.where(counts > 0, n_rows / (n_classes * np.maximum(counts, 1)), 0.0)
+    sample_weights = class_weights[y] / n_rows
+
+    one_hot = np.zeros((n_rows, n_classes), dtype=np.float32)
+    one_hot[np.arange(n_rows), y] = 1.0
+    row_of_nnz = np.repeat(np.arange(n_rows), np.diff(indptr))
+
+    weights = np.zeros((len(vocabulary), n_classes), dtype=np.float32)
+    bias = np.zeros(n_classes, dtype=np.float32)
+    for _ in range(epochs):
+        error = (_softmax(_scores(indptr, indices, data, weights, bias)) - one_hot) * sample_weights[:, None]
+        grad_w = np.zeros_like(weights)
+        np.add.at(grad_w, indices, data[:, None] * error[row_of_nnz])
+        grad_w += l2 * weights
+        weights -= learning_rate * grad_w
+        bias -= learning_rate * error.sum(axis=0)
+    return weights, bias
+
+
+def save_model(path, vocabulary, idf, weights, bias, metadata):
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    np.save(path / 'idf.npy', idf)
+    np.save(path / 'weights.npy', weights)
+    np.save(path / 'bias.npy', bias)
+    with open(path / 'vocabulary.json', 'w') as f:
+        json.dump({'classes': CLASSES, 'vocabulary': vocabulary, 'metadata': metadata}, f)
+
+
+class LocalPriorityModel:
+    def __init__(self, path):
+        path = Path(path)
+        with open(path / 'vocabulary.json') as f:
+            meta = json.load(f)
+        self.classes = meta['classes']
+        self.vocabulary = meta['vocabulary']
+        self.metadata = meta.get('metadata', {})
+        self.idf = np.load(path / 'idf.npy', mmap_mode='r')
+        self.weights = np.load(path / 'weights.npy', mmap_mode='r')
+        self.bias = np.load(path / 'bias.npy')
+
+    def predict_proba_batch(self, texts):
+        """Class probabilities for many texts at once, shape (len(texts), 3)."""
+        indptr, indices, data = _vectorize([tokenize(t) for t in texts], self.vocabulary, self.idf)
+        return _softmax(_scores(indptr, indices, data, self.weights, self.bias))
+
+    def predict_batch(self, texts):
+        """Returns a list of (priority, confidence) pairs."""
+        probabilities = self.predict_proba_batch(texts)
+        best = probabilities.argmax(axis=1)
+        return [(self.classes[i], float(probabilities[row, i])) for row, i in enumerate(best)]
+
+    def predict(self, title, description):
+        return self.predict_batch([ticket_text(title, description)])[0]
+
+
+_model = None
+_model_loaded = False
+_model_lock = threading.Lock()
+
+def get_local_model():
+    """
+    Returns the model at settings.LOCAL_PRIORITY_MODEL_DIR, loaded once per process,
+    or None if no model has been trained yet. Restart workers after retraining.
+    """
+    global _model, _model_loaded
+    if not _model_loaded:
+        with _model_lock:
+            if not _model_loaded:
+                path = Path(settings.LOCAL_PRIORITY_MODEL_DIR)
+                _model = LocalPriorityModel(path) if (path / 'vocabulary.json').exists() else None
+                _model_loaded = True
+    return _model
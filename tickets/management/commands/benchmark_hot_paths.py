@@ -0,0 +1,113 @@
+# tickets/management/commands/benchmark_hot_paths.py
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import time
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from tickets import benchmarks
+from tickets.models import Ticket
+
+DEFAULT_SCALES = '10000,100000,1000000'
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the hot paths (dashboards, ticket detail, ticket creation with assignment, the "
+        "escalation and assignment tasks, the analytics views) at each dataset scale and saves "
+        "the results as JSON. With --generate, tops the database up with synthetic data to reach "
+        "each scale first, so only run that against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default=DEFAULT_SCALES, help="Comma-separated ticket counts, smallest first.")
+        parser.add_argument('--generate', action='store_true', help="Generate synthetic tickets to reach each scale.")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per benchmark, after one warm-up run.")
+        parser.add_argument('--only', help="Only run benchmarks whose name contains this.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help="Results file; defaults to benchmarks/<timestamp>.json.")
+        parser.add_argument('--compare', help="Earlier results file to compare medians against.")
+
+    def handle(self, *args, **options):
+        try:
+            scales = sorted(int(scale) for scale in options['scales'].split(','))
+        except ValueError:
+            raise CommandError("--scales must be comma-separated integers.")
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1.")
+        previous = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    previous = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read {options['compare']}: {e}")
+
+        # The test client talks to 'testserver'; request logs and sampled profiles would only add noise
+        if 'testserver' not in settings.ALLOWED_HOSTS:
+            settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+        settings.REQUEST_PROFILE_SAMPLE_RATE = 0
+        logging.getLogger('tickets.requests').setLevel(logging.WARNING)
+
+        results = {
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'scales': [],
+        }
+        for scale in scales:
+            existing = Ticket.objects.count()
+            if existing < scale:
+                if not options['generate']:
+                    raise CommandError(f"The database has {existing} tickets, fewer than {scale}; pass --generate to add synthetic ones.")
+                self.stdout.write(f"Generating {scale - existing} tickets to reach {scale}...")
+                call_command('generate_synthetic_data', tickets=scale - existing, seed=options['seed'] + scale, stdout=io.StringIO())
+            elif existing > scale:
+                self.stdout.write(self.style.WARNING(f"The database already has {existing} tickets; benchmarking those for scale {scale}."))
+
+            size = benchmarks.dataset_size()
+            self.stdout.write(f"\n{size['tickets']} tickets, {size['comments']} comments, {size['agents']} agents:")
+            timings = benchmarks.run_all(options['repeat'], only=options['only'])
+            for name, stats in timings.items():
+                self.stdout.write(
+                    f"  {name:<42} median {stats['median_ms']:>9.2f}ms  p95 {stats['p95_ms']:>9.2f}ms  {stats['queries']:>4} queries"
+                    + self._change(previous, scale, name, stats)
+                )
+            results['scales'].append({'scale': scale, **size, 'benchmarks': timings})
+
+        path = options['output'] or os.path.join(settings.BASE_DIR, 'benchmarks', time.strftime('%Y%m%d-%H%M%S') + '.json')
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2, default=str)
+        self.stdout.write(self.style.SUCCESS(f"\nSaved results to {path}."))
+
+    def _change(self, previous, scale, name, stats):
+        """The median's change against the same benchmark at the same scale in an earlier run."""
+        if previous is None:
+            return ''
+        for entry in previous.get('scales', []):
+            before = entry.get('benchmarks', {}).get(name) if entry.get('scale') == scale else None
+            if before and before.get('median_ms'):
+                change = (stats['median_ms'] - before['median_ms']) / before['median_ms'] * 100
+                text = f"  {change:+.0f}% vs {before['median_ms']:.2f}ms"
+                return self.style.ERROR(text) if change > 10 else self.style.SUCCESS(text) if change < -10 else text
+        return ''
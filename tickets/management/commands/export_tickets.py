@@ -0,0 +1,50 @@
+# tickets/management/commands/export_tickets.py
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from tickets.export import EXPORT_BATCH_SIZE, EXPORT_FORMATS, export_queryset, stream_export
+
+
+class Command(BaseCommand):
+    help = "Streams tickets (optionally with comments) as CSV or NDJSON to a file or stdout."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', help="File to write; defaults to stdout.")
+        parser.add_argument('--comments', action='store_true', help="Include each ticket's comments.")
+        parser.add_argument('--status')
+        parser.add_argument('--priority')
+        parser.add_argument('--agent', help="Assignee username, or 'unassigned'.")
+        parser.add_argument('--created-from', help="First creation day to include (YYYY-MM-DD).")
+        parser.add_argument('--created-to', help="Last creation day to include (YYYY-MM-DD).")
+        parser.add_argument('--batch-size', type=int, default=EXPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            tickets = export_queryset(
+                status=options['status'],
+                priority=options['priority'],
+                agent=options['agent'],
+                created_from=options['created_from'],
+                created_to=options['created_to'],
+            )
+        except ValueError as e:
+            raise CommandError(e)
+
+        started = time.monotonic()
+        out = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        lines = 0
+        try:
+            for chunk in stream_export(tickets, options['format'], options['comments'], options['batch_size']):
+                out.write(chunk)
+                lines += 1
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        tickets_written = lines - (options['format'] == 'csv')
+        elapsed = time.monotonic() - started
+        self.stderr.write(self.style.SUCCESS(
+            f"Exported {tickets_written} tickets in {elapsed:.1f}s ({tickets_written / elapsed if elapsed else 0:.0f} tickets/s)."
+        ))
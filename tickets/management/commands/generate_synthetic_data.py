@@ -0,0 +1,60 @@
+# tickets/management/commands/generate_synthetic_data.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from tickets.importer import rebuild_counters
+from tickets.models import CustomUser
+from tickets.synthetic import SYNTHETIC_BATCH_SIZE, SYNTHETIC_PASSWORD, TicketGenerator, create_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates synthetic customers, agents, tickets and comments with production-like "
+        "distributions, using bulk inserts, then rebuilds the counters. Adds to existing data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickets', type=int, default=10000)
+        parser.add_argument('--customers', type=int, help="Defaults to one per 20 tickets.")
+        parser.add_argument('--agents', type=int, help="Defaults to one per 500 tickets (at least 5).")
+        parser.add_argument('--admins', type=int, default=1)
+        parser.add_argument('--admin-password', help="Lets the synthetic admins log in; without it their passwords are unusable.")
+        parser.add_argument('--comments-per-ticket', type=int, default=3, help="Average thread length.")
+        parser.add_argument('--active-share', type=float, default=0.05, help="Share of tickets still being worked on.")
+        parser.add_argument('--days', type=int, default=365, help="How far back ticket history goes.")
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--batch-size', type=int, default=SYNTHETIC_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        tickets = options['tickets']
+        if not 0 <= options['active_share'] <= 1:
+            raise CommandError("--active-share must be between 0 and 1.")
+        customers = options['customers'] if options['customers'] is not None else max(1, tickets // 20)
+        agents = options['agents'] if options['agents'] is not None else max(5, tickets // 500)
+
+        started = time.monotonic()
+        # Admin accounts with a well-known password would be a way into any database this runs against
+        create_users('synthetic-admin-', 'admin', options['admins'], password=options['admin_password'])
+        create_users('synthetic-agent-', 'agent', agents)
+        create_users('synthetic-customer-', 'customer', customers)
+        customer_ids = list(CustomUser.objects.filter(username__startswith='synthetic-customer-').values_list('id', flat=True))
+        agent_ids = list(CustomUser.objects.filter(username__startswith='synthetic-agent-').values_list('id', flat=True))
+        if tickets and not customer_ids:
+            raise CommandError("Tickets need at least one synthetic customer.")
+        self.stdout.write(f"{len(customer_ids)} customers and {len(agent_ids)} agents available (password '{SYNTHETIC_PASSWORD}').")
+        if options['admins'] > 0 and not options['admin_password']:
+            self.stdout.write("Synthetic admins can't log in; pass --admin-password to give them one.")
+
+        generator = TicketGenerator(
+            customer_ids, agent_ids, options['days'], options['active_share'], options['comments_per_ticket'], options['seed'],
+        )
+        ticket_started = time.monotonic()
+        for written in generator.write(tickets, options['batch_size']):
+            elapsed = time.monotonic() - ticket_started
+            self.stdout.write(f"{written}/{tickets} tickets ({written / elapsed:.0f} tickets/s).")
+
+        agents_rebuilt, days = rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {tickets} tickets in {time.monotonic() - started:.1f}s; "
+            f"rebuilt loads for {agents_rebuilt} agents and rollups for {days} days."
+        ))
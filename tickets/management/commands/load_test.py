@@ -0,0 +1,84 @@
+# tickets/management/commands/load_test.py
+import asyncio
+import json
+
+from aiohttp import web
+from django.core.management.base import BaseCommand, CommandError
+from tickets.gemini_stub import build_app
+from tickets.loadtest import run_load_test
+from tickets.synthetic import SYNTHETIC_PASSWORD
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives the login, ticket creation, ticket detail and comment routes of a running server "
+        "with concurrent virtual users and reports throughput and p50/p95/p99 latency per route. "
+        "Users log in as <user-prefix><n>, which generate_synthetic_data creates. With --stub-port, "
+        "also serves the Gemini stand-in; start the server with GEMINI_API_URL pointing at it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Base URL of the server under test.")
+        parser.add_argument('--users', type=int, default=20, help="Concurrent virtual users.")
+        parser.add_argument('--duration', type=float, default=60, help="Seconds to run after the ramp-up.")
+        parser.add_argument('--iterations', type=int, help="Tickets per user; stops early instead of running for --duration.")
+        parser.add_argument('--comments', type=int, default=2, help="Comments posted on each ticket.")
+        parser.add_argument('--think-time', type=float, default=0, help="Average pause between a user's tickets, in seconds.")
+        parser.add_argument('--ramp-up', type=float, default=0, help="Seconds over which users start.")
+        parser.add_argument('--user-prefix', default='synthetic-customer-')
+        parser.add_argument('--password', default=SYNTHETIC_PASSWORD)
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--output', help="Also write the report as JSON to this file.")
+        parser.add_argument('--stub-port', type=int, help="Serve the Gemini stand-in on this port during the run.")
+        parser.add_argument('--stub-latency-ms', type=float, default=0)
+        parser.add_argument('--stub-jitter-ms', type=float, default=0)
+        parser.add_argument('--stub-error-rate', type=float, default=0)
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError("--users must be at least 1.")
+        if not 0 <= options['stub_error_rate'] <= 1:
+            raise CommandError("--stub-error-rate must be between 0 and 1.")
+        summary = asyncio.run(self._run(options))
+
+        self.stdout.write(
+            f"\n{'route':<28}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+        )
+        for label, route in summary['routes'].items():
+            cells = [f"{route[key]:>9.1f}" if route[key] is not None else f"{'-':>9}" for key in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms')]
+            self.stdout.write(f"{label:<28}{route['requests']:>10}{route['errors']:>8}{route['requests_per_second']:>9.1f}" + ''.join(cells))
+        for reason, count in summary['errors'].items():
+            self.stdout.write(self.style.WARNING(f"{count} x {reason}"))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(summary, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f"\n{summary['tickets_created']} tickets and {summary['comments_posted']} comments in {summary['seconds']}s: "
+            f"{summary['tickets_per_second']} tickets/s with {options['users']} users."
+        ))
+
+    async def _run(self, options):
+        runner = None
+        if options['stub_port']:
+            runner = web.AppRunner(build_app(options['stub_latency_ms'], options['stub_jitter_ms'], options['stub_error_rate'], options['seed']))
+            await runner.setup()
+            await web.TCPSite(runner, '127.0.0.1', options['stub_port']).start()
+            self.stdout.write(f"Gemini stand-in: GEMINI_API_URL=http://127.0.0.1:{options['stub_port']}/v1beta/models/gemini-2.0-flash:generateContent")
+        try:
+            self.stdout.write(f"Running {options['users']} users against {options['url']}...")
+            results = await run_load_test(
+                options['url'],
+                [f"{options['user_prefix']}{n}" for n in range(options['users'])],
+                options['password'],
+                duration=None if options['iterations'] else options['duration'],
+                iterations=options['iterations'],
+                comments=options['comments'],
+                think_time=options['think_time'],
+                ramp_up=options['ramp_up'],
+                seed=options['seed'],
+            )
+        finally:
+            if runner is not None:
+                await runner.cleanup()
+        return results.summary()
@@ -0,0 +1,13 @@
+# tickets/management/commands/rebuild_agent_loads.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from tickets.assignment import rebuild_agent_loads
+
+
+class Command(BaseCommand):
+    help = "Rebuilds every agent's weighted load counter from the ticket table."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_agent_loads()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt weighted load counters for {count} agents."))
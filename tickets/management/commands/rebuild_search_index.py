@@ -0,0 +1,19 @@
+# tickets/management/commands/rebuild_search_index.py
+import time
+
+from django.core.management.base import BaseCommand
+from tickets.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search documents (and the SQLite FTS index) from tickets and comments."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Tickets read and written per batch.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = rebuild_search_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} tickets in {time.monotonic() - started:.1f}s."
+        ))
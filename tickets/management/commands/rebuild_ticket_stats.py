@@ -0,0 +1,61 @@
+# tickets/management/commands/rebuild_ticket_stats.py
+import math
+
+from django.core.management.base import BaseCommand, CommandError
+from tickets.models import AgentStats, TicketDailyRollup, TicketStateRollup
+from tickets.rollups import compute_agent_stats, compute_rollups, rebuild_agent_stats, rebuild_rollups
+
+DAILY_FIELDS = ['created_count', 'closed_count', 'response_sla_met_count', 'resolution_sla_met_count']
+AGENT_FIELDS = ['active_count', 'closed_count', 'resolution_seconds_sum', 'response_sla_met_count', 'resolution_sla_met_count']
+
+
+def _differences(stored, expected):
+    """Yields (key, stored, expected) for every bucket whose counters disagree. All-zero buckets equal missing ones."""
+    for key in sorted(set(stored) | set(expected), key=str):
+        have = stored.get(key, {})
+        want = expected.get(key, {})
+        for field in set(have) | set(want):
+            if not math.isclose(have.get(field, 0), want.get(field, 0), abs_tol=1e-3):
+                yield key, have, want
+                break
+
+
+class Command(BaseCommand):
+    help = "Verifies the dashboard rollups and agent statistics against the ticket table, then rebuilds them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only report differences; fail if there are any.")
+
+    def handle(self, *args, **options):
+        daily, states = compute_rollups()
+        expected_daily = {day: {f: counts.get(f, 0) for f in DAILY_FIELDS} for day, counts in daily.items()}
+        stored_daily = {row.pop('day'): row for row in TicketDailyRollup.objects.values('day', *DAILY_FIELDS)}
+        expected_states = {key: {'count': n} for key, n in states.items()}
+        stored_states = {
+            (row['day'], row['status'], row['priority']): {'count': row['count']}
+            for row in TicketStateRollup.objects.values('day', 'status', 'priority', 'count')
+        }
+        expected_agents = compute_agent_stats()
+        stored_agents = {row.pop('agent_id'): row for row in AgentStats.objects.values('agent_id', *AGENT_FIELDS)}
+
+        drift = 0
+        for label, stored, expected in [
+            ('daily rollup', stored_daily, expected_daily),
+            ('state rollup', stored_states, expected_states),
+            ('agent stats', stored_agents, expected_agents),
+        ]:
+            for key, have, want in _differences(stored, expected):
+                drift += 1
+                self.stdout.write(self.style.WARNING(f"{label} {key}: stored {have or 'nothing'}, expected {want or 'nothing'}"))
+
+        if options['check']:
+            if drift:
+                raise CommandError(f"{drift} counter buckets differ from the ticket table.")
+            self.stdout.write(self.style.SUCCESS("All counters match the ticket table."))
+            return
+
+        days = rebuild_rollups()
+        agents = rebuild_agent_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Fixed {drift} drifted buckets; rebuilt rollups for {days} days and statistics for {agents} agents."
+        ))
@@ -0,0 +1,24 @@
+# tickets/management/commands/run_gemini_stub.py
+from aiohttp import web
+from django.core.management.base import BaseCommand, CommandError
+from tickets.gemini_stub import build_app
+
+
+class Command(BaseCommand):
+    help = "Runs a local stand-in for the Gemini API. Set GEMINI_API_URL to the printed URL to use it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8090)
+        parser.add_argument('--latency-ms', type=float, default=0, help="Added to every response.")
+        parser.add_argument('--jitter-ms', type=float, default=0, help="Up to this much more, uniformly random.")
+        parser.add_argument('--error-rate', type=float, default=0, help="Share of calls answered with a 503.")
+        parser.add_argument('--seed', type=int)
+
+    def handle(self, *args, **options):
+        if not 0 <= options['error_rate'] <= 1:
+            raise CommandError("--error-rate must be between 0 and 1.")
+        host, port = options['host'], options['port']
+        self.stdout.write(f"GEMINI_API_URL=http://{host}:{port}/v1beta/models/gemini-2.0-flash:generateContent")
+        app = build_app(options['latency_ms'], options['jitter_ms'], options['error_rate'], options['seed'])
+        web.run_app(app, host=host, port=port, print=None)
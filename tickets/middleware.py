@@ -0,0 +1,116 @@
+# tickets/middleware.py
+import cProfile
+import json
+import logging
+import os
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import instrumentation
+
+logger = logging.getLogger('tickets.requests')
+
+
+def _shows_timing(user):
+    # The log line is written for everyone; the header only goes to developers and staff
+    return settings.DEBUG or (user is not None and (user.is_staff or getattr(user, 'role', None) == 'admin'))
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures every request: query count and database time with the slowest queries, template
+    render time (which includes queries run while rendering), time spent on external calls,
+    and the total. Logged as one JSON line on the 'tickets.requests' logger, and, with DEBUG on
+    or for staff, also sent as a Server-Timing header, visible in the browser's network panel
+    (other clients shouldn't learn how much work a request costs).
+
+    A REQUEST_PROFILE_SAMPLE_RATE share of sync requests also runs under cProfile; a profile
+    is written to REQUEST_PROFILE_DIR when its request took longer than
+    REQUEST_PROFILE_THRESHOLD_MS. Async requests aren't profiled, because a profiler on the
+    event loop thread would mix in every other request served concurrently.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        instrumentation.install()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        token = instrumentation.start(settings.REQUEST_METRICS_SLOW_QUERIES)
+        profiler = None
+        if random.random() < settings.REQUEST_PROFILE_SAMPLE_RATE:
+            profiler = cProfile.Profile()
+        try:
+            if profiler is not None:
+                response = profiler.runcall(self.get_response, request)
+            else:
+                response = self.get_response(request)
+            self._report(request, response, instrumentation.current(), _shows_timing(getattr(request, 'user', None)), profiler)
+        finally:
+            instrumentation.stop(token)
+        return response
+
+    async def __acall__(self, request):
+        token = instrumentation.start(settings.REQUEST_METRICS_SLOW_QUERIES)
+        try:
+            response = await self.get_response(request)
+            # request.user can't be loaded from the event loop; auser() is the async accessor
+            show_timing = settings.DEBUG or (hasattr(request, 'auser') and _shows_timing(await request.auser()))
+            self._report(request, response, instrumentation.current(), show_timing)
+        finally:
+            instrumentation.stop(token)
+        return response
+
+    def _report(self, request, response, metrics, show_timing, profiler=None):
+        total_ms = metrics.elapsed() * 1000
+        db_ms = metrics.db_seconds * 1000
+        template_ms = metrics.template_seconds * 1000
+        external_ms = metrics.external_seconds * 1000
+
+        # Streaming responses are only timed up to the start of the stream
+        if show_timing:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={db_ms:.1f};desc="{metrics.query_count} queries"',
+                f'tpl;dur={template_ms:.1f}',
+                f'ext;dur={external_ms:.1f};desc="{metrics.external_calls} calls"',
+                f'total;dur={total_ms:.1f}',
+            ])
+
+        match = request.resolver_match
+        view = match.view_name if match else None
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'queries': metrics.query_count,
+            'db_ms': round(db_ms, 1),
+            'template_ms': round(template_ms, 1),
+            'external_calls': metrics.external_calls,
+            'external_ms': round(external_ms, 1),
+            'slowest_queries': metrics.slowest_queries(),
+        }))
+
+        if profiler is not None and total_ms >= settings.REQUEST_PROFILE_THRESHOLD_MS:
+            self._dump_profile(profiler, view, total_ms)
+
+    def _dump_profile(self, profiler, view, total_ms):
+        # Open with `python -m pstats <file>` or snakeviz
+        os.makedirs(settings.REQUEST_PROFILE_DIR, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{(view or 'unresolved').replace(':', '-')}-{total_ms:.0f}ms-{os.getpid()}.prof"
+        path = os.path.join(settings.REQUEST_PROFILE_DIR, name)
+        try:
+            profiler.dump_stats(path)
+        except OSError as e:
+            logger.warning(f"Could not write request profile {path}: {e}")
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, IntegerField, Q, Sum, When
+
+
+def backfill_agent_loads(apps, schema_editor):
+    CustomUser = apps.get_model('tickets', 'CustomUser')
+    AgentLoad = apps.get_model('tickets', 'AgentLoad')
+    active = ['open', 'assigned', 'in_progress', 'reopened', 'awaiting_customer_response']
+    weights = {'high': 3, 'medium': 2, 'low': 1}
+
+    users = CustomUser.objects.filter(Q(role='agent') | Q(assigned_tickets__isnull=False)).values('id')
+    loads = CustomUser.objects.filter(id__in=users).annotate(
+        weighted_load=Sum(Case(
+            *[When(assigned_tickets__status__in=active, assigned_tickets__priority=p, then=w) for p, w in weights.items()],
+            default=0,
+            output_field=IntegerField(),
+        ))
+    ).values_list('id', 'weighted_load')
+
+    AgentLoad.objects.bulk_create(
+        [AgentLoad(agent_id=agent_id, weighted_load=load or 0) for agent_id, load in loads],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0003_alter_ticket_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgentLoad',
+            fields=[
+                ('agent', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='load', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('weighted_load', models.IntegerField(db_index=True, default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_agent_loads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0006_ticket_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgentStats',
+            fields=[
+                ('agent', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('active_count', models.IntegerField(default=0)),
+                ('closed_count', models.IntegerField(default=0)),
+                ('resolution_seconds_sum', models.FloatField(default=0)),
+                ('response_sla_met_count', models.IntegerField(default=0)),
+                ('resolution_sla_met_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ticketdailyrollup',
+            name='resolution_sla_met_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ticketdailyrollup',
+            name='response_sla_met_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Min, OuterRef, Subquery
+
+from tickets.events import response_comments
+
+
+def backfill_response_and_resolution(apps, schema_editor):
+    Ticket = apps.get_model('tickets', 'Ticket')
+    Comment = apps.get_model('tickets', 'Comment')
+
+    # Best available history: a resolved/closed ticket was resolved at its last update
+    Ticket.objects.filter(status__in=['resolved', 'closed']).update(resolved_at=F('updated_at'))
+
+    # First response by the rule record_first_response and the importer apply
+    first_staff_comment = response_comments(
+        Comment.objects.filter(ticket=OuterRef('pk')), OuterRef('create_by'),
+    ).values('ticket').annotate(first=Min('created_at')).values('first')
+    Ticket.objects.update(first_response_at=Subquery(first_staff_comment))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0007_agent_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('created', 'Created'), ('status', 'Status changed'), ('priority', 'Priority changed'), ('assigned', 'Assignee changed'), ('first_response', 'First response')], max_length=20)),
+                ('old_value', models.CharField(blank=True, default='', max_length=50)),
+                ('new_value', models.CharField(blank=True, default='', max_length=50)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='first_response_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='resolved_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['resolved_at'], name='ticket_resolved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('first_response_at__isnull', True), ('status__in', ['open', 'assigned', 'in_progress', 'reopened', 'awaiting_customer_response'])), fields=['response_due_at'], name='ticket_awaiting_response_idx'),
+        ),
+        migrations.AddField(
+            model_name='ticketevent',
+            name='actor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ticket_events', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='ticketevent',
+            name='ticket',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='tickets.ticket'),
+        ),
+        migrations.AddIndex(
+            model_name='ticketevent',
+            index=models.Index(fields=['ticket', 'created_at'], name='event_ticket_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticketevent',
+            index=models.Index(fields=['kind', 'created_at'], name='event_kind_created_idx'),
+        ),
+        migrations.RunPython(backfill_response_and_resolution, migrations.RunPython.noop),
+    ]
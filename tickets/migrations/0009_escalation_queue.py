@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:15
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def queue_escalations(apps, schema_editor):
+    # Active tickets that can still move up a priority are due at their resolution deadline
+    Ticket = apps.get_model('tickets', 'Ticket')
+    Ticket.objects.filter(
+        status__in=['open', 'assigned', 'in_progress', 'reopened', 'awaiting_customer_response'],
+        priority__in=['low', 'medium'],
+    ).update(escalate_at=F('resolution_due_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0008_ticket_events'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='ticket_status_resolution_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='ticket_active_resolution_idx',
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='escalate_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('escalate_at__isnull', False)), fields=['escalate_at'], name='ticket_escalation_due_idx'),
+        ),
+        migrations.RunPython(queue_escalations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Keep in step with tickets/search.py
+POSTGRES_SQL = [
+    """
+    ALTER TABLE tickets_ticketsearchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'B') ||
+        setweight(to_tsvector('english'::regconfig, coalesce(comments, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX ticket_search_vector_idx ON tickets_ticketsearchdocument USING GIN (search_vector)",
+]
+
+SQLITE_SQL = [
+    """
+    CREATE VIRTUAL TABLE tickets_ticketsearch_fts USING fts5(
+        title, description, comments,
+        content='tickets_ticketsearchdocument', content_rowid='ticket_id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER tickets_ticketsearch_ai AFTER INSERT ON tickets_ticketsearchdocument BEGIN
+        INSERT INTO tickets_ticketsearch_fts(rowid, title, description, comments)
+        VALUES (new.ticket_id, new.title, new.description, new.comments);
+    END
+    """,
+    """
+    CREATE TRIGGER tickets_ticketsearch_ad AFTER DELETE ON tickets_ticketsearchdocument BEGIN
+        INSERT INTO tickets_ticketsearch_fts(tickets_ticketsearch_fts, rowid, title, description, comments)
+        VALUES ('delete', old.ticket_id, old.title, old.description, old.comments);
+    END
+    """,
+    """
+    CREATE TRIGGER tickets_ticketsearch_au AFTER UPDATE ON tickets_ticketsearchdocument BEGIN
+        INSERT INTO tickets_ticketsearch_fts(tickets_ticketsearch_fts, rowid, title, description, comments)
+        VALUES ('delete', old.ticket_id, old.title, old.description, old.comments);
+        INSERT INTO tickets_ticketsearch_fts(rowid, title, description, comments)
+        VALUES (new.ticket_id, new.title, new.description, new.comments);
+    END
+    """,
+]
+
+SQLITE_REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS tickets_ticketsearch_au",
+    "DROP TRIGGER IF EXISTS tickets_ticketsearch_ad",
+    "DROP TRIGGER IF EXISTS tickets_ticketsearch_ai",
+    "DROP TABLE IF EXISTS tickets_ticketsearch_fts",
+]
+
+
+def create_search_index(apps, schema_editor):
+    # Other backends fall back to unindexed matching in tickets/search.py
+    statements = {'postgresql': POSTGRES_SQL, 'sqlite': SQLITE_SQL}.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    # The PostgreSQL column and index go with the table
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in SQLITE_REVERSE_SQL:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0009_escalation_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketSearchDocument',
+            fields=[
+                ('ticket', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='tickets.ticket')),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('comments', models.TextField(blank=True, default='')),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0010_ticket_search'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='ticket_creator_created_idx',
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='priority_rank',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(priority='high', then=models.Value(0)), models.When(priority='medium', then=models.Value(1)), models.When(priority='low', then=models.Value(2)), default=models.Value(3), output_field=models.SmallIntegerField()), output_field=models.SmallIntegerField()),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='status_rank',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(status='open', then=models.Value(0)), models.When(status='assigned', then=models.Value(1)), models.When(status='in_progress', then=models.Value(2)), models.When(status='reopened', then=models.Value(3)), models.When(status='awaiting_customer_response', then=models.Value(4)), models.When(status='resolved', then=models.Value(5)), models.When(status='closed', then=models.Value(6)), default=models.Value(7), output_field=models.SmallIntegerField()), output_field=models.SmallIntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['create_by', 'priority_rank', 'status_rank', '-created_at', '-id'], name='ticket_creator_dashboard_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('status', 'closed'), _negated=True), fields=['assigned_to', 'priority_rank', 'status_rank', '-created_at', '-id'], name='ticket_assignee_dashboard_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['priority_rank', 'status_rank', '-created_at', '-id'], name='ticket_dashboard_idx'),
+        ),
+    ]
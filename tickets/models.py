@@ -1,5 +1,7 @@
 from django.db import models
+from django.db.models import Case, Q, Value, When
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
 class CustomUser(AbstractUser):
     ROLE_CHOICES = (
@@ -10,9 +12,22 @@ class CustomUser(AbstractUser):
 
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='customer')
 
+# Statuses that still need work: they count towards agent load and SLA escalation
+ACTIVE_STATUSES = ['open', 'assigned', 'in_progress', 'reopened', 'awaiting_customer_response']
+
+# Dashboard sort order: most urgent priority first, then by how much work the status still needs
+PRIORITY_RANKS = {'high': 0, 'medium': 1, 'low': 2}
+STATUS_RANKS = {'open': 0, 'assigned': 1, 'in_progress': 2, 'reopened': 3, 'awaiting_customer_response': 4, 'resolved': 5, 'closed': 6}
+
+
+def _rank(field, ranks):
+    return Case(*(When(**{field: value}, then=Value(rank)) for value, rank in ranks.items()), default=Value(len(ranks)), output_field=models.SmallIntegerField())
+
+
 class Ticket(models.Model):
     PRIORITY_CHOICES = [('low', 'Low'), ('medium', 'Medium'), ('high', 'High')]
     STATUS_CHOICES = [('open', "Open"), ('assigned', 'Assigned'), ('in_progress', 'In Progress'),('awaiting_customer_response', 'Awaiting Customer Response'),('resolved', 'Resolved'), ('reopened', 'Reopened'), ('closed', 'Closed')]
+    ACTIVE_STATUSES = ACTIVE_STATUSES
 
     title = models.CharField(max_length=255)
     description = models.TextField()
@@ -26,6 +41,36 @@ class Ticket(models.Model):
     response_due_at = models.DateTimeField(null=True, blank=True)
     resolution_due_at = models.DateTimeField(null=True, blank=True)
 
+    # Denormalized from the event log: the first staff comment, and the latest move to resolved/closed
+    first_response_at = models.DateTimeField(null=True, blank=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    # When check_overdue_tickets should next escalate this ticket; None once it can't be escalated
+    escalate_at = models.DateTimeField(null=True, blank=True)
+
+    # The dashboard's sort keys, computed by the database on every write (including
+    # queryset.update() and bulk_create), so they can be indexed and seeked on
+    priority_rank = models.GeneratedField(expression=_rank('priority', PRIORITY_RANKS), output_field=models.SmallIntegerField(), db_persist=True)
+    status_rank = models.GeneratedField(expression=_rank('status', STATUS_RANKS), output_field=models.SmallIntegerField(), db_persist=True)
+
+    class Meta:
+        indexes = [
+            # check_overdue_tickets: the escalation due-queue, soonest first
+            models.Index(fields=['escalate_at'], condition=Q(escalate_at__isnull=False), name='ticket_escalation_due_idx'),
+            # Agent dashboard and load rebuilds: an assignee's tickets by status
+            models.Index(fields=['assigned_to', 'status'], name='ticket_assignee_status_idx'),
+            # Dashboards, in their sort order: a customer's tickets, an agent's unclosed tickets, and all of them for admins
+            models.Index(fields=['create_by', 'priority_rank', 'status_rank', '-created_at', '-id'], name='ticket_creator_dashboard_idx'),
+            models.Index(fields=['assigned_to', 'priority_rank', 'status_rank', '-created_at', '-id'], condition=~Q(status='closed'), name='ticket_assignee_dashboard_idx'),
+            models.Index(fields=['priority_rank', 'status_rank', '-created_at', '-id'], name='ticket_dashboard_idx'),
+            # assign_backlog: unassigned open tickets, oldest first
+            models.Index(fields=['created_at', 'id'], condition=Q(status='open', assigned_to__isnull=True), name='ticket_backlog_idx'),
+            # SLA reporting: tickets resolved in a time window
+            models.Index(fields=['resolved_at'], name='ticket_resolved_idx'),
+            # Response SLA: active tickets still waiting for a first response, by deadline
+            models.Index(fields=['response_due_at'], condition=Q(status__in=ACTIVE_STATUSES, first_response_at__isnull=True), name='ticket_awaiting_response_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -35,5 +80,136 @@ class Comment(models.Model):
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # ticket_detail: a ticket's thread in posting order
+            models.Index(fields=['ticket', 'created_at'], name='comment_ticket_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'Comment by {self.user.username} on {self.ticket.title}'
+
+class TicketEvent(models.Model):
+    """
+    Append-only lifecycle log of a ticket. `actor` is None for automated changes.
+    """
+    KIND_CHOICES = [
+        ('created', 'Created'),
+        ('status', 'Status changed'),
+        ('priority', 'Priority changed'),
+        ('assigned', 'Assignee changed'),
+        ('first_response', 'First response'),
+    ]
+
+    ticket = models.ForeignKey(Ticket, related_name='events', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    actor = models.ForeignKey(CustomUser, related_name='ticket_events', null=True, blank=True, on_delete=models.SET_NULL)
+    old_value = models.CharField(max_length=50, blank=True, default='')
+    new_value = models.CharField(max_length=50, blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # A ticket's history in order
+            models.Index(fields=['ticket', 'created_at'], name='event_ticket_created_idx'),
+            # Reporting on one kind of event over time
+            models.Index(fields=['kind', 'created_at'], name='event_kind_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.ticket_id} {self.kind}: {self.old_value} -> {self.new_value}'
+
+class AgentLoad(models.Model):
+    """
+    Denormalized weighted load of an agent's active tickets, kept in step by the
+    ticket signals so assignment is an indexed lookup instead of an aggregation.
+    """
+    agent = models.OneToOneField(CustomUser, related_name='load', on_delete=models.CASCADE, primary_key=True)
+    weighted_load = models.IntegerField(default=0, db_index=True)
+
+    def __str__(self):
+        return f'{self.agent.username}: {self.weighted_load}'
+
+
+class TicketDailyRollup(models.Model):
+    """
+    Tickets created and closed per local calendar day, maintained incrementally.
+    `closed_count` buckets closed tickets by the day of their last update, like the raw query did.
+    """
+    day = models.DateField(unique=True)
+    created_count = models.IntegerField(default=0)
+    closed_count = models.IntegerField(default=0)
+    # Closed tickets first answered before their response deadline / resolved before their
+    # resolution deadline (resolved_at, or the last update for tickets closed before it was tracked)
+    response_sla_met_count = models.IntegerField(default=0)
+    resolution_sla_met_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.day}: +{self.created_count} / -{self.closed_count}'
+
+
+class TicketStateRollup(models.Model):
+    """
+    Current number of tickets in each (status, priority), bucketed by creation day.
+    Summing over days gives the live status and priority distributions.
+    """
+    day = models.DateField()
+    status = models.CharField(max_length=30)
+    priority = models.CharField(max_length=10)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'status', 'priority'], name='unique_state_rollup_bucket'),
+        ]
+
+    def __str__(self):
+        return f'{self.day} {self.status}/{self.priority}: {self.count}'
+
+
+class AgentStats(models.Model):
+    """
+    Running performance figures per assignee, maintained incrementally for the agent dashboard.
+    A closed ticket's resolution time is resolved_at - created_at; tickets closed before resolved_at
+    was tracked fall back to their last update.
+    """
+    agent = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    active_count = models.IntegerField(default=0)
+    closed_count = models.IntegerField(default=0)
+    resolution_seconds_sum = models.FloatField(default=0)
+    response_sla_met_count = models.IntegerField(default=0)
+    resolution_sla_met_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.agent.username}: {self.active_count} active / {self.closed_count} closed'
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of an import_tickets run, saved in the transaction that writes each batch so a
+    resumed run neither repeats nor skips records, however the previous one stopped.
+    """
+    name = models.CharField(max_length=500, unique=True)
+    records = models.IntegerField(default=0)
+    imported = models.IntegerField(default=0)
+    rejected = models.IntegerField(default=0)
+    finished = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name}: {self.records} records read'
+
+
+class TicketSearchDocument(models.Model):
+    """
+    Denormalized text of a ticket and its human comments, indexed for full-text search.
+    The index itself lives outside the ORM (see tickets/search.py): a generated tsvector
+    column with a GIN index on PostgreSQL, an FTS5 table kept in sync by triggers on SQLite.
+    """
+    ticket = models.OneToOneField(Ticket, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    title = models.CharField(max_length=255)
+    description = models.TextField()
+    comments = models.TextField(blank=True, default='')
+
     def __str__(self):
-        return f'Comment by {self.user.username} on {self.ticket.title}'
\ No newline at end of file
+        return f'Search document for ticket {self.ticket_id}'
@@ -0,0 +1,129 @@
+# tickets/pagination.py
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+def encode_cursor(values):
+    """
+    Encodes the sort-key values of a row into an opaque, URL-safe cursor token.
+    Datetimes are stored as ISO strings, which the ORM accepts back as lookup values.
+    """
+    payload = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(token, size):
+    """
+    Decodes a cursor produced by encode_cursor into its list of raw JSON values. Returns
+    None for missing or malformed tokens; parse_cursor also checks the values' types.
+    """
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+    except (ValueError, UnicodeError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
+
+
+def parse_cursor(queryset, keys, token):
+    """
+    Decodes a cursor for `keys` over `queryset` and converts each value to the type of its
+    key's field or annotation. Returns None for missing or tampered tokens, including ones
+    whose values don't fit their keys, so a bad cursor simply falls back to the first page.
+    """
+    values = decode_cursor(token, len(keys))
+    if values is None:
+        return None
+    converted = []
+    for (name, _), value in zip(keys, values):
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            return None
+        annotation = queryset.query.annotations.get(name)
+        try:
+            field = annotation.output_field if annotation is not None else queryset.model._meta.get_field(name)
+            # clean() also applies the backend's integer range, so oversized ids don't reach the database
+            value = field.clean(value, None)
+        except (FieldDoesNotExist, ValidationError, TypeError, ValueError):
+            return None
+        if value is None:
+            return None
+        converted.append(value)
+    return converted
+
+
+def _keyset_filter(keys, values, forward):
+    """
+    Builds the row-value comparison (k1, k2, ...) > (v1, v2, ...) as nested OR/AND terms,
+    honouring the direction of every key. The redundant bound on the first key
+    (k1 >= v1) gives the planner an index condition to seek to, so an index that matches
+    the keys starts its ordered scan near the cursor instead of at the first row. Keys
+    must be stored columns (not per-query annotations) for any index to apply.
+    """
+    condition = Q()
+    for i, (field, descending) in enumerate(keys):
+        lookup = 'lt' if descending == forward else 'gt'
+        term = Q(**{f'{field}__{lookup}': values[i]})
+        for j in range(i):
+            term &= Q(**{keys[j][0]: values[j]})
+        condition |= term
+    field, descending = keys[0]
+    return Q(**{f"{field}__{'lte' if descending == forward else 'gte'}": values[0]}) & condition
+
+
+def _page_query(queryset, keys, page_size, after, before):
+    # The ordered, filtered slice for one page plus one extra row that tells whether there is more
+    forward = before is None
+    cursor = parse_cursor(queryset, keys, after if forward else before)
+    if cursor is None:
+        # No usable cursor in either direction means the first page
+        forward = True
+
+    ordering = [f"{'-' if descending == forward else ''}{field}" for field, descending in keys]
+    qs = queryset
+    if cursor is not None:
+        qs = qs.filter(_keyset_filter(keys, cursor, forward))
+    return qs.order_by(*ordering)[:page_size + 1], cursor, forward
+
+
+def _page(rows, keys, page_size, cursor, forward):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if not forward:
+        rows.reverse()
+
+    def cursor_for(row):
+        return encode_cursor([getattr(row, field) for field, _ in keys])
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if forward:
+            next_cursor = cursor_for(rows[-1]) if has_more else None
+            prev_cursor = cursor_for(rows[0]) if cursor is not None else None
+        else:
+            next_cursor = cursor_for(rows[-1])
+            prev_cursor = cursor_for(rows[0]) if has_more else None
+    return rows, next_cursor, prev_cursor
+
+
+def keyset_paginate(queryset, keys, page_size, after=None, before=None):
+    """
+    Cursor (keyset) pagination over `queryset`.
+
+    `keys` is a list of (field_or_annotation, descending) pairs that must end with a unique
+    column (normally 'id'). Pass the `after` cursor to move forward or `before` to move back.
+    Returns (rows, next_cursor, prev_cursor); either cursor is None at the matching edge.
+    """
+    qs, cursor, forward = _page_query(queryset, keys, page_size, after, before)
+    return _page(list(qs), keys, page_size, cursor, forward)
+
+
+async def akeyset_paginate(queryset, keys, page_size, after=None, before=None):
+    """Async version of keyset_paginate for async views; fetches the page with the async ORM."""
+    qs, cursor, forward = _page_query(queryset, keys, page_size, after, before)
+    return _page([row async for row in qs], keys, page_size, cursor, forward)
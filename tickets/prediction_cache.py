@@ -0,0 +1,179 @@
+# tickets/prediction_cache.py
+"""
+Content-addressed cache for AI priority predictions.
+
+Identical tickets (resubmissions, integrations sending the same alert text) hash to the
+same key, so only the first one costs an upstream call. Redis is shared by every worker;
+when it is not configured or not reachable, a per-process LRU takes over.
+
+Lookups are coroutines for the async classifier. The Redis client is the blocking one, run
+in a worker thread, so a slow Redis never stalls the event loop (and every other request an
+ASGI worker is serving); an asyncio client would be bound to a single event loop, while one
+process can classify on several (the ASGI server's, and classifier_client's background loop
+used by the Celery tasks).
+"""
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+from django.conf import settings
+
+from .instrumentation import external_call
+
+KEY_PREFIX = 'priority-prediction:v1:'
+
+# Seconds to stay on the local LRU after Redis fails
+REDIS_RETRY_AFTER = 30
+
+
+def prediction_key(title, description, user_role):
+    """
+    Hashes the normalized (title, description, user_role) triple. Case and runs of
+    whitespace don't change a ticket's meaning, so they don't change its key either.
+    """
+    normalized = '\x1f'.join(
+        re.sub(r'\s+', ' ', (value or '')).strip().lower()
+        for value in (title, description, user_role)
+    )
+    return KEY_PREFIX + hashlib.sha256(normalized.encode()).hexdigest()
+
+
+class LocalLRUBackend:
+    """In-process LRU with per-entry expiry, bounded to `max_entries`."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Shared Redis backend. Entries expire after `ttl`; overall size is bounded by the
+    server's maxmemory policy (use allkeys-lru or volatile-lru). Timeouts are kept tight
+    because a cache lookup must never cost more than the call it is meant to save.
+    """
+
+    def __init__(self, url, ttl):
+        self.ttl = ttl
+        self.client = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.05)
+
+    def get(self, key):
+        with external_call():
+            value = self.client.get(key)
+        return value.decode() if value is not None else None
+
+    def set(self, key, value):
+        with external_call():
+            self.client.set(key, value, ex=self.ttl)
+
+
+class PredictionCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._redis = None
+        self._local = None
+        self.hits = 0
+        self.misses = 0
+        self.redis_errors = 0
+        self._redis_down_until = 0.0
+
+    def _redis_failed(self):
+        # Skip Redis for a while rather than paying its timeout on every lookup
+        with self._lock:
+            self.redis_errors += 1
+            self._redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+
+    def _backends(self):
+        if self._local is None:
+            self._local = LocalLRUBackend(settings.PRIORITY_CACHE_MAX_ENTRIES, settings.PRIORITY_CACHE_TTL)
+            if settings.PRIORITY_CACHE_REDIS_URL:
+                self._redis = RedisBackend(settings.PRIORITY_CACHE_REDIS_URL, settings.PRIORITY_CACHE_TTL)
+        shared = self._redis if self._redis_down_until < time.monotonic() else None
+        return shared, self._local
+
+    def _shared_get(self, shared, local, key):
+        try:
+            value = shared.get(key)
+        except redis.RedisError:
+            self._redis_failed()
+            return None
+        if value is not None:
+            local.set(key, value)
+        return value
+
+    def _shared_set(self, shared, key, priority):
+        try:
+            shared.set(key, priority)
+        except redis.RedisError:
+            self._redis_failed()
+
+    async def get(self, title, description, user_role):
+        key = prediction_key(title, description, user_role)
+        shared, local = self._backends()
+
+        value = local.get(key)
+        if value is None and shared is not None:
+            value = await asyncio.to_thread(self._shared_get, shared, local, key)
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    async def set(self, title, description, user_role, priority):
+        key = prediction_key(title, description, user_role)
+        shared, local = self._backends()
+        local.set(key, priority)
+        if shared is not None:
+            await asyncio.to_thread(self._shared_set, shared, key, priority)
+
+    def stats(self, avg_upstream_latency_ms=None):
+        """
+        Hit/miss counters for this process. Given the upstream average latency,
+        also estimates how much waiting the hits saved.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'redis+local' if self._redis is not None else 'local',
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'upstream_calls_saved': self.hits,
+                'latency_saved_ms': round(self.hits * avg_upstream_latency_ms, 2) if avg_upstream_latency_ms else None,
+                'redis_errors': self.redis_errors,
+                'local_entries': len(self._local) if self._local is not None else 0,
+            }
+
+
+prediction_cache = PredictionCache()
@@ -0,0 +1,173 @@
+# tickets/rollups.py
+"""
+Incrementally maintained rollups behind the analytics dashboards.
+
+Each ticket contributes to a few buckets (its creation day, its closing day, its current
+status/priority, its assignee's running statistics). A change moves the ticket from its
+old buckets to its new ones, so the dashboards read a handful of rows instead of
+aggregating the ticket table.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import AgentStats, Ticket, TicketDailyRollup, TicketStateRollup
+
+
+def local_day(value):
+    """The calendar day of a datetime in the site's time zone, matching TruncDay."""
+    return timezone.localtime(value).date()
+
+
+def _met(done_at, due_at):
+    return bool(done_at and due_at and done_at < due_at)
+
+
+def rollup_contributions(state):
+    """
+    The buckets a ticket in `state` (a dict of the fields tracked by the ticket signals)
+    counts towards. An empty state - a ticket not yet saved or already deleted - counts nowhere.
+    """
+    contributions = Counter()
+    if not state or not state.get('created_at'):
+        return contributions
+    day = local_day(state['created_at'])
+    contributions[('created', day)] += 1
+    contributions[('state', day, state['status'], state['priority'])] += 1
+
+    closed = state['status'] == 'closed' and state.get('updated_at')
+    if closed:
+        # Tickets closed before resolved_at was tracked fall back to their last update
+        resolved_at = state.get('resolved_at') or state['updated_at']
+        response_met = _met(state.get('first_response_at'), state.get('response_due_at'))
+        resolution_met = _met(resolved_at, state.get('resolution_due_at'))
+        closed_day = local_day(state['updated_at'])
+        contributions[('closed', closed_day)] += 1
+        contributions[('response_sla_met', closed_day)] += response_met
+        contributions[('resolution_sla_met', closed_day)] += resolution_met
+
+    agent_id = state.get('assigned_to_id')
+    if agent_id:
+        if closed:
+            contributions[('agent', agent_id, 'closed_count')] += 1
+            contributions[('agent', agent_id, 'resolution_seconds_sum')] += (resolved_at - state['created_at']).total_seconds()
+            contributions[('agent', agent_id, 'response_sla_met_count')] += response_met
+            contributions[('agent', agent_id, 'resolution_sla_met_count')] += resolution_met
+        else:
+            contributions[('agent', agent_id, 'active_count')] += 1
+    return contributions
+
+
+def rollup_delta(old_state, new_state):
+    """Bucket changes for a ticket moving from `old_state` to `new_state`."""
+    delta = rollup_contributions(new_state)
+    delta.subtract(rollup_contributions(old_state))
+    return delta
+
+
+def _increment(model, lookup, field, delta):
+    # Atomic in-database increment; the bucket row is created on first use
+    if model.objects.filter(**lookup).update(**{field: F(field) + delta}):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **{field: delta})
+    except IntegrityError:
+        # Another writer created the bucket first
+        model.objects.filter(**lookup).update(**{field: F(field) + delta})
+
+
+def apply_rollup_deltas(deltas):
+    """Applies a Counter of bucket changes, as built by rollup_delta, one UPDATE per bucket."""
+    for key, delta in deltas.items():
+        if not delta:
+            continue
+        if key[0] == 'state':
+            _, day, status, priority = key
+            _increment(TicketStateRollup, {'day': day, 'status': status, 'priority': priority}, 'count', delta)
+        elif key[0] == 'agent':
+            _, agent_id, field = key
+            _increment(AgentStats, {'agent_id': agent_id}, field, delta)
+        else:
+            kind, day = key
+            _increment(TicketDailyRollup, {'day': day}, f'{kind}_count', delta)
+
+
+# SLA outcomes of a closed ticket, as SQL conditions matching rollup_contributions
+RESPONSE_MET = Q(first_response_at__lt=F('response_due_at'))
+RESOLUTION_MET = Q(resolution_due_at__gt=Coalesce('resolved_at', 'updated_at'))
+
+
+def compute_rollups():
+    """
+    Aggregates the daily rollups from the ticket table.
+    Returns (daily, states): {day: {field: n}} and {(day, status, priority): n}.
+    """
+    closed = Ticket.objects.filter(status='closed').annotate(day=TruncDate('updated_at')).values('day').annotate(
+        closed_count=Count('id'),
+        response_sla_met_count=Count('id', filter=RESPONSE_MET),
+        resolution_sla_met_count=Count('id', filter=RESOLUTION_MET),
+    )
+    created = Ticket.objects.annotate(day=TruncDate('created_at')).values('day').annotate(created_count=Count('id'))
+    states = Ticket.objects.annotate(day=TruncDate('created_at')).values('day', 'status', 'priority').annotate(n=Count('id'))
+
+    daily = {}
+    for row in list(created) + list(closed):
+        daily.setdefault(row['day'], {}).update({k: v for k, v in row.items() if k != 'day'})
+    return daily, {(row['day'], row['status'], row['priority']): row['n'] for row in states}
+
+
+def compute_agent_stats():
+    """Aggregates every assignee's statistics from the ticket table, keyed by agent id."""
+    closed = Q(status='closed')
+    rows = Ticket.objects.filter(assigned_to__isnull=False).values('assigned_to_id').annotate(
+        active_count=Count('id', filter=~closed),
+        closed_count=Count('id', filter=closed),
+        resolution_duration=Sum(
+            ExpressionWrapper(Coalesce('resolved_at', 'updated_at') - F('created_at'), output_field=DurationField()),
+            filter=closed,
+        ),
+        response_sla_met_count=Count('id', filter=closed & RESPONSE_MET),
+        resolution_sla_met_count=Count('id', filter=closed & RESOLUTION_MET),
+    )
+    stats = {}
+    for row in rows:
+        duration = row.pop('resolution_duration')
+        row['resolution_seconds_sum'] = duration.total_seconds() if duration else 0.0
+        stats[row.pop('assigned_to_id')] = row
+    return stats
+
+
+def rebuild_rollups():
+    """
+    Recomputes the daily rollups from the ticket table and replaces the stored buckets.
+    Used to backfill and to reconcile any drift. Returns the number of days covered.
+    """
+    daily, states = compute_rollups()
+    with transaction.atomic():
+        TicketDailyRollup.objects.all().delete()
+        TicketStateRollup.objects.all().delete()
+        TicketDailyRollup.objects.bulk_create(
+            [TicketDailyRollup(day=day, **counts) for day, counts in daily.items()],
+            batch_size=1000,
+        )
+        TicketStateRollup.objects.bulk_create(
+            [TicketStateRollup(day=day, status=status, priority=priority, count=n) for (day, status, priority), n in states.items()],
+            batch_size=1000,
+        )
+    return len(daily)
+
+
+def rebuild_agent_stats():
+    """Recomputes every assignee's statistics and replaces the stored rows. Returns the row count."""
+    stats = compute_agent_stats()
+    with transaction.atomic():
+        AgentStats.objects.all().delete()
+        AgentStats.objects.bulk_create(
+            [AgentStats(agent_id=agent_id, **values) for agent_id, values in stats.items()],
+            batch_size=1000,
+        )
+    return len(stats)
@@ -0,0 +1,186 @@
+# tickets/search.py
+"""
+Full-text search over tickets and their comments.
+
+Each ticket has a TicketSearchDocument row holding its title, description and the text of
+its human comments. PostgreSQL indexes it through a generated, weighted tsvector column with
+a GIN index; SQLite through an FTS5 table that triggers keep in step with the documents (see
+migration 0010). Results are ranked (title > description > comments) and paged with a
+(rank, ticket id) cursor, so every page is one indexed lookup.
+"""
+import math
+import re
+
+from django.db import connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+
+from .models import Comment, Ticket, TicketSearchDocument
+from .pagination import decode_cursor, encode_cursor
+
+SEARCH_PAGE_SIZE = 20
+
+# Automated comments add no searchable content, only noise
+SYSTEM_USERNAME = 'system_bot'
+
+SQLITE_FTS_TABLE = 'tickets_ticketsearch_fts'
+
+# Column weights for bm25 on SQLite, mirroring the tsvector weights A/B/C on PostgreSQL
+SQLITE_WEIGHTS = (10.0, 4.0, 1.0)
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Largest ticket id a 64-bit integer column can hold
+MAX_TICKET_ID = 2 ** 63 - 1
+
+
+def index_ticket(ticket):
+    """Creates or refreshes a ticket's search document from its title and description."""
+    TicketSearchDocument.objects.update_or_create(
+        ticket_id=ticket.pk,
+        defaults={'title': ticket.title, 'description': ticket.description},
+    )
+
+
+def index_comment(comment):
+    """Appends a comment's text to its ticket's search document in a single UPDATE."""
+    if comment.user.username == SYSTEM_USERNAME:
+        return
+    TicketSearchDocument.objects.filter(ticket_id=comment.ticket_id).update(
+        comments=Concat(F('comments'), Value('\n'), Value(comment.text)),
+    )
+
+
+def rebuild_search_index(batch_size=1000):
+    """
+    Rebuilds every search document from the ticket and comment tables, in batches of tickets.
+    Returns the number of documents written.
+    """
+    written = 0
+    last_id = 0
+    with transaction.atomic():
+        TicketSearchDocument.objects.all().delete()
+        while True:
+            tickets = list(
+                Ticket.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'title', 'description')[:batch_size]
+            )
+            if not tickets:
+                break
+            last_id = tickets[-1][0]
+
+            comments = {}
+            for ticket_id, text in (
+                Comment.objects.filter(ticket_id__in=[t[0] for t in tickets])
+                .exclude(user__username=SYSTEM_USERNAME)
+                .order_by('ticket_id', 'created_at', 'id')
+                .values_list('ticket_id', 'text')
+            ):
+                comments.setdefault(ticket_id, []).append(text)
+
+            TicketSearchDocument.objects.bulk_create([
+                TicketSearchDocument(
+                    ticket_id=ticket_id, title=title, description=description,
+                    comments=''.join(f'\n{text}' for text in comments.get(ticket_id, [])),
+                )
+                for ticket_id, title, description in tickets
+            ])
+            written += len(tickets)
+
+        if connection.vendor == 'sqlite':
+            # Re-derive the FTS index from the content table in one pass
+            with connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')")
+    return written
+
+
+def _fts5_query(query):
+    # Quote every word so user input can't break FTS5 syntax; the last one matches as a prefix
+    words = WORD_RE.findall(query)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"' for word in words[:-1]) + f' "{words[-1]}"*'
+
+
+def _ranked_ids(query, cursor, limit):
+    """Returns [(ticket_id, rank)], best first, strictly after `cursor` (a [rank, ticket_id] pair)."""
+    after = ''
+    params = []
+    if connection.vendor == 'postgresql':
+        sql = (
+            "SELECT ticket_id, rank FROM ("
+            " SELECT d.ticket_id, ts_rank_cd(d.search_vector, q)::double precision AS rank"
+            " FROM tickets_ticketsearchdocument d, websearch_to_tsquery('english', %s) q"
+            " WHERE d.search_vector @@ q"
+            ") ranked"
+        )
+        params.append(query)
+    elif connection.vendor == 'sqlite':
+        match = _fts5_query(query)
+        if match is None:
+            return []
+        sql = (
+            "SELECT ticket_id, rank FROM ("
+            f" SELECT rowid AS ticket_id, -bm25({SQLITE_FTS_TABLE}, %s, %s, %s) AS rank"
+            f" FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s"
+            ") ranked"
+        )
+        params.extend([*SQLITE_WEIGHTS, match])
+    else:
+        return _ranked_ids_fallback(query, cursor, limit)
+
+    if cursor is not None:
+        after = " WHERE rank < %s OR (rank = %s AND ticket_id < %s)"
+        params.extend([cursor[0], cursor[0], cursor[1]])
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql + after + " ORDER BY rank DESC, ticket_id DESC LIMIT %s", [*params, limit])
+        return [(ticket_id, float(rank)) for ticket_id, rank in db_cursor.fetchall()]
+
+
+def _ranked_ids_fallback(query, cursor, limit):
+    # Unindexed substring match for backends without a full-text index; every hit ranks equally
+    documents = TicketSearchDocument.objects.all()
+    for word in WORD_RE.findall(query):
+        documents = documents.filter(title__icontains=word) | documents.filter(description__icontains=word) | documents.filter(comments__icontains=word)
+    if cursor is not None:
+        documents = documents.filter(ticket_id__lt=cursor[1])
+    return [(ticket_id, 0.0) for ticket_id in documents.order_by('-ticket_id').values_list('ticket_id', flat=True)[:limit]]
+
+
+def _search_cursor(token):
+    """
+    Decodes a search cursor into (rank, ticket_id). Returns None unless it holds a finite
+    number and an id in range, so tampered cursors never reach the SQL parameters.
+    """
+    values = decode_cursor(token, 2)
+    if values is None:
+        return None
+    rank, ticket_id = values
+    if isinstance(rank, bool) or not isinstance(rank, (int, float)) or not math.isfinite(rank):
+        return None
+    if isinstance(ticket_id, bool) or not isinstance(ticket_id, int) or not 0 < ticket_id <= MAX_TICKET_ID:
+        return None
+    return float(rank), ticket_id
+
+
+def search_tickets(query, cursor=None, page_size=SEARCH_PAGE_SIZE):
+    """
+    Ranked full-text search. Returns (tickets, next_cursor): the page's tickets in rank
+    order, each carrying its `search_rank`, and the cursor for the next page or None.
+    """
+    if not query or not query.strip():
+        return [], None
+    after = _search_cursor(cursor)
+    hits = _ranked_ids(query, after, page_size + 1)
+
+    has_more = len(hits) > page_size
+    hits = hits[:page_size]
+    tickets = Ticket.objects.select_related('assigned_to').in_bulk([ticket_id for ticket_id, _ in hits])
+    results = []
+    for ticket_id, rank in hits:
+        ticket = tickets.get(ticket_id)
+        if ticket is not None:
+            ticket.search_rank = rank
+            results.append(ticket)
+
+    next_cursor = encode_cursor(list(hits[-1][::-1])) if has_more else None
+    return results, next_cursor
@@ -0,0 +1,46 @@
+# tickets/services.py
+"""
+Ticket write paths shared by the views, the admin and any future API.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .assignment import MAX_AGENT_WEIGHT_CAP, pick_available_agent
+from .models import Ticket
+from .sla import sla_deadlines
+
+
+def save_new_ticket(ticket, actor=None):
+    """
+    Fills in an unsaved ticket's assignee, status and SLA deadlines, then inserts it.
+
+    Everything is decided before the INSERT, so a ticket costs one write. The chosen agent's
+    load row stays locked until the transaction commits, which keeps concurrent creations
+    from piling onto the same agent.
+    """
+    with transaction.atomic():
+        if not ticket.assigned_to_id:
+            available_agent = pick_available_agent(lock=True)
+            if available_agent:
+                ticket.assigned_to = available_agent
+                ticket.status = 'assigned'
+                print(f"Ticket '{ticket.title}' automatically assigned to {available_agent.username} (Load: {available_agent.weighted_ticket_load or 0})")
+            else:
+                ticket.status = 'open'
+                print(f"No active agents available below cap ({MAX_AGENT_WEIGHT_CAP} weight). Ticket '{ticket.title}' remains open and unassigned.")
+
+        # SLA deadlines run from creation, based on the ticket's priority
+        ticket.response_due_at, ticket.resolution_due_at = sla_deadlines(ticket.priority, timezone.now())
+
+        if actor is not None:
+            ticket._actor = actor
+        ticket.save(force_insert=True)
+    return ticket
+
+
+def create_ticket(title, description, create_by, priority='low', actor=None, **fields):
+    """Creates, assigns and inserts a ticket; see save_new_ticket."""
+    return save_new_ticket(
+        Ticket(title=title, description=description, create_by=create_by, priority=priority, **fields),
+        actor=actor,
+    )
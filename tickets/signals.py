@@ -1,77 +1,159 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_init, pre_save, post_save, post_delete
 from django.dispatch import receiver
-from django.db.models import Count, Q, Case, When, IntegerField, Sum
-from datetime import datetime, timedelta
 from django.utils import timezone
-from .models import Ticket, CustomUser
+from .models import Ticket, Comment, CustomUser, AgentLoad, TicketEvent
+from .assignment import ticket_weight, adjust_agent_load, rebuild_agent_loads
+from .rollups import apply_rollup_deltas, rollup_delta
+from .events import is_response, resolved_at_for, state_events
+from .sla import escalate_at_for
+from .search import index_comment, index_ticket
+from . import live
+
+# --- Denormalized counters (agent loads, dashboard rollups, agent statistics) and the event log ---
+# Every ticket remembers the tracked fields it was loaded or last saved with, so a save
+# can move exactly its own contribution between counters without re-aggregating anything.
+TRACKED_FIELDS = (
+    'assigned_to_id', 'status', 'priority', 'created_at', 'updated_at',
+    'response_due_at', 'resolution_due_at', 'first_response_at', 'resolved_at',
+)
+
+def _saved_state(ticket):
+    # Read straight from __dict__ so deferred fields never trigger a query here
+    values = ticket.__dict__
+    if any(name not in values for name in TRACKED_FIELDS):
+        return None
+    return {name: values[name] for name in TRACKED_FIELDS}
+
+def _load_contribution(state):
+    return state.get('assigned_to_id'), ticket_weight(state.get('status'), state.get('priority'))
+
+def _search_text(ticket):
+    return ticket.__dict__.get('title'), ticket.__dict__.get('description')
+
+@receiver(post_init, sender=Ticket)
+def remember_ticket_state(sender, instance, **kwargs):
+    # Unsaved tickets don't count towards anything yet
+    instance._saved_state = _saved_state(instance) if instance.pk is not None else {}
+    instance._indexed_text = _search_text(instance)
+
+def _actor_id(ticket):
+    # Views set `_actor` to the requesting user; anything else is an automated change
+    actor = getattr(ticket, '_actor', None)
+    return actor.pk if actor is not None else None
+
+@receiver(pre_save, sender=Ticket)
+def stamp_resolved_at(sender, instance, **kwargs):
+    old_state = getattr(instance, '_saved_state', None)
+    if old_state is not None and 'status' in instance.__dict__:
+        instance.resolved_at = resolved_at_for(old_state.get('status'), instance.status, instance.resolved_at, timezone.now())
+
+@receiver(pre_save, sender=Ticket)
+def schedule_escalation(sender, instance, **kwargs):
+    # Re-queue whenever the deadline or what makes a ticket escalatable changes;
+    # check_overdue_tickets re-queues the tickets it escalates itself
+    old_state = getattr(instance, '_saved_state', None)
+    if old_state is None:
+        return
+    if not old_state or any(old_state[name] != getattr(instance, name) for name in ('status', 'priority', 'resolution_due_at')):
+        instance.escalate_at = escalate_at_for(instance.status, instance.priority, instance.resolution_due_at)
+
+@receiver(post_save, sender=Ticket)
+def update_counters_on_save(sender, instance, **kwargs):
+    old_state = getattr(instance, '_saved_state', None)
+    new_state = _saved_state(instance)
+
+    if old_state is None or new_state is None:
+        # Saved from a partially loaded instance - recount whoever holds it now;
+        # the rollups are left to the periodic reconcile
+        if instance.assigned_to_id:
+            rebuild_agent_loads(agent_ids=[instance.assigned_to_id])
+    elif old_state != new_state:
+        old_agent, old_weight = _load_contribution(old_state)
+        new_agent, new_weight = _load_contribution(new_state)
+        if old_agent == new_agent:
+            adjust_agent_load(new_agent, new_weight - old_weight)
+        else:
+            adjust_agent_load(old_agent, -old_weight)
+            adjust_agent_load(new_agent, new_weight)
+
+        apply_rollup_deltas(rollup_delta(old_state, new_state))
+
+        # A new ticket's creator is its actor unless a view said otherwise
+        actor_id = _actor_id(instance) or (instance.create_by_id if not old_state else None)
+        TicketEvent.objects.bulk_create(state_events(instance.pk, old_state, new_state, actor_id, instance.updated_at))
+        _publish_change(instance, old_state, new_state)
+
+    instance._saved_state = new_state
+
+def _publish_change(ticket, old_state, new_state):
+    # Dashboards only show status, priority and assignee, so other changes aren't pushed
+    if not live.enabled():
+        return
+    if not old_state:
+        kind = 'created'
+    elif old_state['assigned_to_id'] != new_state['assigned_to_id']:
+        kind = 'assigned'
+    elif old_state['status'] != new_state['status'] or old_state['priority'] != new_state['priority']:
+        kind = 'updated'
+    else:
+        return
+    live.publish([live.ticket_event(
+        kind, ticket.pk, ticket.create_by_id, (old_state.get('assigned_to_id'), ticket.assigned_to_id), **live.ticket_row(ticket),
+    )])
 
 @receiver(post_save, sender=Ticket)
-def assign_new_ticket_and_set_sla(sender, instance, created, **kwargs):
+def update_search_document(sender, instance, created, **kwargs):
+    # Only new tickets and edited titles/descriptions touch the search index
+    text = _search_text(instance)
+    if created or (None not in text and text != instance._indexed_text):
+        index_ticket(instance)
+    instance._indexed_text = text
+
+@receiver(post_delete, sender=Ticket)
+def update_counters_on_delete(sender, instance, **kwargs):
+    state = getattr(instance, '_saved_state', None)
+    if state:
+        agent, weight = _load_contribution(state)
+        adjust_agent_load(agent, -weight)
+        apply_rollup_deltas(rollup_delta(state, {}))
+    if live.enabled():
+        live.publish([live.ticket_event('deleted', instance.pk, instance.create_by_id, (instance.assigned_to_id,))])
+
+@receiver(post_save, sender=Comment)
+def record_first_response(sender, instance, created, **kwargs):
+    # The first staff comment stamps first_response_at; the conditional UPDATE keeps it the first
+    ticket = instance.ticket
+    if not created or ticket.first_response_at is not None or not is_response(instance, ticket.create_by_id):
+        return
+    with transaction.atomic():
+        if not Ticket.objects.filter(pk=ticket.pk, first_response_at__isnull=True).update(first_response_at=instance.created_at):
+            return
+        TicketEvent.objects.create(ticket=ticket, kind='first_response', actor=instance.user, created_at=instance.created_at)
+
+        # The UPDATE bypasses the ticket signals: response SLA outcomes of closed tickets move here
+        old_state = getattr(ticket, '_saved_state', None)
+        ticket.first_response_at = instance.created_at
+        if old_state:
+            new_state = _saved_state(ticket)
+            apply_rollup_deltas(rollup_delta(old_state, new_state))
+            ticket._saved_state = new_state
+
+@receiver(post_save, sender=Comment)
+def update_search_document_comments(sender, instance, created, **kwargs):
     if created:
-        if not instance.assigned_to:
-            try:
-                PRIORITY_WEIGHTS = {
-                    'high': 3,
-                    'medium': 2,
-                    'low': 1,
-                }
-
-                MAX_AGENT_WEIGHT_CAP = 10
-
-                agents_with_load = CustomUser.objects.filter(
-                    role='agent',
-                    is_active=True,
-                ).annotate(
-                    weighted_ticket_load = Sum(
-                        Case(
-                            When(assigned_tickets__status__in=['open', 'assigned', 'in_progress', 'reopened', 'awaiting_customer_response'],
-                                 assigned_tickets__priority='high', then=PRIORITY_WEIGHTS['high']),
-                            When(assigned_tickets__status__in=['open', 'assigned', 'in_progress', 'reopened', 'awaiting_customer_response'],
-                                 assigned_tickets__priority='medium', then=PRIORITY_WEIGHTS['medium']),
-                            When(assigned_tickets__status__in=['open', 'assigned', 'in_progress', 'reopened', 'awaiting_customer_response'],
-                                 assigned_tickets__priority='low', then=PRIORITY_WEIGHTS['low']),
-                            default=0,
-                            output_field=IntegerField()
-                        )
-                    )
-                )
-
-                available_agents_below_cap = agents_with_load.filter(
-                    weighted_ticket_load__lt=MAX_AGENT_WEIGHT_CAP
-                ).order_by('weighted_ticket_load') 
-
-                available_agent = available_agents_below_cap.first()
-
-                if available_agent:
-                    instance.assigned_to = available_agent
-                    instance.status = 'assigned'
-                    print(f"Ticket '{instance.title}' automatically assigned to {available_agent.username} (Load: {available_agent.weighted_ticket_load or 0})")
-                else:
-                    instance.status = 'open'
-                    print(f"No active agents available below cap ({MAX_AGENT_WEIGHT_CAP} weight). Ticket '{instance.title}' remains open and unassigned.")
-            except Exception as e:
-                print(f"Error during weighted auto-assignment for ticket '{instance.title}': {e}")
-        
-        SLA_TARGETS = {
-            'high': {'response': timedelta(hours=1), 'resolution': timedelta(hours=4)},
-            'medium': {'response': timedelta(hours=4), 'resolution': timedelta(hours=24)},
-            'low': {'response': timedelta(hours=24), 'resolution': timedelta(minutes=2)},
-        }
-
-        # Get the current time in the timezone defined in settings.py (USE_TZ = True)
-        now = timezone.now()
-
-        # Calculate due dates based on the ticket's priority
-        priority_sla = SLA_TARGETS.get(instance.priority, SLA_TARGETS['low']) # Default to low if priority not found
-
-        instance.response_due_at = now + priority_sla['response']
-        instance.resolution_due_at = now + priority_sla['resolution']
-        print(f"SLA set for Ticket '{instance.title}': Response Due: {instance.response_due_at}, Resolution Due: {instance.resolution_due_at}")
-
-        # Save the instance again with assigned_to and SLA dates
-        # Disconnect/reconnect to prevent recursion if this save triggers post_save again
-        post_save.disconnect(assign_new_ticket_and_set_sla, sender=Ticket)
-        instance.save()
-        post_save.connect(assign_new_ticket_and_set_sla, sender=Ticket)
-        
+        index_comment(instance)
+
+@receiver(post_save, sender=Comment)
+def publish_comment(sender, instance, created, **kwargs):
+    if created and live.enabled():
+        ticket = instance.ticket
+        live.publish([live.ticket_event(
+            'commented', ticket.pk, ticket.create_by_id, (ticket.assigned_to_id,), user=instance.user.username,
+        )])
 
+@receiver(post_save, sender=CustomUser)
+def ensure_agent_load_row(sender, instance, **kwargs):
+    # Every agent needs a counter row to be found by pick_available_agent
+    if instance.role == 'agent':
+        AgentLoad.objects.get_or_create(agent=instance)
@@ -0,0 +1,39 @@
+# tickets/sla.py
+from datetime import timedelta
+
+from .models import ACTIVE_STATUSES
+
+SLA_TARGETS = {
+    'high': {'response': timedelta(hours=1), 'resolution': timedelta(hours=4)},
+    'medium': {'response': timedelta(hours=4), 'resolution': timedelta(hours=24)},
+    'low': {'response': timedelta(hours=24), 'resolution': timedelta(minutes=2)},
+}
+
+
+def sla_deadlines(priority, start):
+    """
+    Returns (response_due_at, resolution_due_at) for a ticket of `priority` opened at `start`.
+    Unknown priorities get the 'low' targets.
+    """
+    priority_sla = SLA_TARGETS.get(priority, SLA_TARGETS['low'])
+    return start + priority_sla['response'], start + priority_sla['resolution']
+
+
+# Where an overdue ticket's priority moves on escalation
+ESCALATION_STEPS = {
+    'low': 'medium',
+    'medium': 'high',
+}
+
+# How long an escalated ticket that is still overdue waits before its next escalation
+ESCALATION_INTERVAL = timedelta(minutes=30)
+
+
+def escalate_at_for(status, priority, resolution_due_at):
+    """
+    When a ticket next needs escalating: its resolution deadline while it is active and
+    can still move up a priority, otherwise never (None).
+    """
+    if status in ACTIVE_STATUSES and priority in ESCALATION_STEPS:
+        return resolution_due_at
+    return None
@@ -0,0 +1,161 @@
+# tickets/synthetic.py
+"""
+Synthetic users, tickets and comments at production-like volumes, for local load and
+benchmark runs (generate_synthetic_data, benchmark_hot_paths).
+
+Tickets follow the shape of a mature helpdesk: most of the history is resolved or closed,
+only a small recent share is active, and active tickets are only assigned while their agent
+stays under MAX_AGENT_WEIGHT_CAP; the rest wait in the open backlog, as they would in
+production. Rows go through the importer's bulk write path, so SLA deadlines, events and
+search documents look exactly like imported data, and the counters are rebuilt at the end.
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db.models import Max
+from django.utils import timezone
+
+from .assignment import MAX_AGENT_WEIGHT_CAP, ticket_weight
+from .events import RESOLVED_STATUSES
+from .importer import write_tickets
+from .models import AgentLoad, Comment, CustomUser, Ticket
+from .sla import SLA_TARGETS, escalate_at_for, sla_deadlines
+
+SYNTHETIC_BATCH_SIZE = 2000
+
+# Every synthetic account logs in with this password
+SYNTHETIC_PASSWORD = 'synthetic'
+
+PRIORITY_MIX = {'low': 0.5, 'medium': 0.35, 'high': 0.15}
+
+# How the active share splits between the active statuses
+ACTIVE_STATUS_MIX = {'open': 0.3, 'assigned': 0.25, 'in_progress': 0.25, 'awaiting_customer_response': 0.12, 'reopened': 0.08}
+
+# How finished tickets split
+FINISHED_STATUS_MIX = {'closed': 0.75, 'resolved': 0.25}
+
+# Active tickets were all opened within this window
+ACTIVE_WINDOW = timedelta(days=14)
+
+SUBJECTS = ['printer', 'VPN', 'email', 'laptop', 'password reset', 'invoice', 'wifi', 'database', 'login page', 'report export']
+PROBLEMS = ['is down', 'is slow', 'keeps failing', 'shows an error', 'is not working', 'needs access', 'crashed', 'question']
+CUSTOMER_LINES = ['Any update on this?', 'Still seeing the problem.', 'Thanks, that fixed it.', 'Attached more details.']
+AGENT_LINES = ['Looking into this now.', 'Could you send a screenshot?', 'A fix has been deployed, please retry.', 'Escalated to the platform team.']
+
+
+def _pick(rng, mix):
+    return rng.choices(list(mix), weights=list(mix.values()))[0]
+
+
+def create_users(prefix, role, count, password=SYNTHETIC_PASSWORD):
+    """
+    Bulk-creates `count` users named <prefix><n>, continuing after existing ones. Returns their ids.
+    A `password` of None gives them unusable passwords.
+    """
+    if count <= 0:
+        return []
+    existing = CustomUser.objects.filter(username__startswith=prefix).count()
+    password = make_password(password)
+    users = CustomUser.objects.bulk_create([
+        CustomUser(username=f'{prefix}{existing + n}', role=role, password=password, email=f'{prefix}{existing + n}@example.com')
+        for n in range(count)
+    ], batch_size=SYNTHETIC_BATCH_SIZE)
+    if role == 'agent':
+        # bulk_create skips ensure_agent_load_row
+        AgentLoad.objects.bulk_create([AgentLoad(agent=user) for user in users], ignore_conflicts=True)
+    return [user.pk for user in users]
+
+
+class TicketGenerator:
+    """Builds tickets for write_tickets, keeping every agent's active load under the cap."""
+
+    def __init__(self, customer_ids, agent_ids, days, active_share, comments_per_ticket, seed=None):
+        self.rng = random.Random(seed)
+        self.customer_ids = customer_ids
+        self.agent_ids = agent_ids
+        self.days = days
+        self.active_share = active_share
+        self.comments_per_ticket = comments_per_ticket
+        self.now = timezone.now()
+        self.loads = dict(AgentLoad.objects.filter(agent_id__in=agent_ids).values_list('agent_id', 'weighted_load'))
+        self.number = (Ticket.objects.aggregate(n=Max('id'))['n'] or 0) + 1
+
+    def _agent_with_capacity(self, weight):
+        for _ in range(5):
+            agent_id = self.rng.choice(self.agent_ids)
+            if self.loads.get(agent_id, 0) + weight <= MAX_AGENT_WEIGHT_CAP:
+                self.loads[agent_id] = self.loads.get(agent_id, 0) + weight
+                return agent_id
+        return None
+
+    def ticket(self):
+        rng = self.rng
+        priority = _pick(rng, PRIORITY_MIX)
+        active = rng.random() < self.active_share
+        if active:
+            status = _pick(rng, ACTIVE_STATUS_MIX)
+            created_at = self.now - timedelta(seconds=rng.uniform(0, ACTIVE_WINDOW.total_seconds()))
+        else:
+            status = _pick(rng, FINISHED_STATUS_MIX)
+            created_at = self.now - timedelta(days=rng.uniform(0, self.days))
+
+        creator_id = rng.choice(self.customer_ids)
+        assignee_id = None
+        if status != 'open' and self.agent_ids:
+            if active:
+                assignee_id = self._agent_with_capacity(ticket_weight(status, priority))
+                if assignee_id is None:
+                    # Nobody has room: it waits in the backlog like a real unassigned ticket
+                    status = 'open'
+            else:
+                assignee_id = rng.choice(self.agent_ids)
+
+        # Responses land around the SLA target, so some tickets meet it and some don't
+        targets = SLA_TARGETS[priority]
+        comments, first_response = [], None
+        at = created_at
+        for n in range(rng.randint(0, 2 * self.comments_per_ticket)):
+            responder = assignee_id is not None and n % 2 == 0
+            at += targets['response'] * rng.uniform(0.2, 1.6) if responder else timedelta(hours=rng.uniform(0.5, 24))
+            if at >= self.now:
+                break
+            comment = Comment(
+                user_id=assignee_id if responder else creator_id,
+                text=rng.choice(AGENT_LINES if responder else CUSTOMER_LINES),
+                created_at=at,
+            )
+            comments.append((comment, None))
+            if responder and first_response is None:
+                first_response = comment
+
+        updated_at = min(self.now, at + timedelta(hours=rng.uniform(0, 4)))
+        if status in RESOLVED_STATUSES:
+            updated_at = min(self.now, created_at + targets['resolution'] * rng.uniform(0.3, 3))
+        response_due_at, resolution_due_at = sla_deadlines(priority, created_at)
+
+        ticket = Ticket(
+            title=f"#{self.number} {rng.choice(SUBJECTS)} {rng.choice(PROBLEMS)}",
+            description=f"Synthetic ticket {self.number}. " + ' '.join(rng.choices(SUBJECTS + PROBLEMS, k=12)),
+            status=status,
+            priority=priority,
+            create_by_id=creator_id,
+            assigned_to_id=assignee_id,
+            created_at=created_at,
+            updated_at=max(updated_at, created_at),
+            response_due_at=response_due_at,
+            resolution_due_at=resolution_due_at,
+            first_response_at=first_response.created_at if first_response else None,
+            resolved_at=updated_at if status in RESOLVED_STATUSES else None,
+            escalate_at=escalate_at_for(status, priority, resolution_due_at),
+        )
+        ticket._first_responder_id = first_response.user_id if first_response else None
+        self.number += 1
+        return ticket, comments
+
+    def write(self, count, batch_size=SYNTHETIC_BATCH_SIZE):
+        """Generates and writes `count` tickets in batches; yields the running total after each batch."""
+        written = 0
+        while written < count:
+            written += write_tickets([self.ticket() for _ in range(min(batch_size, count - written))])
+            yield written
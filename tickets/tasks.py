@@ -1,32 +1,44 @@
 # tickets/tasks.py
+from collections import Counter
+from itertools import islice
 from django.utils import timezone
-from django.db.models import Q, Case, When, IntegerField, Sum # Import necessary for weighted load
-from .models import Ticket, CustomUser, Comment
+from django.db import transaction
+from django.db.models import F, Case, When, Value, DateTimeField
+from .models import Ticket, CustomUser, Comment, TicketEvent
+from .assignment import ACTIVE_STATUSES, PRIORITY_WEIGHTS, adjust_agent_load, assign_backlog, pick_available_agent
+from .ai_client import classifier_client
+from .classifier import ClassifierError, ClassifierUnavailable, classify_priority, fallback_priority
+from .sla import ESCALATION_INTERVAL, ESCALATION_STEPS, sla_deadlines
+from .events import state_events
+from . import classifier_metrics, live
+from .rollups import apply_rollup_deltas, rebuild_agent_stats, rebuild_rollups, rollup_delta
 from datetime import timedelta
 from celery import shared_task
 
+# How many escalation comments are built and inserted per round-trip
+ESCALATION_BATCH_SIZE = 1000
+
 @shared_task
 def check_overdue_tickets():
     """
-    Checks for tickets that have exceeded their resolution_due_at time
-    and performs escalation actions.
+    Escalates tickets whose escalate_at deadline has passed, reading only the due end of
+    the indexed escalation queue, so it can run every minute at a cost proportional to the
+    number of breaches. Escalation comments and priority events are inserted in chunks,
+    then a conditional UPDATE of the streamed ids bumps low->medium and medium->high and
+    re-queues the tickets that can still escalate ESCALATION_INTERVAL later.
     """
     now = timezone.now()
 
-    # Find tickets that are not closed and whose resolution_due_at has passed
-    # Exclude tickets that are already 'high' priority and overdue to prevent redundant escalation
-    overdue_tickets = Ticket.objects.filter(
-        status__in=['open', 'assigned', 'in_progress', 'reopened', 'awaiting_customer_response'], # Include new active statuses
-        resolution_due_at__lt=now
-    ).exclude(
-        Q(priority='high') & Q(status__in=['open', 'assigned', 'in_progress', 'reopened', 'awaiting_customer_response'])
-    )
+    due_tickets = Ticket.objects.filter(escalate_at__lte=now)
+    escalatable = {'status__in': ACTIVE_STATUSES, 'priority__in': list(ESCALATION_STEPS)}
 
+    # Writes that bypass the ticket signals can leave finished or 'high' tickets queued; drop them
+    due_tickets.exclude(**escalatable).update(escalate_at=None)
+
+    overdue_tickets = due_tickets.filter(**escalatable)
     if not overdue_tickets.exists():
         print("No overdue tickets found.")
-        return
-
-    print(f"Found {overdue_tickets.count()} overdue tickets. Initiating escalation...")
+        return 0
 
     # Get or create a system user for automated comments
     system_user, created = CustomUser.objects.get_or_create(
@@ -36,80 +48,86 @@ def check_overdue_tickets():
     if created:
         print("Created system_bot user for automated actions.")
 
-    for ticket in overdue_tickets:
-        print(f"Escalating Ticket ID: {ticket.id}, Title: '{ticket.title}'")
-
-        # 1. Update Priority (if not already high)
-        original_priority = ticket.priority
-        if ticket.priority == 'low':
-            ticket.priority = 'medium'
-        elif ticket.priority == 'medium':
-            ticket.priority = 'high'
-        # If it's already high, keep it high.
-
-        # 2. Add an internal comment (for audit trail)
-        comment_text = f"AUTOMATED ESCALATION: This ticket has exceeded its resolution SLA. Priority escalated from {original_priority.upper()} to {ticket.priority.upper()}."
-        Comment.objects.create(
-            ticket=ticket,
-            user=system_user,
-            text=comment_text
-        )
-        print(f"  - Added automated comment to ticket {ticket.id}")
-
-        # 3. (Optional) Send Notifications (requires email setup)
-        # from django.core.mail import send_mail
-        # if ticket.assigned_to:
-        #     send_mail(
-        #         f"URGENT: Ticket #{ticket.id} - {ticket.title} is OVERDUE!",
-        #         f"Ticket #{ticket.id} assigned to you is overdue for resolution. Current priority: {ticket.priority.upper()}.\n\nLink: http://127.0.0.1:8000/tickets/{ticket.id}/",
-        #         "noreply@yourdomain.com", # From email
-        #         [ticket.assigned_to.email], # To email (assigned agent)
-        #         fail_silently=False,
-        #     )
-        #     print(f"  - Sent overdue notification to agent {ticket.assigned_to.username}")
-
-        # 4. (Optional) Re-assign to a different agent/team lead
-        # This logic can be complex, e.g., finding the least busy admin or a specialized team.
-        # if ticket.assigned_to and ticket.priority == 'high' and ticket.assigned_to.role == 'agent':
-        #     try:
-        #         admin_user = CustomUser.objects.filter(role='admin').first()
-        #         if admin_user and admin_user != ticket.assigned_to:
-        #             ticket.assigned_to = admin_user
-        #             print(f"  - Re-assigned ticket {ticket.id} to admin {admin_user.username} due to high priority overdue.")
-        #     except Exception as e:
-        #         print(f"  - Error during re-assignment: {e}")
-
-        # Save the changes to the ticket
-        ticket.save()
-        print(f"Ticket {ticket.id} escalation complete.")
+    escalated_ids = []
+    load_deltas = Counter()
+    rollup_deltas = Counter()
+
+    with transaction.atomic():
+        # Lock the overdue rows while we stream them; the UPDATE below is limited to their ids, so
+        # tickets that become due meanwhile wait for the next run instead of escalating unrecorded.
+        # Queue order walks the escalation index; ordering by id alone lets the planner scan the table
+        rows = overdue_tickets.select_for_update().order_by('escalate_at', 'id').values_list(
+            'id', 'priority', 'assigned_to_id', 'status', 'created_at', 'create_by_id'
+        ).iterator(chunk_size=ESCALATION_BATCH_SIZE)
+
+        while True:
+            chunk = list(islice(rows, ESCALATION_BATCH_SIZE))
+            if not chunk:
+                break
+
+            comments, events, updates = [], [], []
+            for ticket_id, priority, assigned_to_id, status, created_at, create_by_id in chunk:
+                new_priority = ESCALATION_STEPS[priority]
+                comments.append(Comment(
+                    ticket_id=ticket_id,
+                    user=system_user,
+                    text=f"AUTOMATED ESCALATION: This ticket has exceeded its resolution SLA. Priority escalated from {priority.upper()} to {new_priority.upper()}."
+                ))
+                if assigned_to_id:
+                    load_deltas[assigned_to_id] += PRIORITY_WEIGHTS[new_priority] - PRIORITY_WEIGHTS[priority]
+                old_state = {'status': status, 'priority': priority, 'created_at': created_at}
+                new_state = dict(old_state, priority=new_priority)
+                rollup_deltas.update(rollup_delta(old_state, new_state))
+                events.extend(state_events(ticket_id, old_state, new_state, at=now))
+                updates.append(live.ticket_event('escalated', ticket_id, create_by_id, (assigned_to_id,), priority=new_priority))
+            Comment.objects.bulk_create(comments, batch_size=ESCALATION_BATCH_SIZE)
+            TicketEvent.objects.bulk_create(events, batch_size=ESCALATION_BATCH_SIZE)
+            live.publish(updates)
+            escalated_ids.extend(row[0] for row in chunk)
+
+        if not escalated_ids:
+            print("No overdue tickets found.")
+            return 0
+
+        # Updated once the stream is done: moving escalate_at under an open cursor on that index could revisit rows
+        for start in range(0, len(escalated_ids), ESCALATION_BATCH_SIZE):
+            Ticket.objects.filter(pk__in=escalated_ids[start:start + ESCALATION_BATCH_SIZE]).update(
+                priority=Case(
+                    *[When(priority=old, then=Value(new)) for old, new in ESCALATION_STEPS.items()],
+                    default=F('priority'),
+                ),
+                # Still escalatable after this step (e.g. low->medium): due again one interval from now
+                escalate_at=Case(
+                    *[When(priority=old, then=Value(now + ESCALATION_INTERVAL))
+                      for old, new in ESCALATION_STEPS.items() if new in ESCALATION_STEPS],
+                    default=Value(None),
+                    output_field=DateTimeField(),
+                ),
+                updated_at=now,
+            )
+
+        # The UPDATE bypasses the ticket signals, so move the escalated weight onto each agent
+        # and the tickets between dashboard buckets here
+        for agent_id, delta in load_deltas.items():
+            adjust_agent_load(agent_id, delta)
+        apply_rollup_deltas(rollup_deltas)
+
+    print(f"Escalated {len(escalated_ids)} overdue tickets.")
+    return len(escalated_ids)
 
 
 @shared_task
 def assign_unassigned_tickets():
     """
     Periodically checks for unassigned tickets (status 'open', assigned_to is None)
-    and attempts to assign them to agents based on weighted load and cap.
+    and assigns them in bulk to agents based on weighted load and cap.
     """
     print("Running assign_unassigned_tickets task...")
-    
-    unassigned_tickets = Ticket.objects.filter(
-        status='open',
-        assigned_to__isnull=True # Only unassigned tickets
-    ).order_by('created_at') # Prioritize older unassigned tickets
 
-    if not unassigned_tickets.exists():
+    if not Ticket.objects.filter(status='open', assigned_to__isnull=True).exists():
         print("No unassigned tickets found to assign.")
         return
 
-    # Define weights for each priority level (same as in signals.py)
-    PRIORITY_WEIGHTS = {
-        'high': 3,
-        'medium': 2,
-        'low': 1,
-    }
-    # Define the maximum weighted load an agent should take (same as in signals.py)
-    MAX_AGENT_WEIGHT_CAP = 10
-
     # Get or create a system user for automated comments (for assignment comment)
     system_user, created = CustomUser.objects.get_or_create(
         username='system_bot',
@@ -118,50 +136,85 @@ def assign_unassigned_tickets():
     if created:
         print("Created system_bot user for automated actions.")
 
+    result = assign_backlog(system_user)
+    print(f"Assigned {result['assigned']} tickets in {result['seconds']}s ({result['tickets_per_second']} tickets/s).")
+    return result
+
+
+# Priority a ticket carries until the AI classification has run
+PROVISIONAL_PRIORITY = 'low'
 
-    for ticket in unassigned_tickets:
+def enqueue_priority_classification(ticket_id):
+    """
+    Queues classify_ticket_priority once the surrounding transaction commits.
+    A broker outage must not fail ticket creation, so the ticket simply keeps its provisional priority.
+    """
+    def enqueue():
         try:
-            # Annotate agents with their weighted active ticket count
-            agents_with_load = CustomUser.objects.filter(
-                role='agent',
-                is_active=True
-            ).annotate(
-                weighted_ticket_load=Sum(
-                    Case(
-                        When(assigned_tickets__status__in=['open', 'assigned', 'in_progress', 'reopened', 'awaiting_customer_response'],
-                             assigned_tickets__priority='high', then=PRIORITY_WEIGHTS['high']),
-                        When(assigned_tickets__status__in=['open', 'assigned', 'in_progress', 'reopened', 'awaiting_customer_response'],
-                             assigned_tickets__priority='medium', then=PRIORITY_WEIGHTS['medium']),
-                        When(assigned_tickets__status__in=['open', 'assigned', 'in_progress', 'reopened', 'awaiting_customer_response'],
-                             assigned_tickets__priority='low', then=PRIORITY_WEIGHTS['low']),
-                        default=0,
-                        output_field=IntegerField()
-                    )
-                )
-            )
-            
-            # Filter to only consider agents whose current load is below the cap
-            available_agents_below_cap = agents_with_load.filter(
-                weighted_ticket_load__lt=MAX_AGENT_WEIGHT_CAP
-            ).order_by('weighted_ticket_load')
+            classify_ticket_priority.delay(ticket_id)
+        except Exception as e:
+            print(f"Could not queue priority classification for ticket {ticket_id}: {e}")
+    transaction.on_commit(enqueue)
 
-            available_agent = available_agents_below_cap.first()
 
+@shared_task(bind=True, max_retries=3, default_retry_delay=10)
+def classify_ticket_priority(self, ticket_id):
+    """
+    Asks the AI classifier for a ticket's priority, then updates the priority,
+    recomputes the SLA deadlines from creation time and re-runs assignment for tickets
+    still waiting on an agent. A priority set meanwhile by an agent or by escalation wins
+    over the prediction, which can arrive minutes late after retries. Upstream failures are retried with exponential backoff
+    (never sooner than an open circuit breaker allows); once retries run out the local
+    fallback priority is used.
+    """
+    ticket = Ticket.objects.filter(pk=ticket_id).only('title', 'description', 'create_by__role').select_related('create_by').first()
+    if ticket is None:
+        print(f"Ticket {ticket_id} no longer exists; skipping classification.")
+        return None
+
+    try:
+        predicted_priority = classifier_client.run(classify_priority(ticket.title, ticket.description, ticket.create_by.role))
+    except ClassifierError as e:
+        if self.request.retries >= self.max_retries:
+            print(f"Giving up on remote classification of ticket {ticket_id}: {e} Using local fallback priority.")
+            predicted_priority = fallback_priority(ticket.title, ticket.description)
+        else:
+            countdown = self.default_retry_delay * 2 ** self.request.retries
+            if isinstance(e, ClassifierUnavailable):
+                countdown = max(countdown, e.retry_after)
+            raise self.retry(exc=e, countdown=countdown)
+    finally:
+        # This worker's client, cache and breaker counters, for classifier_status
+        classifier_metrics.publish()
+
+    with transaction.atomic():
+        ticket = Ticket.objects.select_for_update().get(pk=ticket_id)
+        provisional = ticket.priority == PROVISIONAL_PRIORITY and not ticket.events.filter(kind='priority').exists()
+        if not provisional:
+            print(f"Ticket {ticket_id} was reprioritized to {ticket.priority.upper()} meanwhile; keeping it.")
+        elif ticket.priority != predicted_priority:
+            ticket.priority = predicted_priority
+            ticket.response_due_at, ticket.resolution_due_at = sla_deadlines(predicted_priority, ticket.created_at)
+
+        if ticket.assigned_to_id is None and ticket.status == 'open':
+            available_agent = pick_available_agent(lock=True)
             if available_agent:
                 ticket.assigned_to = available_agent
-                ticket.status = 'assigned' # Change status to assigned
-                ticket.save() # Save the ticket with new assignment
+                ticket.status = 'assigned'
+        ticket.save()
+
+    print(f"Ticket {ticket_id} classified as {predicted_priority.upper()}.")
+    return predicted_priority
 
-                # Add a comment about the automated assignment
-                Comment.objects.create(
-                    ticket=ticket,
-                    user=system_user,
-                    text=f"AUTOMATED ASSIGNMENT: This ticket was unassigned and has now been assigned to {available_agent.username}."
-                )
-                print(f"Ticket '{ticket.title}' (ID: {ticket.id}) assigned to {available_agent.username} via background task.")
-            else:
-                print(f"No agent available below cap for ticket '{ticket.title}' (ID: {ticket.id}). It remains unassigned.")
-        
-        except Exception as e:
-            print(f"Error during background assignment for ticket '{ticket.title}' (ID: {ticket.id}): {e}")
 
+@shared_task
+def rebuild_ticket_rollups():
+    """
+    Recomputes the dashboard rollups and agent statistics from the ticket table. Backfills
+    them after deploying and reconciles any drift from writes that bypass the ticket signals
+    (e.g. raw UPDATEs).
+    """
+    days = rebuild_rollups()
+    agents = rebuild_agent_stats()
+    print(f"Rebuilt ticket rollups for {days} days and statistics for {agents} agents.")
+    return days
@@ -1,3 +1,565 @@
-from django.test import TestCase
+import asyncio
+import os
+import threading
+from collections import Counter
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import F, Min
+from django.urls import reverse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import classifier
+from .assignment import MAX_AGENT_WEIGHT_CAP, PRIORITY_WEIGHTS, assign_backlog, rebuild_agent_loads
+from .circuit_breaker import CircuitBreaker
+from .events import RESOLVED_STATUSES, response_comments
+from .importer import TicketImporter
+from .models import ACTIVE_STATUSES, AgentLoad, Comment, CustomUser, Ticket, TicketSearchDocument
+from .pagination import _page_query, encode_cursor
+from .search import SYSTEM_USERNAME, rebuild_search_index
+from .services import create_ticket
+from .sla import escalate_at_for, sla_deadlines
+from .tasks import PROVISIONAL_PRIORITY, assign_unassigned_tickets, check_overdue_tickets, classify_ticket_priority
+from .views import DASHBOARD_KEYS, DASHBOARD_PAGE_SIZE, dashboard_tickets
+
+
+class QueryPlanTests(TestCase):
+    """
+    Captures the query plan of each hot query and fails if it falls back to a
+    sequential scan of the table, i.e. if a supporting index went missing or stopped matching.
+    The queries are the ones the code actually sends: built by the view helpers, or recorded
+    while running the task or request.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create_user('customer', password='x')
+        cls.agent = CustomUser.objects.create_user('agent', password='x', role='agent')
+        past = timezone.now() - timedelta(hours=1)
+        Ticket.objects.bulk_create([
+            Ticket(title=f'Ticket {i}', description='...', create_by=cls.customer,
+                   assigned_to=cls.agent if i % 2 else None, status=ACTIVE_STATUSES[i % len(ACTIVE_STATUSES)],
+                   priority=['low', 'medium', 'high'][i % 3], resolution_due_at=past, escalate_at=past)
+            for i in range(50)
+        ])
+        cls.ticket = Ticket.objects.first()
+        Comment.objects.create(ticket=cls.ticket, user=cls.customer, text='Hello')
+        # An agent with capacity left, so the backlog has somewhere to go
+        CustomUser.objects.create_user('idle_agent', password='x', role='agent')
+        rebuild_agent_loads()
+
+    def explain(self, query):
+        """The plan of a queryset, or of raw SQL recorded by recorded_queries()."""
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                # Tiny test tables are always cheapest to seq-scan; make that a last resort
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        if not isinstance(query, str):
+            return query.explain()
+        with connection.cursor() as cursor:
+            cursor.execute(('EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN ') + query)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+    def recorded_queries(self, table, run):
+        """Runs a code path and returns the SQL of every SELECT it sent that reads `table`."""
+        with CaptureQueriesContext(connection) as captured:
+            run()
+        queries = [q['sql'] for q in captured if q['sql'].startswith('SELECT') and f'"{table}"' in q['sql']]
+        self.assertTrue(queries, f'No query read {table}.')
+        return queries
+
+    def assertNoSequentialScan(self, query, table=None):
+        table = table or query.model._meta.db_table
+        plan = self.explain(query)
+        if connection.vendor == 'postgresql':
+            self.assertNotIn(f'Seq Scan on {table}', plan)
+        elif connection.vendor == 'sqlite':
+            # "SCAN table USING INDEX ..." walks an index; a bare "SCAN table" reads every row
+            for line in plan.splitlines():
+                self.assertNotRegex(line, rf'SCAN {table}$', msg=plan)
+        else:
+            self.skipTest(f'No plan check for {connection.vendor}.')
+
+    def assertQueriesUseIndexes(self, table, run):
+        for sql in self.recorded_queries(table, run):
+            with self.subTest(sql=sql):
+                self.assertNoSequentialScan(sql, table)
+
+    def test_overdue_escalation_uses_index(self):
+        self.assertQueriesUseIndexes('tickets_ticket', check_overdue_tickets)
+
+    def test_agent_load_rebuild_uses_index(self):
+        self.assertQueriesUseIndexes('tickets_ticket', lambda: rebuild_agent_loads(agent_ids=[self.agent.id]))
+
+    def assertSortedByIndex(self, queryset):
+        plan = self.explain(queryset)
+        if connection.vendor == 'postgresql':
+            self.assertNotRegex(plan, r'(^|->\s+)(Incremental )?Sort\b', msg=plan)
+        elif connection.vendor == 'sqlite':
+            self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_dashboards_page_through_index_in_sort_order(self):
+        admin = CustomUser.objects.create_user('admin', password='x', role='admin')
+        for user in (self.customer, self.agent, admin):
+            first_page, _, _ = _page_query(dashboard_tickets(user), DASHBOARD_KEYS, DASHBOARD_PAGE_SIZE, None, None)
+            rows = list(first_page)
+            cursor = encode_cursor([getattr(rows[-1], field) for field, _ in DASHBOARD_KEYS])
+            for direction in ({'after': cursor, 'before': None}, {'after': None, 'before': cursor}):
+                page, _, _ = _page_query(dashboard_tickets(user), DASHBOARD_KEYS, DASHBOARD_PAGE_SIZE, **direction)
+                for queryset in (first_page, page):
+                    with self.subTest(role=user.role, **direction):
+                        self.assertNoSequentialScan(queryset)
+                        self.assertSortedByIndex(queryset)
+
+    def test_unassigned_backlog_uses_index(self):
+        self.assertQueriesUseIndexes('tickets_ticket', assign_unassigned_tickets)
+
+    def test_comment_thread_uses_index(self):
+        self.client.force_login(self.customer)
+        url = reverse('ticket_comments', args=[self.ticket.pk])
+        self.assertQueriesUseIndexes('tickets_comment', lambda: self.assertEqual(self.client.get(url).status_code, 200))
+
+
+@skipUnless(connection.features.has_select_for_update_skip_locked, 'Needs a database with SELECT ... FOR UPDATE SKIP LOCKED.')
+class ConcurrentAssignmentTests(TransactionTestCase):
+    """
+    Runs ASSIGNMENT_STRESS_WORKERS copies of assign_backlog (or of ticket creation) in
+    parallel threads, each on its own connection, against a backlog bigger than the agents
+    can absorb.
+    """
+    workers = int(os.environ.get('ASSIGNMENT_STRESS_WORKERS', 8))
+
+    def setUp(self):
+        self.system_user = CustomUser.objects.create_user('system_bot', password='x', role='admin')
+        customer = CustomUser.objects.create_user('customer', password='x')
+        for i in range(10):
+            CustomUser.objects.create_user(f'agent{i}', password='x', role='agent')
+        Ticket.objects.bulk_create([
+            Ticket(title=f'Ticket {i}', description='...', create_by=customer, status='open',
+                   priority=['low', 'medium', 'high'][i % 3])
+            for i in range(400)
+        ])
+        rebuild_agent_loads()
+
+    def run_workers(self, job):
+        errors = []
+
+        def work():
+            try:
+                job()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=work) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_parallel_workers_never_double_assign_or_overload(self):
+        self.run_workers(lambda: assign_backlog(self.system_user, batch_size=7))
+
+        assigned = Ticket.objects.filter(status='assigned')
+        comments = Counter(Comment.objects.values_list('ticket_id', flat=True))
+        self.assertEqual(sorted(comments), sorted(assigned.values_list('id', flat=True)))
+        self.assertEqual(set(comments.values()), {1})
+
+        stored = dict(AgentLoad.objects.values_list('agent_id', 'weighted_load'))
+        rebuild_agent_loads()
+        self.assertEqual(stored, dict(AgentLoad.objects.values_list('agent_id', 'weighted_load')))
+
+        # Every agent was below the cap before their last ticket, and the backlog stopped only for lack of capacity
+        for load in stored.values():
+            self.assertLess(load, MAX_AGENT_WEIGHT_CAP + max(PRIORITY_WEIGHTS.values()))
+        self.assertTrue(all(load >= MAX_AGENT_WEIGHT_CAP for load in stored.values()))
+
+    def test_concurrent_creations_wait_for_locked_agents(self):
+        customer = CustomUser.objects.get(username='customer')
+        # Fewer agents than workers, so every agent is regularly locked by another creation
+        CustomUser.objects.filter(role='agent').exclude(username__in=['agent0', 'agent1']).update(is_active=False)
+        per_worker = 2 * MAX_AGENT_WEIGHT_CAP // self.workers
+        if not per_worker:
+            self.skipTest('More workers than the two agents have capacity for.')
+
+        def create():
+            for i in range(per_worker):
+                create_ticket(f'Concurrent {i}', '...', customer)
+
+        # Within the two agents' capacity: a locked agent must be waited for, not taken
+        # as a reason to leave the ticket unassigned
+        self.run_workers(create)
+        created = Ticket.objects.filter(title__startswith='Concurrent ')
+        self.assertEqual(created.count(), per_worker * self.workers)
+        self.assertFalse(created.filter(assigned_to__isnull=True).exists())
+
+        stored = dict(AgentLoad.objects.values_list('agent_id', 'weighted_load'))
+        rebuild_agent_loads()
+        self.assertEqual(stored, dict(AgentLoad.objects.values_list('agent_id', 'weighted_load')))
+
+
+class CircuitBreakerTrialTests(SimpleTestCase):
+    """
+    A cancelled call (the client went away) must release a half-open trial, but must not
+    count as an upstream failure.
+    """
+
+    def cancel_call(self, breaker, expected_state):
+        async def never_answers(*args):
+            await asyncio.Event().wait()
+
+        async def cancel():
+            task = asyncio.create_task(classifier.classify_priority('VPN down', '...', 'customer'))
+            await asyncio.sleep(0.01)
+            self.assertEqual(breaker.state, expected_state)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        with mock.patch.object(classifier, 'classifier_breaker', breaker), \
+                mock.patch.object(classifier, 'request_priority', never_answers), \
+                mock.patch.object(classifier, 'get_local_model', return_value=None), \
+                mock.patch.object(classifier.prediction_cache, 'get', return_value=None):
+            asyncio.run(cancel())
+
+    def test_cancelled_trial_is_released(self):
+        breaker = CircuitBreaker('test', failure_threshold=1, slow_call_threshold=10, cooldown=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        self.cancel_call(breaker, CircuitBreaker.HALF_OPEN)
+        # The next call gets its own trial instead of being short-circuited for good
+        self.assertTrue(breaker.allow())
+
+    def test_cancelled_calls_do_not_open_breaker(self):
+        breaker = CircuitBreaker('test', failure_threshold=2, slow_call_threshold=10, cooldown=60)
+        breaker.record_failure()
+        for _ in range(3):
+            self.cancel_call(breaker, CircuitBreaker.CLOSED)
+        self.assertEqual((breaker.state, breaker.consecutive_failures), (CircuitBreaker.CLOSED, 1))
+
+
+class TamperedCursorTests(TestCase):
+    """Well-formed cursors with values that don't fit their keys fall back to the first page."""
+    bad_cursors = [
+        ['notadate', 1, 1, 1],
+        ['x', 'x', 'x', 'x'],
+        [{'a': 1}, {'a': 1}, {'a': 1}, {'a': 1}],
+        [0, 0, '2024-01-01T00:00:00+00:00', 2 ** 80],
+        [None, None, None, None],
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create_user('customer', password='x')
+        Ticket.objects.bulk_create([
+            Ticket(title=f'Ticket {i}', description='...', create_by=cls.customer) for i in range(30)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.customer)
+
+    def test_dashboard_ignores_tampered_cursors(self):
+        first_page = self.client.get(reverse('dashboard'))
+        for values in self.bad_cursors:
+            for direction in ('after', 'before'):
+                response = self.client.get(reverse('dashboard'), {direction: encode_cursor(values)})
+                self.assertEqual(response.status_code, 200, (direction, values))
+                self.assertEqual(
+                    [t.id for t in response.context['tickets']], [t.id for t in first_page.context['tickets']], (direction, values),
+                )
+
+    def test_dashboard_follows_valid_cursor(self):
+        first_page = self.client.get(reverse('dashboard'))
+        second_page = self.client.get(reverse('dashboard'), {'after': first_page.context['next_cursor']})
+        self.assertEqual(len(second_page.context['tickets']), 5)
+        self.assertFalse({t.id for t in first_page.context['tickets']} & {t.id for t in second_page.context['tickets']})
+
+    def test_comment_pages_reject_tampered_cursors(self):
+        ticket = Ticket.objects.first()
+        Comment.objects.bulk_create([Comment(ticket=ticket, user=self.customer, text=f'Comment {i}') for i in range(25)])
+        url = reverse('ticket_comments', args=[ticket.pk])
+        for values in [['x', 'x'], [{'a': 1}, {'a': 1}], ['2024-01-01T00:00:00+00:00', 'x']]:
+            self.assertEqual(self.client.get(url, {'cursor': encode_cursor(values)}).status_code, 400, values)
+
+        older = self.client.get(url, {'cursor': self.client.get(url).json()['next_cursor']})
+        self.assertEqual(older.status_code, 200)
+        self.assertEqual(len(older.json()['comments']), 5)
+
+    def test_search_ignores_tampered_cursors(self):
+        agent = CustomUser.objects.create_user('agent', password='x', role='agent')
+        self.client.force_login(agent)
+        url = reverse('search_tickets')
+        for values in [[{'a': 1}, {'a': 1}], ['x', 1], [1.5, 'x'], [True, 1], [1.0, 2 ** 80]]:
+            self.assertEqual(self.client.get(url, {'q': 'ticket', 'cursor': encode_cursor(values)}).status_code, 200, values)
+
+
+class CounterConsistencyTests(TestCase):
+    """
+    Every write path keeps the denormalized data incrementally: agent loads, dashboard rollups,
+    agent statistics, the escalation queue, first_response_at/resolved_at and search documents.
+    After each one, the stored values must equal what the rebuilds derive from the ticket table.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create_user('customer', password='x')
+        cls.agent = CustomUser.objects.create_user('agent', password='x', role='agent')
+        cls.other_agent = CustomUser.objects.create_user('other_agent', password='x', role='agent')
+        cls.admin = CustomUser.objects.create_user('admin', password='x', role='admin')
+
+    def setUp(self):
+        self.ticket = create_ticket('Printer on fire', 'Smoke everywhere', self.customer, priority='medium')
+
+    def assertCountersMatchRebuild(self):
+        loads = dict(AgentLoad.objects.values_list('agent_id', 'weighted_load'))
+        rebuild_agent_loads()
+        self.assertEqual(loads, dict(AgentLoad.objects.values_list('agent_id', 'weighted_load')))
+
+        # Raises CommandError listing the buckets that differ from the ticket table
+        call_command('rebuild_ticket_stats', '--check', stdout=StringIO())
+
+        documents = set(TicketSearchDocument.objects.values_list('ticket_id', 'title', 'description', 'comments'))
+        rebuild_search_index()
+        self.assertEqual(documents, set(TicketSearchDocument.objects.values_list('ticket_id', 'title', 'description', 'comments')))
+
+        first_responses = dict(
+            response_comments(Comment.objects.all(), F('ticket__create_by'))
+            .values('ticket').annotate(first=Min('created_at')).values_list('ticket', 'first')
+        )
+        for ticket in Ticket.objects.all():
+            with self.subTest(ticket=ticket.title):
+                self.assertEqual(ticket.first_response_at, first_responses.get(ticket.id))
+                self.assertEqual(ticket.resolved_at is not None, ticket.status in RESOLVED_STATUSES)
+                # Queued exactly while escalatable (escalated tickets wait an interval, not their deadline)
+                self.assertEqual(
+                    ticket.escalate_at is None, escalate_at_for(ticket.status, ticket.priority, ticket.resolution_due_at) is None,
+                )
+
+    def test_creation(self):
+        self.assertEqual(self.ticket.assigned_to, self.agent)
+        create_ticket('Second ticket', '...', self.customer, priority='high')
+        self.assertCountersMatchRebuild()
+
+    def test_reassignment_and_status_changes(self):
+        self.ticket.assigned_to = self.other_agent
+        self.ticket.save()
+        self.assertCountersMatchRebuild()
+
+        self.ticket.status = 'in_progress'
+        self.ticket.priority = 'high'
+        self.ticket.save()
+        self.assertCountersMatchRebuild()
+
+        # Through the admin's update form, which moves the ticket back to the first agent
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            reverse('update_ticket', args=[self.ticket.pk]),
+            {'priority': 'low', 'status': 'awaiting_customer_response', 'assigned_to': self.agent.pk},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertCountersMatchRebuild()
+
+    def test_comments_stamp_first_response_and_search(self):
+        Comment.objects.create(ticket=self.ticket, user=self.customer, text='Still smoking')
+        self.assertCountersMatchRebuild()
+
+        response = Comment.objects.create(ticket=self.ticket, user=self.agent, text='Extinguisher sent')
+        Comment.objects.create(ticket=self.ticket, user=self.other_agent, text='Second opinion')
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.first_response_at, response.created_at)
+        self.assertCountersMatchRebuild()
+
+        self.ticket.title = 'Printer was on fire'
+        self.ticket.save()
+        self.assertCountersMatchRebuild()
+
+    def test_resolve_close_and_reopen(self):
+        Comment.objects.create(ticket=self.ticket, user=self.agent, text='Fixed')
+        for status in ('resolved', 'closed', 'reopened', 'closed'):
+            self.ticket.status = status
+            self.ticket.save()
+            with self.subTest(status=status):
+                self.assertEqual(self.ticket.resolved_at is not None, status in RESOLVED_STATUSES)
+                self.assertCountersMatchRebuild()
+
+        # A response arriving after the ticket closed moves its response SLA outcome
+        late = create_ticket('Late answer', '...', self.customer)
+        late.status = 'closed'
+        late.save()
+        Comment.objects.create(ticket=late, user=self.agent, text='Sorry for the wait')
+        self.assertCountersMatchRebuild()
+
+    def test_deletion(self):
+        Comment.objects.create(ticket=self.ticket, user=self.agent, text='Looking')
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.post(reverse('delete_ticket', args=[self.ticket.pk])).status_code, 302)
+        self.assertFalse(Ticket.objects.exists())
+        self.assertCountersMatchRebuild()
+
+    def test_overdue_escalation(self):
+        low = create_ticket('Low and late', '...', self.customer, priority='low')
+        past = timezone.now() - timedelta(hours=1)
+        for ticket in (self.ticket, low):
+            ticket.resolution_due_at = past
+            ticket.save()
+        self.assertEqual(check_overdue_tickets(), 2)
+
+        self.ticket.refresh_from_db()
+        low.refresh_from_db()
+        self.assertEqual((self.ticket.priority, self.ticket.escalate_at), ('high', None))
+        self.assertEqual(low.priority, 'medium')
+        self.assertGreater(low.escalate_at, timezone.now())
+        self.assertCountersMatchRebuild()
+
+        # Nothing is due again until the interval has passed
+        self.assertEqual(check_overdue_tickets(), 0)
+        self.assertCountersMatchRebuild()
+
+    def test_ticket_due_during_escalation_waits_for_next_run(self):
+        late = create_ticket('Becomes due', '...', self.customer, priority='low')
+        self.ticket.resolution_due_at = timezone.now() - timedelta(hours=1)
+        self.ticket.save()
+
+        def make_due(updates):
+            # Committed by someone else after the overdue rows were read
+            late.resolution_due_at = timezone.now() - timedelta(hours=1)
+            late.save()
+
+        with mock.patch('tickets.tasks.live.publish', side_effect=make_due):
+            self.assertEqual(check_overdue_tickets(), 1)
+        late.refresh_from_db()
+        self.assertEqual(late.priority, 'low')
+        self.assertCountersMatchRebuild()
+
+        self.assertEqual(check_overdue_tickets(), 1)
+        late.refresh_from_db()
+        self.assertEqual(late.priority, 'medium')
+        self.assertEqual(late.comments.count(), 1)
+        self.assertCountersMatchRebuild()
+
+    def test_backlog_assignment(self):
+        CustomUser.objects.filter(role='agent').update(is_active=False)
+        backlog = [create_ticket(f'Backlog {i}', '...', self.customer, priority=['low', 'high'][i % 2]) for i in range(4)]
+        self.assertTrue(all(ticket.status == 'open' for ticket in backlog))
+        self.assertCountersMatchRebuild()
+
+        CustomUser.objects.filter(role='agent').update(is_active=True)
+        assign_unassigned_tickets()
+        self.assertFalse(Ticket.objects.filter(status='open').exists())
+        self.assertCountersMatchRebuild()
+
+
+class ServerTimingTests(TestCase):
+    """Request timings are logged for every request but only sent to developers and staff."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create_user('customer', password='x')
+        cls.admin = CustomUser.objects.create_user('admin', password='x', role='admin')
+
+    def get_dashboard(self, user):
+        self.client.force_login(user)
+        with self.assertLogs('tickets.requests', 'INFO') as logs:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(len(logs.records), 1)
+        return response
+
+    def test_header_only_for_staff(self):
+        self.assertNotIn('Server-Timing', self.get_dashboard(self.customer))
+        self.assertIn('Server-Timing', self.get_dashboard(self.admin))
+
+    def test_header_for_everyone_in_debug(self):
+        with self.settings(DEBUG=True):
+            self.assertIn('Server-Timing', self.get_dashboard(self.customer))
+
+
+class TicketImportTests(TestCase):
+    """Malformed records are rejected one by one instead of ending the import."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create_user('customer', password='x')
+        cls.agent = CustomUser.objects.create_user('agent', password='x', role='agent')
+        CustomUser.objects.create_user(SYSTEM_USERNAME, password='x', role='admin')
+
+    def record(self, **fields):
+        return dict({'title': 'Imported', 'status': 'closed', 'created_by': 'customer', 'created_at': '2024-01-01T10:00:00'}, **fields)
+
+    def test_malformed_records_are_rejected(self):
+        records = [
+            self.record(),
+            [1, 2],
+            'x',
+            self.record(created_by=['customer']),
+            self.record(assigned_to={'name': 'agent'}),
+            self.record(comments=[{'user': ['agent'], 'created_at': '2024-01-01T11:00:00'}]),
+            self.record(comments='[{broken'),
+            self.record(title=['list']),
+        ]
+        imported, rejected = TicketImporter().import_batch(records)
+        self.assertEqual(imported, 1)
+        self.assertEqual([index for index, _ in rejected], list(range(1, len(records))))
+
+    def test_automated_comments_are_not_first_responses(self):
+        comments = [
+            {'user': SYSTEM_USERNAME, 'text': 'AUTOMATED ASSIGNMENT: ...', 'created_at': '2024-01-01T10:01:00'},
+            {'user': 'agent', 'text': 'On it', 'created_at': '2024-01-01T12:00:00'},
+        ]
+        TicketImporter().import_batch([self.record(comments=comments), self.record(comments=comments[:1])])
+        answered, unanswered = Ticket.objects.order_by('id')
+        self.assertEqual(answered.first_response_at, answered.comments.get(user=self.agent).created_at)
+        self.assertEqual(answered.events.get(kind='first_response').actor, self.agent)
+        self.assertIsNone(unanswered.first_response_at)
+        self.assertFalse(unanswered.events.filter(kind='first_response').exists())
+
+
+class PriorityClassificationTests(TestCase):
+    """A late prediction must not overwrite a priority someone set in the meantime."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create_user('customer', password='x')
+        CustomUser.objects.create_user('agent', password='x', role='agent')
+
+    def classify(self, ticket, predicted):
+        def run(coroutine):
+            coroutine.close()
+            return predicted
+
+        with mock.patch('tickets.tasks.classifier_client.run', side_effect=run):
+            classify_ticket_priority.apply(args=[ticket.pk])
+        ticket.refresh_from_db()
+
+    def test_prediction_replaces_provisional_priority(self):
+        ticket = create_ticket('Server down', '...', self.customer, priority=PROVISIONAL_PRIORITY)
+        self.classify(ticket, 'high')
+        self.assertEqual(ticket.priority, 'high')
+        self.assertEqual(ticket.resolution_due_at, sla_deadlines('high', ticket.created_at)[1])
+
+    def assertPredictionIgnored(self, ticket):
+        expected = (ticket.priority, ticket.response_due_at, ticket.resolution_due_at)
+        self.classify(ticket, 'high')
+        self.assertEqual((ticket.priority, ticket.response_due_at, ticket.resolution_due_at), expected)
+
+    def test_agent_priority_survives_prediction(self):
+        ticket = create_ticket('Server down', '...', self.customer, priority=PROVISIONAL_PRIORITY)
+        ticket.priority = 'medium'
+        ticket.save()
+        self.assertPredictionIgnored(ticket)
+
+    def test_escalated_priority_survives_prediction(self):
+        ticket = create_ticket('Server down', '...', self.customer, priority=PROVISIONAL_PRIORITY)
+        ticket.resolution_due_at = timezone.now() - timedelta(hours=1)
+        ticket.save()
+        check_overdue_tickets()
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.priority, 'medium')
+        self.assertPredictionIgnored(ticket)
@@ -1,7 +1,13 @@
 # tickets/urls.py
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.USE_ASYNC_VIEWS:
+    from . import async_views as ticket_views
+else:
+    ticket_views = views
+
 urlpatterns = [
     # Authentication URLs
     path('login/', views.login_view, name='login_view'),
@@ -10,12 +16,17 @@ urlpatterns = [
 
     # Ticket Management URLs
     path('', views.dashboard, name='dashboard'), # Home page / Dashboard
-    path('tickets/create/', views.create_ticket, name='create_ticket'),
-    path('tickets/<int:pk>/', views.ticket_detail, name='ticket_detail'),
+    path('live/', views.live_updates, name='live_updates'),
+    path('tickets/create/', ticket_views.create_ticket, name='create_ticket'),
+    path('tickets/<int:pk>/', ticket_views.ticket_detail, name='ticket_detail'),
+    path('tickets/<int:pk>/comments/', views.ticket_comments, name='ticket_comments'),
+    path('tickets/search/', views.search_tickets, name='search_tickets'),
+    path('tickets/export/', views.export_tickets, name='export_tickets'),
     path('tickets/<int:pk>/update/', views.update_ticket, name='update_ticket'),
     path('tickets/<int:pk>/delete/', views.delete_ticket, name='delete_ticket'),
 
     # Analytics Dashboards
     path('analytics/agents/', views.agent_performance_dashboard, name='agent_performance_dashboard'),
     path('analytics/trends/', views.ticket_trend_dashboard, name='ticket_trend_dashboard'),
+    path('analytics/classifier/', views.classifier_status, name='classifier_status'),
 ]
@@ -1,23 +1,28 @@
 # tickets/views.py
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib import auth, messages
 from django.contrib.auth.decorators import login_required
 from django.db.models import Count,F,Q, Case, When, IntegerField, Q, Sum, Avg, ExpressionWrapper, fields # Added Sum, Avg, ExpressionWrapper, fields
-from django.db.models.functions import TruncDay, TruncWeek, TruncMonth # Added Trunc functions
-from django.utils import timezone
+from django.db.models.functions import Coalesce, TruncDay, TruncWeek, TruncMonth # Added Trunc functions
+from django.utils import dateformat, timezone
 from datetime import timedelta
 
 from .models import *
 from .decorators import role_required
+from . import classifier_metrics, export, live, search, services
+from .pagination import keyset_paginate, parse_cursor
+from .rollups import local_day
 
 from dotenv import load_dotenv
 import os
 load_dotenv()
 
-# For AI API call
 import json
-import asyncio
-import aiohttp
+
+from .tasks import PROVISIONAL_PRIORITY, enqueue_priority_classification
 
 # --- Authentication Views ---
 def login_view(request):
@@ -79,140 +84,58 @@ def logout_view(request):
     return redirect('login_view')
 
 # --- Ticket Management Views ---
-@login_required(login_url='login_view')
-def dashboard(request):
-    STATUS_ORDER = Case(
-        When(status='open', then=0),
-        When(status='assigned', then=1),
-        When(status='in_progress', then=2),
-        When(status='reopened', then=3),
-        When(status='awaiting_customer_response', then=4),
-        When(status='resolved', then=5),
-        When(status='closed', then=6),
-        default=7,
-        output_field=IntegerField()
-    )
-
-    if request.user.role == 'customer':
-        tickets = Ticket.objects.filter(create_by=request.user).order_by(
-            Case(
-                When(priority='high', then=0),
-                When(priority='medium', then=1),
-                When(priority='low', then=2),
-                default=3,
-                output_field=IntegerField(),
-            ),
-            STATUS_ORDER,
-            '-created_at'
-        )
-    elif request.user.role == 'agent':
-        tickets = Ticket.objects.filter(assigned_to=request.user).exclude(status='closed').order_by(
-            Case(
-                When(priority='high', then=0),
-                When(priority='medium', then=1),
-                When(priority='low', then=2),
-                default=3,
-                output_field=IntegerField(),
-            ),
-            STATUS_ORDER,
-            '-created_at'
-        )
+DASHBOARD_PAGE_SIZE = 25
+
+# Keyset for the dashboard's sort order: priority, then status, then newest first.
+# 'id' breaks ties so every cursor points at exactly one row. The ranks are stored columns
+# (Ticket.priority_rank/status_rank), indexed in this order for each role's filter.
+DASHBOARD_KEYS = [('priority_rank', False), ('status_rank', False), ('created_at', True), ('id', True)]
+
+def dashboard_tickets(user):
+    """The tickets on a user's dashboard, unordered and unpaged."""
+    if user.role == 'customer':
+        tickets = Ticket.objects.filter(create_by=user)
+    elif user.role == 'agent':
+        tickets = Ticket.objects.filter(assigned_to=user).exclude(status='closed')
     else:
-        tickets = Ticket.objects.all().order_by(
-            Case(
-                When(priority='high', then=0),
-                When(priority='medium', then=1),
-                When(priority='low', then=2),
-                default=3,
-                output_field=IntegerField(),
-            ),
-            STATUS_ORDER,
-            '-created_at'
-        )
-    
-    return render(request, 'dashboard.html', {'tickets': tickets})
+        tickets = Ticket.objects.all()
 
+    # Only fetch the columns the rows render, and join both usernames in the same query
+    return tickets.select_related('create_by', 'assigned_to').only(
+        'id', 'title', 'status', 'priority', 'created_at', 'priority_rank', 'status_rank',
+        'create_by', 'create_by__username', 'assigned_to', 'assigned_to__username',
+    )
 
-# Function to predict priority using Gemini API
-async def predict_priority_ai(title, description, user_role):
-    api_key = os.environ.get('GEMINI_API_KEY')
-    api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={api_key}"
-
-    prompt = f"""
-    Analyze the following support ticket details and determine its priority (high, medium, or low).
-    Consider the title, description, and the role of the user creating the ticket.
-    
-    Use these guidelines for priority:
-    - High: Critical system down, security breach, major disruption affecting many users, production issue.
-    - Medium: Service degradation, minor bugs, issues affecting some users, non-critical errors.
-    - Low: General questions, feature requests, cosmetic issues, minor non-critical problems.
-
-    User Role: {user_role}
-    Ticket Title: {title}
-    Ticket Description: {description}
-
-    Provide the output as a JSON object with a single key "priority" and its value.
-    Example: {{"priority": "high"}}
-    """
+@login_required(login_url='login_view')
+def dashboard(request):
+    tickets = dashboard_tickets(request.user)
+    tickets, next_cursor, prev_cursor = keyset_paginate(
+        tickets,
+        DASHBOARD_KEYS,
+        DASHBOARD_PAGE_SIZE,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
 
-    payload = {
-        "contents": [
-            {
-                "role": "user",
-                "parts": [{"text": prompt}]
-            }
-        ],
-        "generationConfig": {
-            "responseMimeType": "application/json",
-            "responseSchema": {
-                "type": "OBJECT",
-                "properties": {
-                    "priority": {
-                        "type": "STRING",
-                        "enum": ["low", "medium", "high"]
-                    }
-                },
-                "required": ["priority"]
-            }
-        }
-    }
+    return render(request, 'dashboard.html', {
+        'tickets': tickets,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+    })
 
-    headers = {
-        'Content-Type': 'application/json'
-    }
 
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.post(api_url, headers=headers, data=json.dumps(payload)) as response:
-                response.raise_for_status()
-                result = await response.json()
-                
-                if result and result.get("candidates") and len(result["candidates"]) > 0 and \
-                   result["candidates"][0].get("content") and result["candidates"][0]["content"].get("parts") and \
-                   len(result["candidates"][0]["content"]["parts"]) > 0:
-                    
-                    json_string = result["candidates"][0]["content"]["parts"][0]["text"]
-                    parsed_json = json.loads(json_string)
-                    
-                    predicted_priority = parsed_json.get("priority", "low")
-                    
-                    if predicted_priority not in ['low', 'medium', 'high']:
-                        print(f"Gemini returned an invalid priority: {predicted_priority}. Defaulting to low.")
-                        return "low"
-                    
-                    return predicted_priority
-                else:
-                    print("Gemini response structure unexpected or missing content.")
-                    return "low"
-        except aiohttp.ClientError as e:
-            print(f"HTTP error during Gemini API call: {e}")
-            return "low"
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error from Gemini response: {e}")
-            return "low"
-        except Exception as e:
-            print(f"An unexpected error occurred during Gemini API call: {e}")
-            return "low"
+@login_required(login_url='login_view')
+async def live_updates(request):
+    # Server-Sent Events for the dashboard. A stream holds its worker for as long as the page
+    # is open, so it is only served over ASGI; a 204 tells the browser's EventSource to stop
+    # retrying and the dashboard keeps working by reload.
+    if not isinstance(request, ASGIRequest) or not live.enabled():
+        return HttpResponse(status=204)
+    user = await request.auser()
+    response = StreamingHttpResponse(live.stream(user), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # let nginx-style proxies pass events straight through
+    return response
 
 
 @login_required(login_url='login_view')
@@ -227,18 +150,16 @@ def create_ticket(request):
             return render(request, 'create_ticket.html', {'title': title, 'description': description})
 
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            predicted_priority = loop.run_until_complete(predict_priority_ai(title, description, request.user.role))
-            loop.close()
-
-            ticket = Ticket.objects.create(
+            # Created straight away with a provisional priority and SLA; the AI classification
+            # runs in Celery once the ticket is committed and corrects both.
+            ticket = services.create_ticket(
                 title=title,
                 description=description,
-                priority=predicted_priority,
+                priority=PROVISIONAL_PRIORITY,
                 create_by=request.user
             )
-            messages.success(request, f"Ticket created successfully with AI-determined priority: {predicted_priority.upper()}! It will be assigned to an agent shortly.")
+            enqueue_priority_classification(ticket.pk)
+            messages.success(request, "Ticket created successfully! Its priority is being determined by AI and it will be assigned to an agent shortly.")
             return redirect('ticket_detail', pk=ticket.pk)
         except Exception as e:
             messages.error(f"An error occurred while creating the ticket: {e}")
@@ -246,9 +167,24 @@ def create_ticket(request):
         
     return render(request, 'create_ticket.html')
 
+# Comments shown with the ticket; older ones load on demand through ticket_comments
+COMMENT_PAGE_SIZE = 20
+COMMENT_KEYS = [('created_at', True), ('id', True)]  # newest first
+
+def _comment_page(ticket, cursor=None):
+    """One page of a ticket's comments walking back in time, returned oldest first, plus the cursor for the page before it."""
+    comments, older_cursor, _ = keyset_paginate(
+        ticket.comments.select_related('user'),
+        COMMENT_KEYS,
+        COMMENT_PAGE_SIZE,
+        after=cursor,
+    )
+    comments.reverse()
+    return comments, older_cursor
+
 @login_required(login_url='login_view')
 def ticket_detail(request, pk):
-    ticket = get_object_or_404(Ticket, id=pk)
+    ticket = get_object_or_404(Ticket.objects.select_related('create_by', 'assigned_to'), id=pk)
 
     reopenable_statuses = ['resolved', 'closed']
 
@@ -256,6 +192,9 @@ def ticket_detail(request, pk):
         messages.error(request, "You do not have permission to view this ticket.")
         return redirect('dashboard')
 
+    # Attributes any status change below to this user in the ticket's event log
+    ticket._actor = request.user
+
     if request.method == "POST":
         if 'comment_text' in request.POST:
             comment_text = request.POST.get('comment_text')
@@ -283,13 +222,41 @@ def ticket_detail(request, pk):
             messages.success(request, "Ticket has been reopened!")
             return redirect('ticket_detail', pk=ticket.pk)
     
-    comments = ticket.comments.all().order_by('created_at')
+    comments, older_comments_cursor = _comment_page(ticket)
     return render(request, 'ticket_detail.html', {
         'ticket': ticket,
         'comments': comments,
+        'older_comments_cursor': older_comments_cursor,
         'reopenable_statuses': reopenable_statuses,
     })
 
+@login_required(login_url='login_view')
+def ticket_comments(request, pk):
+    # JSON pages of older comments for the "Load older comments" button on ticket_detail
+    ticket = get_object_or_404(Ticket.objects.only('id', 'create_by'), id=pk)
+    if request.user.role == 'customer' and ticket.create_by_id != request.user.id:
+        return JsonResponse({'error': "You do not have permission to view this ticket."}, status=403)
+
+    # A bad cursor would restart at the newest page, which the button would append as "older"
+    cursor = request.GET.get('cursor')
+    if cursor and parse_cursor(ticket.comments.all(), COMMENT_KEYS, cursor) is None:
+        return JsonResponse({'error': "Invalid cursor."}, status=400)
+
+    comments, older_cursor = _comment_page(ticket, cursor)
+    return JsonResponse({
+        'comments': [
+            {
+                'id': comment.id,
+                'user': comment.user.username,
+                'text': comment.text,
+                'created_at': comment.created_at.isoformat(),
+                'created_display': dateformat.format(timezone.localtime(comment.created_at), "F d, Y H:i"),
+            }
+            for comment in comments
+        ],
+        'next_cursor': older_cursor,
+    })
+
 @login_required(login_url='login_view')
 @role_required(allowed_roles=['agent', 'admin'])
 def update_ticket(request, pk):
@@ -299,6 +266,7 @@ def update_ticket(request, pk):
         priority = request.POST.get('priority')
         status = request.POST.get('status')
         
+        ticket._actor = request.user
         ticket.priority = priority
         ticket.status = status
 
@@ -344,49 +312,86 @@ def delete_ticket(request, pk):
     return render(request, 'confirm_delete.html', {'ticket': ticket})
 
 
+@login_required(login_url='login_view')
+@role_required(allowed_roles=['agent', 'admin'])
+def search_tickets(request):
+    # Ranked full-text search over tickets and comments; pass next_cursor back as ?cursor= for the next page
+    results, next_cursor = search.search_tickets(request.GET.get('q', ''), request.GET.get('cursor'))
+    return JsonResponse({
+        'results': [
+            {
+                'id': ticket.id,
+                'title': ticket.title,
+                'status': ticket.status,
+                'priority': ticket.priority,
+                'assigned_to': ticket.assigned_to.username if ticket.assigned_to else None,
+                'created_at': ticket.created_at.isoformat(),
+                'rank': ticket.search_rank,
+                'url': reverse('ticket_detail', args=[ticket.id]),
+            }
+            for ticket in results
+        ],
+        'next_cursor': next_cursor,
+    })
+
+
+@login_required(login_url='login_view')
+@role_required(allowed_roles=['admin'])
+def export_tickets(request):
+    # Streams ?format=csv|ndjson, optionally &comments=1, filtered by status, priority, agent, created_from/created_to
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in export.EXPORT_FORMATS:
+        return JsonResponse({'error': f"Unsupported format {export_format!r}."}, status=400)
+    try:
+        tickets = export.export_queryset(
+            status=request.GET.get('status'),
+            priority=request.GET.get('priority'),
+            agent=request.GET.get('agent'),
+            created_from=request.GET.get('created_from'),
+            created_to=request.GET.get('created_to'),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    # Over ASGI a sync iterator would be buffered whole before sending; stream it asynchronously instead
+    stream = export.astream_export if isinstance(request, ASGIRequest) else export.stream_export
+    response = StreamingHttpResponse(
+        stream(tickets, export_format, include_comments=request.GET.get('comments') == '1'),
+        content_type=export.EXPORT_FORMATS[export_format],
+    )
+    filename = f"tickets-{timezone.now():%Y%m%d-%H%M%S}.{export_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 # --- Analytics Dashboards ---
 @login_required(login_url='login_view')
 @role_required(allowed_roles=['admin']) # Only admins can see agent performance
 def agent_performance_dashboard(request):
-    # Calculate Average Resolution Time for closed tickets
+    # Per-agent figures come from the incrementally maintained AgentStats rows: one LEFT JOIN
     agent_stats = CustomUser.objects.filter(role='agent', is_active=True).annotate(
-        active_tickets_count=Count('assigned_tickets', filter=~Q(assigned_tickets__status='closed')),
-        closed_tickets_count=Count('assigned_tickets', filter=Q(assigned_tickets__status='closed')),
-        
-        # Average Resolution Time for tickets closed by this agent
-        # Using ExpressionWrapper to calculate duration and then Avg
-        avg_resolution_duration_seconds=Avg(
-            ExpressionWrapper(
-                F('assigned_tickets__updated_at') - F('assigned_tickets__created_at'),
-                output_field=fields.DurationField()
-            ),
-            filter=Q(assigned_tickets__status='closed')
-        )
+        active_tickets_count=Coalesce('stats__active_count', 0),
+        closed_tickets_count=Coalesce('stats__closed_count', 0),
+        resolution_seconds_sum=Coalesce('stats__resolution_seconds_sum', 0.0),
     ).order_by('username')
 
-    # Convert timedelta to a more readable format (e.g., minutes or hours) for display
+    # Convert the running total to an average in minutes for display
     for agent in agent_stats:
-        if agent.avg_resolution_duration_seconds:
-            # Convert timedelta object to total seconds, then minutes
-            agent.avg_resolution_minutes = round(agent.avg_resolution_duration_seconds.total_seconds() / 60, 2)
+        if agent.closed_tickets_count:
+            agent.avg_resolution_minutes = round(agent.resolution_seconds_sum / agent.closed_tickets_count / 60, 2)
         else:
             agent.avg_resolution_minutes = None
 
-    # Calculate System-wide SLA compliance for closed tickets
-    total_closed_tickets = Ticket.objects.filter(status='closed').count()
-    
-    # SLA compliance checks:
-    # Need to ensure first_response_at is tracked for accurate response SLA
-    # For now, using a simplified check (updated_at vs response_due_at)
-    sla_met_response = Ticket.objects.filter(
-        status='closed',
-        updated_at__lt=F('response_due_at') # Simplified: assumes updated_at is first response
-    ).count()
-    
-    sla_met_resolution = Ticket.objects.filter(
-        status='closed',
-        updated_at__lt=F('resolution_due_at')
-    ).count()
+    # System-wide SLA compliance for closed tickets, summed from the daily rollups.
+    # A ticket met its SLAs if first_response_at / resolved_at came before the deadlines.
+    sla_totals = TicketDailyRollup.objects.aggregate(
+        closed=Sum('closed_count'),
+        response_met=Sum('response_sla_met_count'),
+        resolution_met=Sum('resolution_sla_met_count'),
+    )
+    total_closed_tickets = sla_totals['closed'] or 0
+    sla_met_response = sla_totals['response_met'] or 0
+    sla_met_resolution = sla_totals['resolution_met'] or 0
 
     sla_response_compliance = (sla_met_response / total_closed_tickets * 100) if total_closed_tickets else 0
     sla_resolution_compliance = (sla_met_resolution / total_closed_tickets * 100) if total_closed_tickets else 0
@@ -431,50 +436,42 @@ def ticket_trend_dashboard(request):
         trunc_func = TruncDay
         date_format = "%Y-%m-%d"
 
-    # Aggregate tickets created over time
-    tickets_created_data = Ticket.objects.filter(
-        created_at__range=(start_date, end_date)
-    ).annotate(
-        period=trunc_func('created_at')
-    ).values('period').annotate(
-        count=Count('id')
-    ).order_by('period')
-
-    # Aggregate tickets closed over time
-    tickets_closed_data = Ticket.objects.filter(
-        status='closed',
-        updated_at__range=(start_date, end_date)
+    # Read the incrementally maintained daily rollups instead of aggregating the ticket table.
+    # Buckets are whole local days, so the first day of the range is counted in full.
+    daily_rollups = TicketDailyRollup.objects.filter(
+        day__range=(local_day(start_date), local_day(end_date))
     ).annotate(
-        period=trunc_func('updated_at')
+        period=trunc_func('day')
     ).values('period').annotate(
-        count=Count('id')
+        created=Sum('created_count'),
+        closed=Sum('closed_count'),
     ).order_by('period')
 
     # Prepare data for Chart.js for trends
     created_labels = []
     created_counts = []
-    for entry in tickets_created_data:
-        created_labels.append(entry['period'].strftime(date_format))
-        created_counts.append(entry['count'])
-
     closed_labels = []
     closed_counts = []
-    for entry in tickets_closed_data:
-        closed_labels.append(entry['period'].strftime(date_format))
-        closed_counts.append(entry['count'])
+    for entry in daily_rollups:
+        if entry['created']:
+            created_labels.append(entry['period'].strftime(date_format))
+            created_counts.append(entry['created'])
+        if entry['closed']:
+            closed_labels.append(entry['period'].strftime(date_format))
+            closed_counts.append(entry['closed'])
 
     # Current status distribution
-    status_distribution_data = Ticket.objects.values('status').annotate(
-        count=Count('id')
-    ).order_by('status')
+    status_distribution_data = TicketStateRollup.objects.values('status').annotate(
+        total=Sum('count')
+    ).filter(total__gt=0).order_by('status')
 
     status_labels = [item['status'].replace('_', ' ').capitalize() for item in status_distribution_data]
-    status_counts = [item['count'] for item in status_distribution_data]
+    status_counts = [item['total'] for item in status_distribution_data]
 
     # Current priority distribution
-    priority_distribution_data = Ticket.objects.values('priority').annotate(
-        count=Count('id')
-    ).order_by(
+    priority_distribution_data = TicketStateRollup.objects.values('priority').annotate(
+        total=Sum('count')
+    ).filter(total__gt=0).order_by(
         Case(
             When(priority='high', then=0),
             When(priority='medium', then=1),
@@ -484,7 +481,7 @@ def ticket_trend_dashboard(request):
         )
     )
     priority_labels = [item['priority'].capitalize() for item in priority_distribution_data]
-    priority_counts = [item['count'] for item in priority_distribution_data]
+    priority_counts = [item['total'] for item in priority_distribution_data]
         
     context = {
         'period': period,
@@ -498,3 +495,10 @@ def ticket_trend_dashboard(request):
         'priority_counts': json.dumps(priority_counts),
     }
     return render(request, 'ticket_trend_dashboard.html', context)
+
+
+@login_required(login_url='login_view')
+@role_required(allowed_roles=['admin'])
+def classifier_status(request):
+    # Counters published by every classifying process (Celery and ASGI workers); see classifier_metrics
+    return JsonResponse(classifier_metrics.collect())